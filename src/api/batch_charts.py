@@ -0,0 +1,208 @@
+"""
+批量排盘（NDJSON 进、NDJSON 出）
+
+请求体每行一个 ``ChartRequest``，响应每行一条结果，字段与 ``/api/bazi/chart``
+相同，另带输入行号 ``index``；某一行解析或排盘失败时只输出该行的 ``error``。
+
+排盘在进程池中执行：输入按块（chunk_size 行）提交，同时在途的块不超过
+max_in_flight 个，结果按输入顺序逐块写出，内存占用与批量大小无关。
+
+子进程入口、分块与有界提交也供离线命令行 ``src.cli.batch`` 使用。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import closing
+from datetime import datetime
+from typing import (
+    IO,
+    Any,
+    AsyncIterator,
+    Callable,
+    Deque,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+from pydantic import ValidationError
+
+from src.api.chart_payload import (
+    build_solar_datetime,
+    chart_as_of,
+    compute_chart_payload,
+    normalize_fields,
+    normalize_name,
+)
+from src.api.schemas import ChartRequest
+from src.engine.bazi_engine import BaziPaipanEngine
+
+# (行号, 原始记录)：NDJSON 为一行字节串，CSV 为列名 -> 文本
+BatchRecord = Tuple[int, Union[bytes, Dict[str, str]]]
+
+T = TypeVar("T")
+FutureT = TypeVar("FutureT")
+
+_worker_engine: Optional[BaziPaipanEngine] = None
+
+
+def get_worker_engine() -> BaziPaipanEngine:
+    """子进程内共享的排盘引擎"""
+    global _worker_engine
+    if _worker_engine is None:
+        _worker_engine = BaziPaipanEngine()
+    return _worker_engine
+
+
+def init_worker() -> None:
+    """子进程启动时预热引擎与历表，避免首个块承担初始化开销"""
+    get_worker_engine()
+
+
+def parse_record(raw: Union[bytes, Dict[str, str]]) -> ChartRequest:
+    if isinstance(raw, bytes):
+        return ChartRequest.model_validate_json(raw)
+    # CSV 空单元格视为未填写，交给模型默认值
+    return ChartRequest.model_validate({key: value for key, value in raw.items() if value not in ("", None)})
+
+
+def describe_error(exc: Exception) -> str:
+    """单条记录出错时写入结果的说明"""
+    if isinstance(exc, ValidationError):
+        details = "; ".join(
+            f"{'.'.join(str(part) for part in error['loc']) or 'record'}: {error['msg']}"
+            for error in exc.errors()
+        )
+        return f"记录无效: {details}"
+    return f"排盘失败: {exc}"
+
+
+def compute_chart_lines(
+    records: List[BatchRecord],
+    fields: Optional[FrozenSet[str]] = None,
+    as_of: Optional[datetime] = None,
+) -> Tuple[str, int]:
+    """
+    子进程入口：排一块记录，返回 (拼接好的 NDJSON 文本, 出错数)。
+
+    Args:
+        fields: 输出字段，优先于记录自带的 fields；None 表示按记录
+        as_of: 记录未指定 as_of 时使用的参考时间
+    """
+    engine = get_worker_engine()
+    lines: List[str] = []
+    errors = 0
+    for index, raw in records:
+        try:
+            payload = parse_record(raw)
+            result: Dict[str, Any] = {
+                "index": index,
+                **compute_chart_payload(
+                    engine,
+                    payload,
+                    build_solar_datetime(engine, payload),
+                    normalize_name(payload.name),
+                    chart_as_of(engine, payload.as_of or as_of),
+                    fields=fields if fields is not None else normalize_fields(payload.fields),
+                ),
+            }
+        except Exception as exc:
+            errors += 1
+            result = {"index": index, "error": describe_error(exc)}
+        lines.append(json.dumps(result, ensure_ascii=False) + "\n")
+    return "".join(lines), errors
+
+
+def iter_ndjson(source: Iterable[Union[str, bytes]]) -> Iterator[BatchRecord]:
+    """逐行读取 NDJSON（跳过空行，行号从 0 起计）"""
+    for index, line in enumerate(source):
+        line = line.strip()
+        if line:
+            yield index, line.encode("utf-8") if isinstance(line, str) else line
+
+
+def iter_chunks(records: Iterable[T], chunk_size: int) -> Iterator[List[T]]:
+    """每 chunk_size 条记录一块"""
+    chunk: List[T] = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def submit_in_order(
+    submit: Callable[[List[T]], FutureT], chunks: Iterable[List[T]], max_in_flight: int
+) -> Iterator[Tuple[int, FutureT]]:
+    """
+    逐块提交，按输入顺序产出 (块内记录数, future)。
+
+    调用方须等到产出的 future 完成后再取下一个，这样同时在途的块不超过
+    max_in_flight；生成器关闭时（如客户端断开）取消尚未开始的块。
+    """
+    pending: Deque[Tuple[int, FutureT]] = deque()
+    try:
+        for chunk in chunks:
+            pending.append((len(chunk), submit(chunk)))
+            if len(pending) >= max_in_flight:
+                yield pending.popleft()
+        while pending:
+            yield pending.popleft()
+    finally:
+        for _, future in pending:
+            future.cancel()
+
+
+class ChartBatchRunner:
+    """持有排盘进程池，限制在途块数，按输入顺序产出结果"""
+
+    def __init__(self, workers: int = 0, chunk_size: int = 32, max_in_flight: int = 0):
+        """
+        Args:
+            workers: 子进程数；0 表示 CPU 核数，负数表示不用进程池、在线程中计算
+            chunk_size: 每次提交给子进程的行数
+            max_in_flight: 同时在途的块数上限；0 表示子进程数的 2 倍
+        """
+        self.workers = workers if workers != 0 else (os.cpu_count() or 1)
+        self.chunk_size = max(1, chunk_size)
+        self.max_in_flight = max_in_flight or 2 * max(1, self.workers)
+        self._executor: Optional[Executor] = None
+
+    def _get_executor(self) -> Optional[Executor]:
+        if self.workers < 0:
+            return None
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker)
+        return self._executor
+
+    async def stream(self, source: IO[bytes]) -> AsyncIterator[str]:
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        futures = submit_in_order(
+            lambda chunk: loop.run_in_executor(executor, compute_chart_lines, chunk),
+            iter_chunks(iter_ndjson(source), self.chunk_size),
+            self.max_in_flight,
+        )
+        # 客户端断开时关闭生成器，丢弃尚未开始的块
+        with closing(futures):
+            for _count, future in futures:
+                text, _errors = await future
+                yield text
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,215 @@
+"""
+排盘结果缓存
+
+前端刷新页面、以及报告/对话/能量分析流程都会重复提交同一份出生信息，每次都要
+重新跑一遍 sxtwl 排盘、干支关系和大运关系表。这里在进程内按规范化后的出生信息
+缓存 /api/bazi/chart 的响应（JSON 序列化后按字节数限制容量，并带 TTL），
+可选再挂一个本地 SQLite 文件作为共享后端，让多个 uvicorn worker 共用命中结果。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+
+def make_chart_cache_key(
+    *,
+    solar_datetime: datetime,
+    gender: str,
+    tz_offset_hours: int,
+    longitude: Optional[float],
+    latitude: Optional[float],
+    as_of_day: date,
+    name: Optional[str] = None,
+    birth_place: str = "",
+    fields: Optional[Iterable[str]] = None,
+    compact: bool = False,
+) -> str:
+    """
+    规范化后的排盘输入 -> 缓存键。
+
+    农历输入应先换算成阳历再传入，这样同一时刻的阳历/农历请求共用一条缓存；
+    经纬度保留 4 位小数（约 10 米），对真太阳时的影响不足 0.1 秒。
+    姓名和出生地会原样写入命盘，因此也属于键的一部分；按字段裁剪的响应与紧凑编码的
+    响应单独缓存。
+    """
+    canonical = [
+        solar_datetime.isoformat(),
+        gender,
+        tz_offset_hours,
+        None if longitude is None else round(longitude, 4),
+        None if latitude is None else round(latitude, 4),
+        as_of_day.isoformat(),
+        name or "",
+        birth_place or "",
+    ]
+    if fields is not None:
+        canonical.append(sorted(fields))
+    if compact:
+        canonical.append("compact")
+    raw = json.dumps(canonical, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SQLiteChartCacheBackend:
+    """基于本地 SQLite 文件的共享缓存后端（多个 worker 进程共用同一文件）。"""
+
+    # 每写入这么多次清理一次过期条目
+    PRUNE_EVERY = 256
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS chart_cache ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+
+    def get(self, key: str) -> Optional[Tuple[bytes, float]]:
+        """返回 (JSON 字节, 过期时间戳)；不存在或已过期时返回 None。"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM chart_cache WHERE key = ? AND expires_at > ?",
+                (key, time.time()),
+            ).fetchone()
+        if row is None:
+            return None
+        return bytes(row[0]), float(row[1])
+
+    def put(self, key: str, value: bytes, expires_at: float) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO chart_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, expires_at),
+            )
+            self._writes += 1
+            if self._writes % self.PRUNE_EVERY == 0:
+                self._conn.execute("DELETE FROM chart_cache WHERE expires_at <= ?", (time.time(),))
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM chart_cache")
+            self._conn.commit()
+
+
+class ChartCache:
+    """
+    进程内 LRU + TTL 缓存，容量按序列化后的字节数计算。
+
+    缓存值为可 JSON 序列化的 dict（即排盘接口的响应体），命中时返回同一个
+    对象，调用方不应修改。
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl_seconds: float = 3600.0,
+        backend: Optional[SQLiteChartCacheBackend] = None,
+    ):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.backend = backend
+        self.hits = 0
+        self.backend_hits = 0
+        self.misses = 0
+        self._size_bytes = 0
+        # key -> (过期时间戳, 字节数, 值)
+        self._entries: "OrderedDict[str, Tuple[float, int, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0 and self.ttl_seconds > 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[2]
+                self._remove(key)
+        if self.backend is not None:
+            try:
+                stored = self.backend.get(key)
+            except sqlite3.Error:
+                stored = None
+            if stored is not None:
+                raw, expires_at = stored
+                value = json.loads(raw)
+                with self._lock:
+                    self.backend_hits += 1
+                    self._insert(key, value, len(raw), expires_at)
+                return value
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        if not self.enabled:
+            return
+        raw = json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._insert(key, value, len(raw), expires_at)
+        if self.backend is not None:
+            try:
+                self.backend.put(key, raw, expires_at)
+            except sqlite3.Error:
+                # 共享后端只是加速手段，写入失败（如文件被锁）不影响本次请求
+                pass
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size_bytes = 0
+            self.hits = self.backend_hits = self.misses = 0
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.backend_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "size_bytes": self._size_bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "backend_hits": self.backend_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.backend_hits) / total, 4) if total else 0.0,
+                "backend": self.backend.path if self.backend is not None else None,
+            }
+
+    def _insert(self, key: str, value: Dict[str, Any], size: int, expires_at: float) -> None:
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (expires_at, size, value)
+        self._size_bytes += size
+        while self._size_bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+
+    def _remove(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._size_bytes -= size
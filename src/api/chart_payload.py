@@ -0,0 +1,141 @@
+"""
+排盘响应体的构建
+
+``/api/bazi/chart`` 与批量排盘的子进程共用这里的逻辑，保证两者逐条输出一致。
+模块只依赖排盘引擎与请求模型，子进程导入时不会加载 FastAPI 应用和 LLM 客户端。
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Dict, FrozenSet, Iterable, Optional, Union
+
+from src.api.schemas import ChartRequest, ReportRequest
+from src.engine.bazi_engine import BaziPaipanEngine
+from src.engine.chart_codec import encode_chart
+from src.models.chart import Chart
+
+DESTINY_RELATIONS_MAP_FIELD = "destiny_relations_map"
+# 可选择输出的字段：Chart 的各字段，外加大运关系表
+CHART_PAYLOAD_FIELDS = frozenset(Chart.model_fields) | {DESTINY_RELATIONS_MAP_FIELD}
+
+
+def normalize_fields(fields: Optional[Iterable[str]]) -> Optional[FrozenSet[str]]:
+    """校验并去重字段列表；None 表示输出全部字段"""
+    if fields is None:
+        return None
+    selected = frozenset(field.strip() for field in fields if field.strip())
+    unknown = selected - CHART_PAYLOAD_FIELDS
+    if unknown:
+        raise ValueError(f"未知字段: {', '.join(sorted(unknown))}")
+    return selected
+
+
+def build_solar_datetime(
+    engine: BaziPaipanEngine, payload: Union[ChartRequest, ReportRequest]
+) -> datetime:
+    if payload.calendar == "lunar":
+        return engine.lunar_to_solar(
+            year=payload.year,
+            month=payload.month,
+            day=payload.day,
+            is_leap_month=payload.is_leap_month,
+            hour=payload.hour,
+            minute=payload.minute,
+        )
+    return datetime(payload.year, payload.month, payload.day, payload.hour, payload.minute)
+
+
+def normalize_name(name: Optional[str]) -> Optional[str]:
+    if not name:
+        return None
+    trimmed = name.strip()
+    return trimmed if trimmed else None
+
+
+def chart_as_of(engine: BaziPaipanEngine, as_of: Optional[datetime]) -> datetime:
+    """排盘参考时间取到"参考日"零点，同一天内的请求得到相同的命盘"""
+    as_of = engine.normalize_as_of(as_of)
+    return datetime.combine(as_of.date(), datetime.min.time())
+
+
+def build_destiny_relations_map(engine: BaziPaipanEngine, chart: Chart) -> Dict[str, Any]:
+    destiny_cycle = chart.destiny_cycle
+    if not destiny_cycle or not destiny_cycle.destiny_pillars:
+        return {}
+    day_pillar = chart.day_pillar
+    key_prefix = f"destiny_rel_{day_pillar.heaven_stem.name}{day_pillar.earth_branch.name}_"
+    # 本命关系只算一次，各步大运只增量计算与之相关的关系
+    all_relations = engine.calculate_extra_pillar_relations(
+        chart.year_pillar,
+        chart.month_pillar,
+        chart.day_pillar,
+        chart.hour_pillar,
+        destiny_cycle.destiny_pillars,
+        slot="destiny",
+    )
+    return {
+        f"{key_prefix}{pillar.year}": relations.model_dump()
+        for pillar, relations in zip(destiny_cycle.destiny_pillars, all_relations)
+    }
+
+
+def compute_chart(
+    engine: BaziPaipanEngine,
+    payload: Union[ChartRequest, ReportRequest],
+    solar_datetime: datetime,
+    name: Optional[str],
+    as_of: datetime,
+    fields: Optional[FrozenSet[str]] = None,
+) -> Chart:
+    return engine.calculate_chart(
+        name=name,
+        gender=payload.gender,
+        solar_datetime=solar_datetime,
+        tz_offset_hours=payload.tz_offset_hours,
+        longitude=payload.longitude,
+        latitude=payload.latitude,
+        birth_place=payload.birth_place,
+        as_of=as_of,
+        fields=fields,
+    )
+
+
+def build_chart_payload(
+    engine: BaziPaipanEngine,
+    chart: Chart,
+    fields: Optional[FrozenSet[str]] = None,
+    compact: bool = False,
+) -> Dict[str, Any]:
+    """
+    由命盘生成 {"chart", "destiny_relations_map"} 响应体。
+
+    指定 fields（normalize_fields 的结果）时，命盘只输出所列字段，
+    未列出 destiny_relations_map 时不生成大运关系表。
+    compact 为 True 时命盘输出紧凑编码（见 chart_codec）；紧凑编码总是包含
+    Chart 的必填字段，fields 只决定计算哪些可选字段。
+    """
+    if compact:
+        chart_data: Any = encode_chart(engine, chart)
+    elif fields is None:
+        chart_data = chart.model_dump(mode="json")
+    else:
+        chart_data = chart.model_dump(mode="json", include=set(fields))
+    response: Dict[str, Any] = {"chart": chart_data}
+    if fields is None or DESTINY_RELATIONS_MAP_FIELD in fields:
+        response[DESTINY_RELATIONS_MAP_FIELD] = build_destiny_relations_map(engine, chart)
+    return response
+
+
+def compute_chart_payload(
+    engine: BaziPaipanEngine,
+    payload: Union[ChartRequest, ReportRequest],
+    solar_datetime: datetime,
+    name: Optional[str],
+    as_of: datetime,
+    fields: Optional[FrozenSet[str]] = None,
+    compact: bool = False,
+) -> Dict[str, Any]:
+    """排盘并生成响应体（不经过缓存）；fields 中未列出的可选字段不计算"""
+    chart = compute_chart(engine, payload, solar_datetime, name, as_of, fields=fields)
+    return build_chart_payload(engine, chart, fields=fields, compact=compact)
@@ -0,0 +1,236 @@
+"""
+命盘会话
+
+对话、大运解析等接口原本每一轮都要上传完整的 chart/analysis 字典，服务端再校验一遍。
+这里在排盘/报告接口返回命盘时开启一个会话，以 ``chart_id`` 标识，保存校验后的
+``Chart``、``Analysis`` 以及拼提示词用的字典，后续请求只需携带 chart_id。
+
+chart_id 是命盘紧凑编码的哈希，同一张命盘总是得到同一个 id。会话在进程内按 LRU
+（条目数）+ TTL 保存，访问时顺延过期时间；可选挂一个本地 SQLite 文件保存紧凑编码，
+内存淘汰、进程重启或请求落到其他 worker 时从中恢复。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from src.engine.bazi_engine import BaziPaipanEngine
+from src.engine.chart_codec import decode_chart, encode_chart
+from src.models.analysis import Analysis
+from src.models.chart import Chart
+from src.rules.analysis import evaluate_chart
+
+
+def make_chart_id(chart_json: str) -> str:
+    """命盘 JSON（通常为紧凑编码）-> chart_id（SHA-256 前 32 位十六进制）"""
+    return hashlib.sha256(chart_json.encode("utf-8")).hexdigest()[:32]
+
+
+class ChartSession:
+    """一张命盘的会话；提示词用的字典在首次使用时生成，之后复用（调用方不应修改）"""
+
+    def __init__(self, chart_id: str, chart: Chart, analysis: Optional[Analysis] = None):
+        self.chart_id = chart_id
+        self.chart = chart
+        self._analysis = analysis
+        self._chart_data: Optional[Dict[str, Any]] = None
+        self._analysis_data: Optional[Dict[str, Any]] = None
+
+    @property
+    def analysis(self) -> Analysis:
+        """分析结果；会话由排盘接口开启时按需计算"""
+        if self._analysis is None:
+            self._analysis = evaluate_chart(self.chart)
+        return self._analysis
+
+    @property
+    def has_analysis(self) -> bool:
+        return self._analysis is not None
+
+    def attach_analysis(self, analysis: Analysis) -> None:
+        self._analysis = analysis
+        self._analysis_data = None
+
+    @property
+    def chart_data(self) -> Dict[str, Any]:
+        if self._chart_data is None:
+            self._chart_data = self.chart.model_dump(mode="json")
+        return self._chart_data
+
+    @property
+    def analysis_data(self) -> Dict[str, Any]:
+        if self._analysis_data is None:
+            self._analysis_data = self.analysis.model_dump(mode="json")
+        return self._analysis_data
+
+
+class SQLiteChartSessionBackend:
+    """基于本地 SQLite 文件的会话后端，保存命盘紧凑编码与分析结果。"""
+
+    # 每写入这么多次清理一次过期条目
+    PRUNE_EVERY = 256
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS chart_session ("
+                "chart_id TEXT PRIMARY KEY, chart TEXT NOT NULL, analysis TEXT, expires_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+
+    def get(self, chart_id: str) -> Optional[Tuple[str, Optional[str], float]]:
+        """返回 (紧凑编码 JSON, 分析结果 JSON 或 None, 过期时间戳)；不存在或已过期时返回 None。"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT chart, analysis, expires_at FROM chart_session WHERE chart_id = ? AND expires_at > ?",
+                (chart_id, time.time()),
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0], row[1], float(row[2])
+
+    def put(self, chart_id: str, chart: str, analysis: Optional[str], expires_at: float) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO chart_session (chart_id, chart, analysis, expires_at) VALUES (?, ?, ?, ?)",
+                (chart_id, chart, analysis, expires_at),
+            )
+            self._writes += 1
+            if self._writes % self.PRUNE_EVERY == 0:
+                self._conn.execute("DELETE FROM chart_session WHERE expires_at <= ?", (time.time(),))
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM chart_session")
+            self._conn.commit()
+
+
+class ChartSessionStore:
+    """进程内 LRU + TTL 会话表，容量按会话条数计算。"""
+
+    def __init__(
+        self,
+        engine: BaziPaipanEngine,
+        max_entries: int = 2048,
+        ttl_seconds: float = 86400.0,
+        backend: Optional[SQLiteChartSessionBackend] = None,
+    ):
+        self.engine = engine
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.backend = backend
+        self.hits = 0
+        self.backend_hits = 0
+        self.misses = 0
+        # chart_id -> (过期时间戳, 会话)
+        self._entries: "OrderedDict[str, Tuple[float, ChartSession]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl_seconds > 0
+
+    def open(self, chart: Chart, analysis: Optional[Analysis] = None) -> ChartSession:
+        """
+        为命盘开启会话并返回；同一命盘已有会话时复用并顺延过期时间，
+        新给出的 analysis 会补充到会话中。未启用时返回不入表的会话。
+        """
+        compact: Optional[str]
+        try:
+            compact = json.dumps(encode_chart(self.engine, chart), ensure_ascii=False, separators=(",", ":"))
+            chart_id = make_chart_id(compact)
+        except ValueError:
+            # 非引擎生成、无法紧凑编码的命盘按完整 JSON 计算 id，只保存在内存中
+            compact = None
+            chart_id = make_chart_id(chart.model_dump_json())
+        if not self.enabled:
+            return ChartSession(chart_id, chart, analysis)
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            entry = self._entries.get(chart_id)
+            session = entry[1] if entry is not None else ChartSession(chart_id, chart, analysis)
+            updated = entry is None or (analysis is not None and not session.has_analysis)
+            if analysis is not None and not session.has_analysis:
+                session.attach_analysis(analysis)
+            self._insert(chart_id, session, expires_at)
+        if self.backend is not None and compact is not None and updated:
+            analysis_raw = session.analysis.model_dump_json() if session.has_analysis else None
+            try:
+                self.backend.put(chart_id, compact, analysis_raw, expires_at)
+            except sqlite3.Error:
+                # 共享后端只是加速手段，写入失败不影响本次请求
+                pass
+        return session
+
+    def get(self, chart_id: str) -> Optional[ChartSession]:
+        """取会话并顺延过期时间；不存在、已过期或无法恢复时返回 None"""
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(chart_id)
+            if entry is not None:
+                if entry[0] > now:
+                    self.hits += 1
+                    self._insert(chart_id, entry[1], now + self.ttl_seconds)
+                    return entry[1]
+                del self._entries[chart_id]
+        if self.backend is not None:
+            try:
+                stored = self.backend.get(chart_id)
+            except sqlite3.Error:
+                stored = None
+            if stored is not None:
+                compact, analysis_raw, expires_at = stored
+                try:
+                    chart = decode_chart(self.engine, json.loads(compact))
+                    analysis = Analysis.model_validate_json(analysis_raw) if analysis_raw else None
+                except ValueError:
+                    # 编码版本已更新等原因无法恢复时按不存在处理，由客户端重新提交命盘
+                    chart = None
+                if chart is not None:
+                    session = ChartSession(chart_id, chart, analysis)
+                    with self._lock:
+                        self.backend_hits += 1
+                        self._insert(chart_id, session, max(expires_at, now + self.ttl_seconds))
+                    return session
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.backend_hits = self.misses = 0
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "backend_hits": self.backend_hits,
+                "misses": self.misses,
+                "backend": self.backend.path if self.backend is not None else None,
+            }
+
+    def _insert(self, chart_id: str, session: ChartSession, expires_at: float) -> None:
+        self._entries[chart_id] = (expires_at, session)
+        self._entries.move_to_end(chart_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
@@ -0,0 +1,111 @@
+"""
+入站命盘校验缓存
+
+destiny/报告/通用聊天等接口收到的命盘字典，大多是客户端原样回传的、本服务早先
+返回的命盘。这里按命盘 JSON 的内容哈希缓存校验后的 ``Chart``，同一份字典只完整
+校验一次。
+
+排盘与报告接口返回的命盘另带 ``signature``：``{chart_id}.{HMAC(chart_id, 内容哈希)}``。
+签名有效说明字典由本服务签发且未被改动，直接取 chart_id 对应会话中的 Chart，
+不再校验；签名缺失、无效或会话已失效时按普通字典校验。
+
+内容哈希基于 ``pydantic_core.to_json``（保留键顺序），客户端改动键顺序只会导致
+缓存未命中。缓存返回的 Chart 在多个请求间共享，调用方不应修改。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import hmac
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from pydantic_core import to_json
+
+from src.api.chart_session import ChartSessionStore
+from src.models.chart import Chart
+
+CHART_SIGNATURE_FIELD = "signature"
+
+
+def chart_content_digest(data: Dict[str, Any]) -> str:
+    """命盘字典（不含签名字段）的 SHA-256"""
+    if CHART_SIGNATURE_FIELD in data:
+        data = {key: value for key, value in data.items() if key != CHART_SIGNATURE_FIELD}
+    return hashlib.sha256(to_json(data)).hexdigest()
+
+
+class ChartValidator:
+    """入站命盘字典 -> Chart：内容哈希 LRU + 签名直通会话"""
+
+    def __init__(self, sessions: ChartSessionStore, secret: bytes, max_entries: int = 1024):
+        self.sessions = sessions
+        self.max_entries = max_entries
+        self._secret = secret
+        self.hits = 0
+        self.signed_hits = 0
+        self.misses = 0
+        # 内容哈希 -> Chart
+        self._entries: "OrderedDict[str, Chart]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _mac(self, chart_id: str, digest: str) -> str:
+        message = f"{chart_id}.{digest}".encode("utf-8")
+        return hmac.new(self._secret, message, hashlib.sha256).hexdigest()[:32]
+
+    def sign(self, chart_id: str, chart: Chart, data: Dict[str, Any]) -> Dict[str, Any]:
+        """返回附带签名的命盘字典副本（data 应为 chart.model_dump(mode="json")），并预热缓存"""
+        digest = chart_content_digest(data)
+        self._remember(digest, chart)
+        return {**data, CHART_SIGNATURE_FIELD: f"{chart_id}.{self._mac(chart_id, digest)}"}
+
+    def validate(self, data: Dict[str, Any]) -> Chart:
+        digest = chart_content_digest(data)
+        with self._lock:
+            chart = self._entries.get(digest)
+            if chart is not None:
+                self._entries.move_to_end(digest)
+                self.hits += 1
+                return chart
+        chart = self._signed_chart(data, digest)
+        if chart is not None:
+            with self._lock:
+                self.signed_hits += 1
+        else:
+            chart = Chart.model_validate(data)
+            with self._lock:
+                self.misses += 1
+        self._remember(digest, chart)
+        return chart
+
+    def _signed_chart(self, data: Dict[str, Any], digest: str) -> Optional[Chart]:
+        signature = data.get(CHART_SIGNATURE_FIELD)
+        if not isinstance(signature, str) or "." not in signature:
+            return None
+        chart_id, mac = signature.split(".", 1)
+        if not hmac.compare_digest(mac, self._mac(chart_id, digest)):
+            return None
+        session = self.sessions.get(chart_id)
+        return session.chart if session is not None else None
+
+    def _remember(self, digest: str, chart: Chart) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[digest] = chart
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.signed_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "signed_hits": self.signed_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.signed_hits) / total, 4) if total else 0.0,
+            }
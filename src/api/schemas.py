@@ -1,11 +1,14 @@
 from __future__ import annotations
 
-from typing import Dict, List, Literal, Optional
+from datetime import datetime
+from typing import Any, Dict, List, Literal, Optional, Union
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 
 
 LlmProvider = Literal["local", "openai", "deepseek", "dashscope"]
+# 命盘数据：Chart.model_dump() 的字典，或 /api/bazi/chart?format=compact 返回的紧凑编码数组
+ChartData = Union[Dict, List[Any]]
 
 
 class ChartRequest(BaseModel):
@@ -23,10 +26,18 @@ class ChartRequest(BaseModel):
     birth_place: str = Field("", description="出生地点名称")
     longitude: Optional[float] = Field(None, ge=-180, le=180, description="经度")
     latitude: Optional[float] = Field(None, ge=-90, le=90, description="纬度")
+    as_of: Optional[datetime] = Field(
+        None, description="参考时间，用于判定当前大运/流年；默认为服务器当前时间"
+    )
+    fields: Optional[List[str]] = Field(
+        None,
+        description="只计算并返回的字段：Chart 字段名及 destiny_relations_map；默认返回全部",
+    )
 
 
 class ReportRequest(BaseModel):
-    chart: Optional[Dict] = None
+    chart: Optional[ChartData] = None
+    chart_id: Optional[str] = Field(None, description="命盘会话 ID，代替上传 chart")
     focus: List[str] = Field(default_factory=list, description="用户关注方向，如事业/财富/感情")
     name: Optional[str] = None
     gender: Optional[str] = Field(None, description="male/female")
@@ -42,6 +53,9 @@ class ReportRequest(BaseModel):
     birth_place: str = Field("", description="出生地点名称")
     longitude: Optional[float] = Field(None, ge=-180, le=180, description="经度")
     latitude: Optional[float] = Field(None, ge=-90, le=90, description="纬度")
+    as_of: Optional[datetime] = Field(
+        None, description="参考时间，用于判定当前大运/流年；默认为服务器当前时间"
+    )
 
 
 class ChatTurn(BaseModel):
@@ -49,12 +63,29 @@ class ChatTurn(BaseModel):
     content: str
 
 
-class ChatRequest(BaseModel):
-    chart: Dict
-    analysis: Dict
+class ChartReference(BaseModel):
+    """携带命盘的请求：完整命盘数据，或排盘/报告接口返回的 chart_id（二选一）"""
+    chart: Optional[ChartData] = Field(None, description="命盘数据（字典或紧凑编码）")
+    chart_id: Optional[str] = Field(None, description="命盘会话 ID，由 /api/bazi/chart 或报告接口返回")
+
+    @model_validator(mode="after")
+    def _check_chart(self) -> "ChartReference":
+        if self.chart is None and not self.chart_id:
+            raise ValueError("需要提供 chart 或 chart_id")
+        return self
+
+
+class ChatRequest(ChartReference):
+    analysis: Optional[Dict] = Field(None, description="分析结果；携带 chart_id 时默认取会话中的分析")
     history: List[ChatTurn]
     focus: List[str] = Field(default_factory=list)
 
+    @model_validator(mode="after")
+    def _check_analysis(self) -> "ChatRequest":
+        if not self.chart_id and self.analysis is None:
+            raise ValueError("未提供 chart_id 时需要同时提供 chart 与 analysis")
+        return self
+
 
 class GeneralChatRequest(BaseModel):
     """通用聊天请求（无需命盘）"""
@@ -69,7 +100,8 @@ class GeneralChatRequest(BaseModel):
     subject_birth: Optional[str] = Field(None, description="命主出生日期文本（简化：一段字符串即可）")
     subject_gender: Optional[str] = Field(None, description="命主性别（简化：男/女/其他）")
     subject_destiny: Optional[str] = Field(None, description="十年大运列表（简化：年份 + 干支）")
-    subject_chart: Optional[Dict] = Field(None, description="命盘原始数据（前端档案）")
+    subject_chart: Optional[ChartData] = Field(None, description="命盘原始数据（前端档案）")
+    subject_chart_id: Optional[str] = Field(None, description="命盘会话 ID，代替上传 subject_chart")
     # 可选：思考模式（云端 openai 兼容：enable_thinking）
     deep_think: bool = Field(False, description="是否启用思考模式（openai 有效）")
 
@@ -82,6 +114,28 @@ class PillarSearchRequest(BaseModel):
     hour_pillar: str = Field(..., min_length=2, max_length=2, description="时柱（如：丁卯）")
     start_year: int = Field(1801, ge=1800, le=2200, description="查找起始年份")
     end_year: int = Field(2099, ge=1800, le=2200, description="查找结束年份")
+    solver: Literal["index", "cycle", "scan"] = Field(
+        "index", description="反查方式：index(倒排索引)/cycle(六十日周期推算)/scan(逐日比对)"
+    )
+
+
+class CalendarConvertRequest(BaseModel):
+    """批量历法转换请求：年/月/日按下标一一对应"""
+    calendar: Literal["solar", "lunar"] = Field("solar", description="输入历法")
+    years: List[int] = Field(..., description="年份列表")
+    months: List[int] = Field(..., description="月份列表")
+    days: List[int] = Field(..., description="日期列表")
+    is_leap_months: Optional[List[bool]] = Field(None, description="农历是否闰月，默认均为非闰月")
+    stream: bool = Field(False, description="是否以 NDJSON 逐条流式返回")
+
+    @model_validator(mode="after")
+    def _check_lengths(self) -> "CalendarConvertRequest":
+        lengths = {len(self.years), len(self.months), len(self.days)}
+        if self.is_leap_months is not None:
+            lengths.add(len(self.is_leap_months))
+        if len(lengths) != 1:
+            raise ValueError("years/months/days/is_leap_months 长度必须一致")
+        return self
 
 
 class FeedbackRequest(BaseModel):
@@ -91,24 +145,26 @@ class FeedbackRequest(BaseModel):
     feedback: Optional[Literal["like", "dislike"]] = Field(None, description="反馈类型，null 表示取消反馈")
 
 
-class EnergyAnalysisRequest(BaseModel):
+class EnergyAnalysisRequest(ChartReference):
     """五行能量智能分析请求"""
-    chart: Dict = Field(..., description="命盘数据")
 
 
-class DestinyAnalysisRequest(BaseModel):
+class DestinyAnalysisRequest(ChartReference):
     """大运智能解析请求"""
-    chart: Dict = Field(..., description="命盘数据")
     destiny_pillar: Dict = Field(..., description="大运柱信息")
 
 
-class DestinyAnalysisBatchRequest(BaseModel):
+class DestinyAnalysisBatchRequest(ChartReference):
     """多条大运智能解析请求"""
-    chart: Dict = Field(..., description="命盘数据")
     destiny_pillars: List[Dict] = Field(..., description="大运柱信息列表")
 
 
-class DestinyRelationsRequest(BaseModel):
+class DestinyRelationsRequest(ChartReference):
     """大运与本命干支关系请求"""
-    chart: Dict = Field(..., description="命盘数据")
     destiny_pillar: Dict = Field(..., description="大运柱信息")
+
+
+class AnnualTimelineRequest(ChartReference):
+    """流年时间线请求"""
+    start_year: Optional[int] = Field(None, description="起始年份（含），默认为出生年")
+    end_year: Optional[int] = Field(None, description="结束年份（含），默认为起始年后 100 年")
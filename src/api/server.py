@@ -1,37 +1,71 @@
 from __future__ import annotations
 
+import asyncio
+import http.client
 import json
 import os
 import re
+import tempfile
 import time
-import urllib.error
-import urllib.request
+from contextlib import aclosing
 from datetime import datetime
 from logging.handlers import RotatingFileHandler
 from pathlib import Path
-from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Literal, Optional, Union
 from uuid import uuid4
 
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 
 import logging
 
 from src.api.schemas import (
+    ChartData,
+    ChartReference,
     ChartRequest,
     ChatRequest,
     ReportRequest,
     PillarSearchRequest,
+    CalendarConvertRequest,
     GeneralChatRequest,
     FeedbackRequest,
     EnergyAnalysisRequest,
     DestinyAnalysisRequest,
     DestinyAnalysisBatchRequest,
     DestinyRelationsRequest,
+    AnnualTimelineRequest,
 )
+from src.api.batch_charts import ChartBatchRunner
+from src.api.chart_cache import ChartCache, SQLiteChartCacheBackend, make_chart_cache_key
+from src.api.chart_payload import (
+    build_chart_payload,
+    build_solar_datetime,
+    chart_as_of,
+    compute_chart,
+    normalize_fields,
+    normalize_name,
+)
+from src.api.chart_session import ChartSession, ChartSessionStore, SQLiteChartSessionBackend
+from src.api.chart_validation import CHART_SIGNATURE_FIELD, ChartValidator
 from src.engine.bazi_engine import BaziPaipanEngine
+from src.engine.chart_codec import decode_chart, is_compact_chart
 from src.knowledge.base import retrieve_knowledge
-from src.llm import LLMError, chat, chat_with_usage, stream_chat_with_reasoning
+from src.llm import ChatChunk, LLMError, achat_with_usage, astream_chat_with_reasoning, chat
+from src.llm.http_pool import HTTPStatusError
+from src.llm.ollama_client import (
+    aclose_async_pool as aclose_ollama_async_pool,
+    async_pool_stats as ollama_async_pool_stats,
+    close_pool as close_ollama_pool,
+    pool_stats as ollama_pool_stats,
+    post_json as ollama_post_json,
+)
+from src.llm.openai_client import (
+    aclose_async_pool as aclose_openai_async_pool,
+    async_pool_stats as openai_async_pool_stats,
+    close_pool as close_openai_pool,
+    pool_stats as openai_pool_stats,
+)
 from src.models.chart import Chart, GanZhiRelations, PillarInfo
 from src.api.energy_prompt import build_energy_analysis_schema
 from src.api.destiny_prompt import build_destiny_analysis_schema, build_destiny_analysis_batch_schema
@@ -41,7 +75,6 @@ from src.prompt.report_prompt import (
     build_report_prompt,
     build_report_stream_prompt,
 )
-from src.rules.analysis import evaluate_chart
 
 root_logger = logging.getLogger()
 if not root_logger.handlers:
@@ -103,6 +136,53 @@ def _ensure_ai_loggers() -> tuple[logging.Logger, logging.Logger]:
 
 AI_METRICS_LOGGER, AI_CONTENT_LOGGER = _ensure_ai_loggers()
 
+CHART_CACHE_MAX_BYTES = int(os.getenv("CHART_CACHE_MAX_BYTES", str(64 * 1024 * 1024)) or "0")
+CHART_CACHE_TTL_SECONDS = float(os.getenv("CHART_CACHE_TTL_SECONDS", "3600") or "0")
+CHART_CACHE_SQLITE_PATH = os.getenv("CHART_CACHE_SQLITE_PATH", "").strip()
+
+chart_cache = ChartCache(
+    max_bytes=CHART_CACHE_MAX_BYTES,
+    ttl_seconds=CHART_CACHE_TTL_SECONDS,
+    backend=SQLiteChartCacheBackend(CHART_CACHE_SQLITE_PATH) if CHART_CACHE_SQLITE_PATH else None,
+)
+
+# 命盘会话：条目数上限、TTL（访问时顺延）与可选的 SQLite 后端
+CHART_SESSION_MAX_ENTRIES = int(os.getenv("CHART_SESSION_MAX_ENTRIES", "2048") or "0")
+CHART_SESSION_TTL_SECONDS = float(os.getenv("CHART_SESSION_TTL_SECONDS", "86400") or "0")
+CHART_SESSION_SQLITE_PATH = os.getenv("CHART_SESSION_SQLITE_PATH", "").strip()
+
+chart_sessions = ChartSessionStore(
+    engine,
+    max_entries=CHART_SESSION_MAX_ENTRIES,
+    ttl_seconds=CHART_SESSION_TTL_SECONDS,
+    backend=SQLiteChartSessionBackend(CHART_SESSION_SQLITE_PATH) if CHART_SESSION_SQLITE_PATH else None,
+)
+
+# 入站命盘校验缓存：条目数上限与签名密钥（未配置时每个进程随机生成，签名只在本进程内有效）
+CHART_VALIDATION_CACHE_ENTRIES = int(os.getenv("CHART_VALIDATION_CACHE_ENTRIES", "1024") or "0")
+CHART_SIGNING_KEY = os.getenv("CHART_SIGNING_KEY", "").strip()
+
+chart_validator = ChartValidator(
+    chart_sessions,
+    secret=CHART_SIGNING_KEY.encode("utf-8") if CHART_SIGNING_KEY else os.urandom(32),
+    max_entries=CHART_VALIDATION_CACHE_ENTRIES,
+)
+
+# 批量排盘：子进程数（0 为 CPU 核数，负数为不用进程池）、每块行数、在途块数上限
+CHART_BATCH_WORKERS = int(os.getenv("CHART_BATCH_WORKERS", "0") or "0")
+CHART_BATCH_CHUNK_SIZE = int(os.getenv("CHART_BATCH_CHUNK_SIZE", "32") or "32")
+CHART_BATCH_MAX_IN_FLIGHT = int(os.getenv("CHART_BATCH_MAX_IN_FLIGHT", "0") or "0")
+# 报告流发出 report_done 后，最多再等这么多秒读取服务商在流末尾返回的用量（只影响指标日志）
+REPORT_USAGE_WAIT_SECONDS = float(os.getenv("REPORT_USAGE_WAIT_SECONDS", "3") or "0")
+# 请求体超过该大小后暂存到临时文件
+CHART_BATCH_SPOOL_BYTES = 1024 * 1024
+
+chart_batch_runner = ChartBatchRunner(
+    workers=CHART_BATCH_WORKERS,
+    chunk_size=CHART_BATCH_CHUNK_SIZE,
+    max_in_flight=CHART_BATCH_MAX_IN_FLIGHT,
+)
+
 
 def _now_iso() -> str:
     return datetime.now().isoformat(timespec="seconds")
@@ -142,6 +222,62 @@ def _build_dev_info(
     }
 
 
+class _StreamMetrics:
+    """
+    流式调用的首字延迟、生成速度与 token 用量。
+
+    用量优先取服务商在流末尾返回的实际值（ChatChunk.usage），服务商未返回时才按字数估算。
+    """
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.first_token_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.usage: Optional[Dict[str, int]] = None
+
+    def observe(self, chunk: ChatChunk) -> None:
+        if self.first_token_at is None and (chunk.content or chunk.reasoning):
+            self.first_token_at = time.perf_counter()
+        if chunk.usage:
+            self.usage = chunk.usage
+
+    def finish(self) -> None:
+        """标记输出结束；之后只补收用量，耗时与生成速度按此刻计算"""
+        if self.finished_at is None:
+            self.finished_at = time.perf_counter()
+
+    def token_counts(self, prompt_text: str, completion_chars: int) -> tuple[int, int, int]:
+        """(prompt, completion, total)；completion_chars 为可见回复与思考内容的总字数"""
+        if self.usage:
+            return self.usage["prompt_tokens"], self.usage["completion_tokens"], self.usage["total_tokens"]
+        prompt_tokens = _estimate_tokens(prompt_text)
+        completion_tokens = max(1, (completion_chars + 3) // 4)
+        return prompt_tokens, completion_tokens, prompt_tokens + completion_tokens
+
+    def log_fields(self, prompt_text: str, completion_chars: int) -> Dict[str, Any]:
+        """ai-metrics 日志字段；估算值以 *_est 记录，便于与实际用量区分"""
+        prompt_tokens, completion_tokens, total_tokens = self.token_counts(prompt_text, completion_chars)
+        suffix = "" if self.usage else "_est"
+        now = self.finished_at if self.finished_at is not None else time.perf_counter()
+        ttft_ms = None
+        tokens_per_sec = None
+        if self.first_token_at is not None:
+            ttft_ms = int((self.first_token_at - self.started) * 1000)
+            generating = now - self.first_token_at
+            if generating > 0:
+                tokens_per_sec = round(completion_tokens / generating, 2)
+        return {
+            "elapsed_ms": int((now - self.started) * 1000),
+            "ttft_ms": ttft_ms,
+            "tokens_per_sec": tokens_per_sec,
+            "usage": {
+                f"prompt_tokens{suffix}": prompt_tokens,
+                f"completion_tokens{suffix}": completion_tokens,
+                f"total_tokens{suffix}": total_tokens,
+            },
+        }
+
+
 def _truncate_text(text: str, max_chars: int = AI_LOG_MAX_CHARS) -> str:
     if not text:
         return ""
@@ -240,44 +376,163 @@ def _resolve_feature_enable_thinking(
     return _resolve_enable_thinking(provider)
 
 
-def _build_solar_datetime(payload: Union[ChartRequest, ReportRequest]) -> datetime:
-    if payload.calendar == "lunar":
-        return engine.lunar_to_solar(
-            year=payload.year,
-            month=payload.month,
-            day=payload.day,
-            is_leap_month=payload.is_leap_month,
-            hour=payload.hour,
-            minute=payload.minute,
-        )
-    return datetime(payload.year, payload.month, payload.day, payload.hour, payload.minute)
-
-
-def _normalize_name(name: Optional[str]) -> Optional[str]:
-    if not name:
-        return None
-    trimmed = name.strip()
-    return trimmed if trimmed else None
-
-
-@app.post("/api/bazi/chart")
-def generate_chart(payload: ChartRequest):
-    solar_datetime = _build_solar_datetime(payload)
-    chart = engine.calculate_chart(
-        name=_normalize_name(payload.name),
-        gender=payload.gender,
+def _build_chart_response(
+    payload: Union[ChartRequest, ReportRequest], compact: bool = False
+) -> Dict[str, Any]:
+    """排盘并生成 /api/bazi/chart 响应体，按规范化后的出生信息走缓存"""
+    solar_datetime = build_solar_datetime(engine, payload)
+    name = normalize_name(payload.name)
+    try:
+        fields = normalize_fields(getattr(payload, "fields", None))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    # 缓存粒度为"参考日"：命中与否都按当天零点排盘，保证结果只取决于缓存键
+    as_of = chart_as_of(engine, payload.as_of)
+    cache_key = make_chart_cache_key(
         solar_datetime=solar_datetime,
+        gender=payload.gender,
         tz_offset_hours=payload.tz_offset_hours,
         longitude=payload.longitude,
         latitude=payload.latitude,
+        as_of_day=as_of.date(),
+        name=name,
         birth_place=payload.birth_place,
+        fields=fields,
+        compact=compact,
     )
-    destiny_relations_map = _build_destiny_relations_map(chart)
-    return {"chart": chart.model_dump(), "destiny_relations_map": destiny_relations_map}
+    cached = chart_cache.get(cache_key)
+    if cached is not None:
+        if "chart_id" in cached and chart_sessions.enabled:
+            # 会话可能已被淘汰而响应缓存仍在，确保返回的 chart_id 可用
+            _chart_response_session(cached)
+        return cached
+    chart = compute_chart(engine, payload, solar_datetime, name, as_of, fields=fields)
+    response = build_chart_payload(engine, chart, fields=fields, compact=compact)
+    if fields is None:
+        # 只有完整命盘才开启会话；按字段裁剪的命盘不能代替完整命盘参与对话
+        chart_id = chart_sessions.open(chart).chart_id
+        if not compact:
+            response["chart"] = chart_validator.sign(chart_id, chart, response["chart"])
+        response["chart_id"] = chart_id
+    chart_cache.put(cache_key, response)
+    return response
+
+
+def _chart_response_session(response: Dict[str, Any]) -> ChartSession:
+    """排盘响应对应的会话；已失效时由响应中的命盘重新开启"""
+    session = chart_sessions.get(response["chart_id"])
+    if session is None:
+        session = chart_sessions.open(_load_chart(response["chart"]))
+    return session
+
+
+def _get_chart_session(chart_id: str) -> ChartSession:
+    session = chart_sessions.get(chart_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="命盘会话不存在或已过期，请重新提交命盘")
+    return session
+
+
+def _request_session(payload: ChartReference) -> Optional[ChartSession]:
+    """请求携带 chart_id 时取对应会话（不存在时 404），否则返回 None 由调用方解析 chart"""
+    return _get_chart_session(payload.chart_id) if payload.chart_id else None
+
+
+@app.post("/api/bazi/chart")
+def generate_chart(
+    payload: ChartRequest,
+    chart_format: Literal["json", "compact"] = Query("json", alias="format"),
+):
+    """
+    排盘；format=compact 时命盘以紧凑编码返回（见 src/engine/chart_codec.py）。
+    未指定 fields 时响应附带 chart_id，后续对话/解析请求可用它代替上传命盘。
+    """
+    return _build_chart_response(payload, compact=chart_format == "compact")
+
+
+def _load_chart(chart_data: ChartData) -> Chart:
+    """
+    请求中的命盘数据 -> Chart，同时接受字典与紧凑编码。
+
+    字典经 chart_validator 校验（带缓存），返回的 Chart 可能与其他请求共享，不应修改。
+    """
+    if is_compact_chart(chart_data):
+        return decode_chart(engine, chart_data)
+    return chart_validator.validate(chart_data)
+
+
+def _signed_chart_data(chart: Chart, chart_id: str) -> Dict[str, Any]:
+    """返回给客户端的完整命盘附带签名，原样回传时可免校验"""
+    return chart_validator.sign(chart_id, chart, chart.model_dump(mode="json"))
+
+
+def _chart_dict(chart_data: ChartData, chart: Optional[Chart] = None) -> Dict[str, Any]:
+    """
+    提示词按字典读取命盘：紧凑编码展开为 Chart.model_dump(mode="json") 的形式，
+    字典去掉签名字段后返回。已解码的 chart 可一并传入，避免重复解码。
+    """
+    if not is_compact_chart(chart_data):
+        if CHART_SIGNATURE_FIELD in chart_data:
+            return {key: value for key, value in chart_data.items() if key != CHART_SIGNATURE_FIELD}
+        return chart_data
+    return (chart or decode_chart(engine, chart_data)).model_dump(mode="json")
+
+
+@app.post("/api/bazi/charts:batch")
+async def generate_charts_batch(request: Request):
+    """
+    批量排盘：请求体为 NDJSON（每行一个 ChartRequest），按输入顺序逐行返回 NDJSON。
+
+    当前 Starlette 的 StreamingResponse 会在响应期间读取 receive() 检测断开，
+    因此先把请求体读完（超过 1 MiB 落盘），再开始流式输出。
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=CHART_BATCH_SPOOL_BYTES)
+    async for chunk in request.stream():
+        spool.write(chunk)
+    spool.seek(0)
+
+    async def _line_stream() -> AsyncIterator[str]:
+        try:
+            async for text in chart_batch_runner.stream(spool):
+                yield text
+        finally:
+            spool.close()
+
+    return StreamingResponse(_line_stream(), media_type="application/x-ndjson")
+
+
+@app.on_event("shutdown")
+def _shutdown_chart_batch_runner() -> None:
+    chart_batch_runner.shutdown()
+
+
+@app.on_event("shutdown")
+async def _close_llm_pools() -> None:
+    close_openai_pool()
+    close_ollama_pool()
+    await aclose_openai_async_pool()
+    await aclose_ollama_async_pool()
+
+
+@app.get("/api/cache/stats")
+def cache_stats():
+    """排盘结果缓存、命盘会话、干支关系缓存的命中统计，以及大模型连接池统计"""
+    return {
+        "chart": chart_cache.stats(),
+        "sessions": chart_sessions.stats(),
+        "validation": chart_validator.stats(),
+        "relations": engine.relation_cache.stats(),
+        "llm_connections": {
+            "openai": openai_pool_stats(),
+            "ollama": ollama_pool_stats(),
+            "openai_async": openai_async_pool_stats(),
+            "ollama_async": ollama_async_pool_stats(),
+        },
+    }
 
 
 @app.post("/api/bazi/report")
-def generate_report(payload: ReportRequest):
+async def generate_report(payload: ReportRequest):
     request_id = str(uuid4())
     _log_ai_content(
         {
@@ -287,7 +542,7 @@ def generate_report(payload: ReportRequest):
             "payload": payload.model_dump(mode="json"),
         }
     )
-    chart, analysis, knowledge, prompt = _prepare_report_context(payload)
+    chart, analysis, knowledge, prompt, chart_id = await run_in_threadpool(_prepare_report_context, payload)
     messages = _build_llm_messages(prompt)
 
     try:
@@ -297,7 +552,7 @@ def generate_report(payload: ReportRequest):
         timeout = _resolve_llm_timeout("report")
         enable_thinking = _resolve_feature_enable_thinking("report", provider)
         start_time = time.perf_counter()
-        raw_text, usage = chat_with_usage(
+        raw_text, usage = await achat_with_usage(
             messages,
             provider=provider,
             model=model,
@@ -356,7 +611,8 @@ def generate_report(payload: ReportRequest):
         }
     )
     return {
-        "chart": chart.model_dump(),
+        "chart": _signed_chart_data(chart, chart_id),
+        "chart_id": chart_id,
         "analysis": analysis.model_dump(),
         "knowledge": [k.model_dump() for k in knowledge],
         "prompt": prompt,
@@ -365,7 +621,7 @@ def generate_report(payload: ReportRequest):
 
 
 @app.post("/api/bazi/report/stream")
-def generate_report_stream(payload: ReportRequest):
+async def generate_report_stream(payload: ReportRequest):
     report_id = str(uuid4())
     request_id = str(uuid4())
     _log_ai_content(
@@ -377,8 +633,10 @@ def generate_report_stream(payload: ReportRequest):
             "payload": payload.model_dump(mode="json"),
         }
     )
-    chart, analysis, knowledge, prompt = _prepare_report_context(
-        payload, prompt_builder=lambda c, a, k, f: build_report_stream_prompt(c, a, k, f, report_id)
+    chart, analysis, knowledge, prompt, chart_id = await run_in_threadpool(
+        _prepare_report_context,
+        payload,
+        prompt_builder=lambda c, a, k, f: build_report_stream_prompt(c, a, k, f, report_id),
     )
     messages = _build_llm_messages(prompt)
     provider = _resolve_llm_provider()
@@ -387,8 +645,8 @@ def generate_report_stream(payload: ReportRequest):
     timeout = _resolve_llm_timeout("report")
     enable_thinking = _resolve_feature_enable_thinking("report", provider)
 
-    def _event_stream() -> Iterator[str]:
-        stream_start = time.perf_counter()
+    async def _event_stream() -> AsyncIterator[str]:
+        metrics = _StreamMetrics()
         prompt_text = json.dumps(messages, ensure_ascii=False)
         stream_stats = {
             "thinking_chars": 0,
@@ -409,7 +667,8 @@ def generate_report_stream(payload: ReportRequest):
         meta = {
             "type": "meta",
             "report_id": report_id,
-            "chart": chart.model_dump(mode="json"),
+            "chart": _signed_chart_data(chart, chart_id),
+            "chart_id": chart_id,
             "analysis": analysis.model_dump(mode="json"),
             "knowledge": [k.model_dump() for k in knowledge],
             "prompt": prompt,
@@ -421,163 +680,181 @@ def generate_report_stream(payload: ReportRequest):
         expected_section_index = 0
         last_seq: Dict[str, int] = {}
         saw_report_done = False
+        report_done_event: Optional[Dict[str, Any]] = None
         thinking_chunks: List[str] = []
+
+        def _report_done_sse(normalized: Dict[str, Any]) -> str:
+            metrics.finish()
+            normalized.setdefault("thinking", "".join(thinking_chunks).strip() if thinking_chunks else "")
+            completion_chars = stream_stats["delta_chars"] + stream_stats["thinking_chars"]
+            prompt_tokens, completion_tokens, total_tokens = metrics.token_counts(prompt_text, completion_chars)
+            normalized.setdefault(
+                "dev_info",
+                {
+                    "elapsed_ms": int((metrics.finished_at - metrics.started) * 1000),
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": total_tokens,
+                },
+            )
+            _log_ai_content(
+                {
+                    "kind": "stream_report_done",
+                    "endpoint": "/api/bazi/report/stream",
+                    "request_id": request_id,
+                    "report_id": report_id,
+                    "report": normalized.get("report"),
+                }
+            )
+            return _sse_pack(normalized)
+
+        def _log_stream_done() -> None:
+            completion_chars = stream_stats["delta_chars"] + stream_stats["thinking_chars"]
+            _log_ai_metrics(
+                {
+                    "kind": "stream_done",
+                    "endpoint": "/api/bazi/report/stream",
+                    "request_id": request_id,
+                    "report_id": report_id,
+                    "provider": provider,
+                    "model": model or "default",
+                    "enable_thinking": enable_thinking,
+                    "temperature": temperature,
+                    "timeout": timeout,
+                    **metrics.log_fields(prompt_text, completion_chars),
+                    "stream": stream_stats,
+                }
+            )
+
+        async def _await_usage(chunks: AsyncIterator[ChatChunk]) -> None:
+            async for chunk in chunks:
+                metrics.observe(chunk)
+
         try:
-            for chunk in stream_chat_with_reasoning(
-                messages,
-                provider=provider,
-                model=model,
-                temperature=temperature,
-                enable_thinking=enable_thinking,
-                timeout=timeout,
-            ):
-                if chunk.reasoning:
-                    thinking_chunks.append(chunk.reasoning)
-                    stream_stats["thinking_chars"] += len(chunk.reasoning)
-                    yield _sse_pack(
-                        {"type": "thinking_delta", "report_id": report_id, "text": chunk.reasoning}
-                    )
-                if chunk.content:
-                    buffer += chunk.content
-
-                    while True:
-                        newline_index = buffer.find("\n")
-                        if newline_index == -1:
-                            break
-                        line = buffer[:newline_index]
-                        buffer = buffer[newline_index + 1 :]
-
-                        trimmed = line.strip()
-                        if not trimmed:
-                            continue
-
-                        event = _parse_report_event_json_line(trimmed, report_id)
-                        if not event.get("ok"):
-                            _log_ai_metrics(
-                                {
-                                    "kind": "stream_error",
-                                    "endpoint": "/api/bazi/report/stream",
-                                    "request_id": request_id,
-                                    "report_id": report_id,
-                                    "message": str(
-                                        event.get("message") or "模型输出不符合事件协议（非JSON行）"
-                                    ),
-                                }
-                            )
-                            yield _sse_pack(
-                                {
-                                    "type": "error",
-                                    "report_id": report_id,
-                                    "message": str(event.get("message") or "模型输出不符合事件协议"),
-                                    "recoverable": False,
-                                }
-                            )
-                            return
-
-                        data = event["event"]
-                        validated = _validate_and_normalize_report_event(
-                            data=data,
-                            report_id=report_id,
-                            sections_plan=REPORT_SECTIONS_PLAN,
-                            expected_section_index=expected_section_index,
-                            current_section=current_section,
-                            last_seq=last_seq,
+            async with aclosing(
+                astream_chat_with_reasoning(
+                    messages,
+                    provider=provider,
+                    model=model,
+                    temperature=temperature,
+                    enable_thinking=enable_thinking,
+                    timeout=timeout,
+                )
+            ) as chunks:
+                async for chunk in chunks:
+                    metrics.observe(chunk)
+                    if chunk.reasoning:
+                        thinking_chunks.append(chunk.reasoning)
+                        stream_stats["thinking_chars"] += len(chunk.reasoning)
+                        yield _sse_pack(
+                            {"type": "thinking_delta", "report_id": report_id, "text": chunk.reasoning}
                         )
-                        if not validated.get("ok"):
-                            _log_ai_metrics(
-                                {
-                                    "kind": "stream_error",
-                                    "endpoint": "/api/bazi/report/stream",
-                                    "request_id": request_id,
-                                    "report_id": report_id,
-                                    "message": str(
-                                        validated.get("message") or "模型输出不符合事件协议（字段校验失败）"
-                                    ),
-                                }
-                            )
-                            yield _sse_pack(
-                                {
-                                    "type": "error",
-                                    "report_id": report_id,
-                                    "message": str(
-                                        validated.get("message") or "模型输出不符合事件协议"
-                                    ),
-                                    "recoverable": False,
-                                }
-                            )
-                            return
-
-                        extra_events = validated.get("extra_events") or []
-                        events_to_emit = [*extra_events, validated["event"]]
-
-                        current_section = validated.get("current_section")
-                        expected_section_index = int(validated.get("expected_section_index", 0))
-
-                        for normalized in events_to_emit:
-                            stream_stats["events_total"] += 1
-                            stream_stats["last_section_id"] = normalized.get("section_id")
-
-                            if normalized.get("type") == "section_delta":
-                                delta_text = normalized.get("delta")
-                                if isinstance(delta_text, str):
-                                    stream_stats["delta_chars"] += len(delta_text)
-                            if normalized.get("type") == "section_done":
-                                stream_stats["sections_done"] += 1
-
-                            if normalized.get("type") == "report_done":
-                                saw_report_done = True
-                                normalized.setdefault(
-                                    "thinking",
-                                    "".join(thinking_chunks).strip() if thinking_chunks else "",
-                                )
-                                elapsed_ms = int((time.perf_counter() - stream_start) * 1000)
-                                prompt_tokens_est = _estimate_tokens(prompt_text)
-                                completion_tokens_est = max(
-                                    1,
-                                    (stream_stats["delta_chars"] + stream_stats["thinking_chars"] + 3) // 4,
+                    if chunk.content:
+                        buffer += chunk.content
+
+                        while True:
+                            newline_index = buffer.find("\n")
+                            if newline_index == -1:
+                                break
+                            line = buffer[:newline_index]
+                            buffer = buffer[newline_index + 1 :]
+
+                            trimmed = line.strip()
+                            if not trimmed:
+                                continue
+
+                            event = _parse_report_event_json_line(trimmed, report_id)
+                            if not event.get("ok"):
+                                _log_ai_metrics(
+                                    {
+                                        "kind": "stream_error",
+                                        "endpoint": "/api/bazi/report/stream",
+                                        "request_id": request_id,
+                                        "report_id": report_id,
+                                        "message": str(
+                                            event.get("message") or "模型输出不符合事件协议（非JSON行）"
+                                        ),
+                                    }
                                 )
-                                normalized.setdefault(
-                                    "dev_info",
+                                yield _sse_pack(
                                     {
-                                        "elapsed_ms": elapsed_ms,
-                                        "prompt_tokens": prompt_tokens_est,
-                                        "completion_tokens": completion_tokens_est,
-                                        "total_tokens": prompt_tokens_est + completion_tokens_est,
-                                    },
+                                        "type": "error",
+                                        "report_id": report_id,
+                                        "message": str(event.get("message") or "模型输出不符合事件协议"),
+                                        "recoverable": False,
+                                    }
                                 )
+                                return
+
+                            data = event["event"]
+                            validated = _validate_and_normalize_report_event(
+                                data=data,
+                                report_id=report_id,
+                                sections_plan=REPORT_SECTIONS_PLAN,
+                                expected_section_index=expected_section_index,
+                                current_section=current_section,
+                                last_seq=last_seq,
+                            )
+                            if not validated.get("ok"):
                                 _log_ai_metrics(
                                     {
-                                        "kind": "stream_done",
+                                        "kind": "stream_error",
                                         "endpoint": "/api/bazi/report/stream",
                                         "request_id": request_id,
                                         "report_id": report_id,
-                                        "provider": provider,
-                                        "model": model or "default",
-                                        "enable_thinking": enable_thinking,
-                                        "temperature": temperature,
-                                        "timeout": timeout,
-                                        "elapsed_ms": elapsed_ms,
-                                        "usage": {
-                                            "prompt_tokens_est": prompt_tokens_est,
-                                            "completion_tokens_est": completion_tokens_est,
-                                            "total_tokens_est": prompt_tokens_est + completion_tokens_est,
-                                        },
-                                        "stream": stream_stats,
+                                        "message": str(
+                                            validated.get("message") or "模型输出不符合事件协议（字段校验失败）"
+                                        ),
                                     }
                                 )
-                                _log_ai_content(
+                                yield _sse_pack(
                                     {
-                                        "kind": "stream_report_done",
-                                        "endpoint": "/api/bazi/report/stream",
-                                        "request_id": request_id,
+                                        "type": "error",
                                         "report_id": report_id,
-                                        "report": normalized.get("report"),
+                                        "message": str(
+                                            validated.get("message") or "模型输出不符合事件协议"
+                                        ),
+                                        "recoverable": False,
                                     }
                                 )
-                                yield _sse_pack(normalized)
                                 return
 
-                            yield _sse_pack(normalized)
+                            extra_events = validated.get("extra_events") or []
+                            events_to_emit = [*extra_events, validated["event"]]
+
+                            current_section = validated.get("current_section")
+                            expected_section_index = int(validated.get("expected_section_index", 0))
+
+                            for normalized in events_to_emit:
+                                stream_stats["events_total"] += 1
+                                stream_stats["last_section_id"] = normalized.get("section_id")
+
+                                if normalized.get("type") == "section_delta":
+                                    delta_text = normalized.get("delta")
+                                    if isinstance(delta_text, str):
+                                        stream_stats["delta_chars"] += len(delta_text)
+                                if normalized.get("type") == "section_done":
+                                    stream_stats["sections_done"] += 1
+
+                                if normalized.get("type") == "report_done":
+                                    saw_report_done = True
+                                    report_done_event = normalized
+                                    break
+
+                                yield _sse_pack(normalized)
+                            if saw_report_done:
+                                break
+                    if saw_report_done:
+                        break
+                if report_done_event is not None:
+                    # report_done 立即发给前端；之后最多再等几秒读取流末尾的实际用量，只用于指标日志
+                    yield _report_done_sse(report_done_event)
+                    try:
+                        await asyncio.wait_for(_await_usage(chunks), REPORT_USAGE_WAIT_SECONDS)
+                    except (asyncio.TimeoutError, LLMError):
+                        pass
+                    _log_stream_done()
+                    return
         except LLMError as exc:
             _log_ai_metrics(
                 {
@@ -637,55 +914,8 @@ def generate_report_stream(payload: ReportRequest):
 
                     if normalized.get("type") == "report_done":
                         saw_report_done = True
-                        normalized.setdefault(
-                            "thinking", "".join(thinking_chunks).strip() if thinking_chunks else ""
-                        )
-                        elapsed_ms = int((time.perf_counter() - stream_start) * 1000)
-                        prompt_tokens_est = _estimate_tokens(prompt_text)
-                        completion_tokens_est = max(
-                            1,
-                            (stream_stats["delta_chars"] + stream_stats["thinking_chars"] + 3)
-                            // 4,
-                        )
-                        normalized.setdefault(
-                            "dev_info",
-                            {
-                                "elapsed_ms": elapsed_ms,
-                                "prompt_tokens": prompt_tokens_est,
-                                "completion_tokens": completion_tokens_est,
-                                "total_tokens": prompt_tokens_est + completion_tokens_est,
-                            },
-                        )
-                        _log_ai_metrics(
-                            {
-                                "kind": "stream_done",
-                                "endpoint": "/api/bazi/report/stream",
-                                "request_id": request_id,
-                                "report_id": report_id,
-                                "provider": provider,
-                                "model": model or "default",
-                                "enable_thinking": enable_thinking,
-                                "temperature": temperature,
-                                "timeout": timeout,
-                                "elapsed_ms": elapsed_ms,
-                                "usage": {
-                                    "prompt_tokens_est": prompt_tokens_est,
-                                    "completion_tokens_est": completion_tokens_est,
-                                    "total_tokens_est": prompt_tokens_est + completion_tokens_est,
-                                },
-                                "stream": stream_stats,
-                            }
-                        )
-                        _log_ai_content(
-                            {
-                                "kind": "stream_report_done",
-                                "endpoint": "/api/bazi/report/stream",
-                                "request_id": request_id,
-                                "report_id": report_id,
-                                "report": normalized.get("report"),
-                            }
-                        )
-                        yield _sse_pack(normalized)
+                        yield _report_done_sse(normalized)
+                        _log_stream_done()
                         return
 
                     yield _sse_pack(normalized)
@@ -741,9 +971,9 @@ def generate_report_stream(payload: ReportRequest):
 
 
 @app.post("/api/bazi/report/stream-ndjson")
-def generate_report_stream_ndjson(payload: ReportRequest):
+async def generate_report_stream_ndjson(payload: ReportRequest):
     """兼容旧版 NDJSON 协议（meta/delta/thinking/done）。"""
-    chart, analysis, knowledge, prompt = _prepare_report_context(payload)
+    chart, analysis, knowledge, prompt, chart_id = await run_in_threadpool(_prepare_report_context, payload)
     messages = _build_llm_messages(prompt)
     provider = _resolve_llm_provider()
     model = _resolve_llm_model("report", provider)
@@ -751,10 +981,11 @@ def generate_report_stream_ndjson(payload: ReportRequest):
     timeout = _resolve_llm_timeout("report")
     enable_thinking = _resolve_feature_enable_thinking("report", provider)
 
-    def _event_stream() -> Iterator[str]:
+    async def _event_stream() -> AsyncIterator[str]:
         meta = {
             "type": "meta",
-            "chart": chart.model_dump(mode="json"),
+            "chart": _signed_chart_data(chart, chart_id),
+            "chart_id": chart_id,
             "analysis": analysis.model_dump(mode="json"),
             "knowledge": [k.model_dump() for k in knowledge],
             "prompt": prompt,
@@ -764,7 +995,7 @@ def generate_report_stream_ndjson(payload: ReportRequest):
         chunks: List[str] = []
         thinking_chunks: List[str] = []
         try:
-            for chunk in stream_chat_with_reasoning(
+            async for chunk in astream_chat_with_reasoning(
                 messages,
                 provider=provider,
                 model=model,
@@ -800,9 +1031,10 @@ def generate_report_stream_ndjson(payload: ReportRequest):
 
 
 @app.post("/api/bazi/chat")
-def chat_with_chart(payload: ChatRequest):
+async def chat_with_chart(payload: ChatRequest):
     request_id = str(uuid4())
-    prompt = _build_chat_prompt(payload)
+    # 会话读取与紧凑命盘解码可能要排盘，放到线程池执行
+    prompt = await run_in_threadpool(_build_chat_prompt, payload)
     _log_ai_content(
         {
             "kind": "request",
@@ -819,7 +1051,7 @@ def chat_with_chart(payload: ChatRequest):
         timeout = _resolve_llm_timeout("chat")
         enable_thinking = _resolve_feature_enable_thinking("chat", provider)
         start_time = time.perf_counter()
-        raw_text, usage = chat_with_usage(
+        raw_text, usage = await achat_with_usage(
             _build_llm_messages(prompt),
             provider=provider,
             model=model,
@@ -878,8 +1110,9 @@ def chat_with_chart(payload: ChatRequest):
 
 
 @app.post("/api/bazi/chat/stream")
-def chat_with_chart_stream(payload: ChatRequest):
-    prompt = _build_chat_prompt(payload)
+async def chat_with_chart_stream(payload: ChatRequest):
+    # 会话读取与紧凑命盘解码可能要排盘，放到线程池执行
+    prompt = await run_in_threadpool(_build_chat_prompt, payload)
     messages = _build_llm_messages(prompt)
     request_id = str(uuid4())
     _log_ai_content(
@@ -896,12 +1129,12 @@ def chat_with_chart_stream(payload: ChatRequest):
     timeout = _resolve_llm_timeout("chat")
     enable_thinking = _resolve_feature_enable_thinking("chat", provider)
 
-    def _event_stream() -> Iterator[str]:
-        start_time = time.perf_counter()
+    async def _event_stream() -> AsyncIterator[str]:
+        metrics = _StreamMetrics()
         chunks: List[str] = []
         thinking_chunks: List[str] = []
         try:
-            for chunk in stream_chat_with_reasoning(
+            async for chunk in astream_chat_with_reasoning(
                 messages,
                 provider=provider,
                 model=model,
@@ -909,6 +1142,7 @@ def chat_with_chart_stream(payload: ChatRequest):
                 enable_thinking=enable_thinking,
                 timeout=timeout,
             ):
+                metrics.observe(chunk)
                 if chunk.reasoning:
                     thinking_chunks.append(chunk.reasoning)
                     yield json.dumps(
@@ -934,7 +1168,6 @@ def chat_with_chart_stream(payload: ChatRequest):
         reply_text = "".join(chunks).strip()
         if not reply_text:
             reply_text = "已收到。"
-        elapsed_ms = int((time.perf_counter() - start_time) * 1000)
         prompt_text = json.dumps(messages, ensure_ascii=False)
         completion_text = reply_text + ("".join(thinking_chunks) if thinking_chunks else "")
         _log_ai_metrics(
@@ -947,12 +1180,7 @@ def chat_with_chart_stream(payload: ChatRequest):
                 "enable_thinking": enable_thinking,
                 "temperature": temperature,
                 "timeout": timeout,
-                "elapsed_ms": elapsed_ms,
-                "usage": {
-                    "prompt_tokens_est": _estimate_tokens(prompt_text),
-                    "completion_tokens_est": _estimate_tokens(completion_text),
-                    "total_tokens_est": _estimate_tokens(prompt_text) + _estimate_tokens(completion_text),
-                },
+                **metrics.log_fields(prompt_text, len(completion_text)),
             }
         )
         _log_ai_content(
@@ -973,7 +1201,7 @@ def chat_with_chart_stream(payload: ChatRequest):
 
 
 @app.post("/api/bazi/general-chat/stream")
-def general_chat_stream(payload: GeneralChatRequest):
+async def general_chat_stream(payload: GeneralChatRequest):
     """通用聊天接口（无需命盘），用于喵大师等场景"""
     request_id = str(uuid4())
     def _build_default_system_prompt(is_deep: bool) -> str:
@@ -1046,6 +1274,7 @@ def general_chat_stream(payload: GeneralChatRequest):
         or payload.subject_gender
         or payload.subject_destiny
         or payload.subject_chart
+        or payload.subject_chart_id
     ):
         birth = payload.subject_birth or ""
         raw_gender = (payload.subject_gender or "").strip().lower()
@@ -1057,22 +1286,34 @@ def general_chat_stream(payload: GeneralChatRequest):
             gender_label = payload.subject_gender or ""
         else:
             gender_label = ""
-        subject_chart = None
-        if payload.subject_chart:
+
+        def _resolve_subject() -> tuple[Optional[Chart], Optional[PillarInfo]]:
+            # 紧凑编码解码与流年计算都要排盘，放到线程池执行，不阻塞事件循环
+            subject_chart = None
+            if payload.subject_chart_id:
+                subject_session = chart_sessions.get(payload.subject_chart_id)
+                if subject_session is None:
+                    root_logger.warning("命主会话不存在或已过期，已跳过: %s", payload.subject_chart_id)
+                else:
+                    subject_chart = subject_session.chart
+            elif payload.subject_chart:
+                try:
+                    subject_chart = _load_chart(payload.subject_chart)
+                except Exception as exc:
+                    root_logger.warning("命主档案解析失败，已跳过: %s", exc)
+                    subject_chart = None
+            current_year_pillar = None
             try:
-                subject_chart = Chart.model_validate(payload.subject_chart)
+                day_stem = (
+                    subject_chart.day_pillar.heaven_stem.name if subject_chart else None
+                )
+                current_year_pillar = engine.get_current_year_pillar(day_stem=day_stem)
             except Exception as exc:
-                root_logger.warning("命主档案解析失败，已跳过: %s", exc)
-                subject_chart = None
-        current_year_pillar = None
-        try:
-            day_stem = (
-                subject_chart.day_pillar.heaven_stem.name if subject_chart else None
-            )
-            current_year_pillar = engine.get_current_year_pillar(day_stem=day_stem)
-        except Exception as exc:
-            root_logger.warning("流年计算失败，已跳过: %s", exc)
-            current_year_pillar = None
+                root_logger.warning("流年计算失败，已跳过: %s", exc)
+                current_year_pillar = None
+            return subject_chart, current_year_pillar
+
+        subject_chart, current_year_pillar = await run_in_threadpool(_resolve_subject)
         system_prompt += "\n\n【当前对话命主信息】\n"
         system_prompt += f"- 姓名：{payload.subject_name or ''}\n"
         if gender_label:
@@ -1120,12 +1361,12 @@ def general_chat_stream(payload: GeneralChatRequest):
         }
     )
 
-    def _event_stream() -> Iterator[str]:
-        start_time = time.perf_counter()
+    async def _event_stream() -> AsyncIterator[str]:
+        metrics = _StreamMetrics()
         chunks: List[str] = []
         thinking_chunks: List[str] = []
         try:
-            for chunk in stream_chat_with_reasoning(
+            async for chunk in astream_chat_with_reasoning(
                 messages,
                 provider=provider,
                 model=model,
@@ -1133,6 +1374,7 @@ def general_chat_stream(payload: GeneralChatRequest):
                 enable_thinking=enable_thinking,
                 timeout=timeout,
             ):
+                metrics.observe(chunk)
                 if chunk.reasoning:
                     thinking_chunks.append(chunk.reasoning)
                     yield json.dumps(
@@ -1158,7 +1400,6 @@ def general_chat_stream(payload: GeneralChatRequest):
         reply_text = "".join(chunks).strip()
         if not reply_text:
             reply_text = "我明白了，请问还有什么想了解的吗？"
-        elapsed_ms = int((time.perf_counter() - start_time) * 1000)
         prompt_text = json.dumps(messages, ensure_ascii=False)
         completion_text = reply_text + ("".join(thinking_chunks) if thinking_chunks else "")
         _log_ai_metrics(
@@ -1171,12 +1412,7 @@ def general_chat_stream(payload: GeneralChatRequest):
                 "enable_thinking": enable_thinking,
                 "temperature": temperature,
                 "timeout": timeout,
-                "elapsed_ms": elapsed_ms,
-                "usage": {
-                    "prompt_tokens_est": _estimate_tokens(prompt_text),
-                    "completion_tokens_est": _estimate_tokens(completion_text),
-                    "total_tokens_est": _estimate_tokens(prompt_text) + _estimate_tokens(completion_text),
-                },
+                **metrics.log_fields(prompt_text, len(completion_text)),
             }
         )
         _log_ai_content(
@@ -1201,22 +1437,15 @@ def test_ollama(prompt: str = "ping", model: Optional[str] = None, base_url: Opt
     ollama_base_url = base_url or os.getenv("OLLAMA_BASE_URL", "http://127.0.0.1:11434")
     ollama_model = model or os.getenv("OLLAMA_MODEL", "deepseek-r1:8b")
     payload = {"model": ollama_model, "prompt": prompt, "stream": False}
-    data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
-    request = urllib.request.Request(
-        f"{ollama_base_url}/api/generate",
-        data=data,
-        headers={"Content-Type": "application/json"},
-    )
-    opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))
 
     try:
-        with opener.open(request, timeout=15) as response:
+        with ollama_post_json(ollama_base_url, "/api/generate", payload, timeout=15) as response:
             raw = response.read().decode("utf-8").strip()
-    except urllib.error.HTTPError as exc:
-        body = exc.read().decode("utf-8", errors="ignore").strip()
-        detail = body or f"HTTP {exc.code} {exc.reason}"
+    except HTTPStatusError as exc:
+        body = exc.body.decode("utf-8", errors="ignore").strip()
+        detail = body or f"HTTP {exc.status} {exc.reason}"
         raise HTTPException(status_code=502, detail=f"Ollama 测试失败: {detail}") from exc
-    except (urllib.error.URLError, TimeoutError) as exc:
+    except (OSError, http.client.HTTPException, ValueError) as exc:
         raise HTTPException(status_code=502, detail=f"Ollama 测试失败: {exc}") from exc
 
     try:
@@ -1239,6 +1468,7 @@ def find_dates_by_pillars(payload: PillarSearchRequest):
             hour_pillar=payload.hour_pillar,
             start_year=payload.start_year,
             end_year=payload.end_year,
+            solver=payload.solver,
         )
         return {
             "matched_dates": matched_dates,
@@ -1248,6 +1478,40 @@ def find_dates_by_pillars(payload: PillarSearchRequest):
         raise HTTPException(status_code=400, detail=f"查找失败: {exc}") from exc
 
 
+@app.post("/api/calendar/convert")
+def convert_calendar(payload: CalendarConvertRequest):
+    """
+    批量公历/农历互转，返回每条的公历、农历与年/月/日柱；stream=true 时按 NDJSON 逐条输出
+    """
+    results = engine.convert_calendar_dates(
+        calendar=payload.calendar,
+        years=payload.years,
+        months=payload.months,
+        days=payload.days,
+        is_leap_months=payload.is_leap_months,
+    )
+    if payload.stream:
+        return StreamingResponse(_ndjson_chunks(results), media_type="application/x-ndjson")
+    converted = list(results)
+    # 结果都是基础类型，直接序列化，跳过 FastAPI 对十万级条目的逐项编码
+    return Response(
+        content=json.dumps({"results": converted, "total_count": len(converted)}, ensure_ascii=False),
+        media_type="application/json",
+    )
+
+
+def _ndjson_chunks(items: Iterator[Dict[str, Any]], lines_per_chunk: int = 1000) -> Iterator[str]:
+    """逐条序列化为 NDJSON，按块合并输出，避免每行一次写入"""
+    lines: List[str] = []
+    for item in items:
+        lines.append(json.dumps(item, ensure_ascii=False) + "\n")
+        if len(lines) >= lines_per_chunk:
+            yield "".join(lines)
+            lines = []
+    if lines:
+        yield "".join(lines)
+
+
 @app.post("/api/bazi/feedback")
 def submit_feedback(payload: FeedbackRequest):
     """
@@ -1262,7 +1526,7 @@ def submit_feedback(payload: FeedbackRequest):
 
 
 @app.post("/api/bazi/energy-analysis")
-def analyze_energy(payload: EnergyAnalysisRequest):
+async def analyze_energy(payload: EnergyAnalysisRequest):
     """
     五行能量智能分析接口
     基于四柱八字和藏干信息，让 AI 智能分析命局中五行的强弱
@@ -1278,8 +1542,9 @@ def analyze_energy(payload: EnergyAnalysisRequest):
             "payload": payload.model_dump(mode="json"),
         }
     )
+    session = _request_session(payload)
     try:
-        chart_data = payload.chart
+        chart_data = session.chart_data if session else _chart_dict(payload.chart)
         prompt_text = build_energy_analysis_prompt(chart_data)
 
         provider = _resolve_llm_provider()
@@ -1313,7 +1578,7 @@ def analyze_energy(payload: EnergyAnalysisRequest):
             temperature,
             timeout,
         )
-        raw_text, usage = chat_with_usage(
+        raw_text, usage = await achat_with_usage(
             messages,
             provider=provider,
             model=model,
@@ -1449,25 +1714,12 @@ def _filter_destiny_relations(relations: GanZhiRelations) -> List[Dict[str, Any]
     return filtered
 
 
-def _build_destiny_relations_map(chart: Chart) -> Dict[str, Any]:
-    destiny_cycle = chart.destiny_cycle
-    if not destiny_cycle or not destiny_cycle.destiny_pillars:
-        return {}
-    day_pillar = chart.day_pillar
-    key_prefix = f"destiny_rel_{day_pillar.heaven_stem.name}{day_pillar.earth_branch.name}_"
-    relations_map: Dict[str, Any] = {}
-    for pillar in destiny_cycle.destiny_pillars:
-        destiny_pillar = _build_destiny_pillar(pillar.model_dump())
-        relations = _calculate_destiny_relations(chart, destiny_pillar)
-        relations_map[f"{key_prefix}{pillar.year}"] = relations.model_dump()
-    return relations_map
-
-
 @app.post("/api/bazi/destiny-relations")
 def destiny_relations(payload: DestinyRelationsRequest):
     """获取指定大运与本命四柱的干支关系"""
+    session = _request_session(payload)
     try:
-        chart = Chart.model_validate(payload.chart)
+        chart = session.chart if session else _load_chart(payload.chart)
         destiny_pillar = _build_destiny_pillar(payload.destiny_pillar)
         relations = _calculate_destiny_relations(chart, destiny_pillar)
         return relations.model_dump()
@@ -1475,8 +1727,22 @@ def destiny_relations(payload: DestinyRelationsRequest):
         raise HTTPException(status_code=400, detail=f"关系计算失败: {exc}") from exc
 
 
+@app.post("/api/bazi/annual-timeline")
+def annual_timeline(payload: AnnualTimelineRequest):
+    """流年时间线：默认出生年起 100 年，逐年给出流年柱、所在大运与干支关系"""
+    session = _request_session(payload)
+    try:
+        chart = session.chart if session else _load_chart(payload.chart)
+        timeline = engine.calculate_annual_timeline(
+            chart, start_year=payload.start_year, end_year=payload.end_year
+        )
+        return timeline.model_dump(mode="json")
+    except Exception as exc:
+        raise HTTPException(status_code=400, detail=f"流年计算失败: {exc}") from exc
+
+
 @app.post("/api/bazi/destiny-analysis")
-def analyze_destiny(payload: DestinyAnalysisRequest):
+async def analyze_destiny(payload: DestinyAnalysisRequest):
     """大运智能解析接口"""
     from src.api.destiny_prompt import build_destiny_analysis_prompt
 
@@ -1489,9 +1755,10 @@ def analyze_destiny(payload: DestinyAnalysisRequest):
             "payload": payload.model_dump(mode="json"),
         }
     )
+    session = _request_session(payload)
     try:
-        chart_data = payload.chart
-        chart = Chart.model_validate(chart_data)
+        chart = session.chart if session else _load_chart(payload.chart)
+        chart_data = session.chart_data if session else _chart_dict(payload.chart, chart)
         destiny_pillar_data = payload.destiny_pillar
         destiny_pillar = _build_destiny_pillar(destiny_pillar_data)
         relations = _calculate_destiny_relations(chart, destiny_pillar)
@@ -1530,7 +1797,7 @@ def analyze_destiny(payload: DestinyAnalysisRequest):
             temperature,
             timeout,
         )
-        raw_text, usage = chat_with_usage(
+        raw_text, usage = await achat_with_usage(
             messages,
             provider=provider,
             model=model,
@@ -1629,7 +1896,7 @@ def analyze_destiny(payload: DestinyAnalysisRequest):
 
 
 @app.post("/api/bazi/destiny-analysis-batch")
-def analyze_destiny_batch(payload: DestinyAnalysisBatchRequest):
+async def analyze_destiny_batch(payload: DestinyAnalysisBatchRequest):
     """多条大运智能解析接口"""
     from src.api.destiny_prompt import build_destiny_analysis_batch_prompt
 
@@ -1642,9 +1909,10 @@ def analyze_destiny_batch(payload: DestinyAnalysisBatchRequest):
             "payload": payload.model_dump(mode="json"),
         }
     )
+    session = _request_session(payload)
     try:
-        chart_data = payload.chart
-        chart = Chart.model_validate(chart_data)
+        chart = session.chart if session else _load_chart(payload.chart)
+        chart_data = session.chart_data if session else _chart_dict(payload.chart, chart)
         destiny_items: List[Dict[str, Any]] = []
         input_years: List[int] = []
         for destiny_pillar_data in payload.destiny_pillars:
@@ -1692,7 +1960,7 @@ def analyze_destiny_batch(payload: DestinyAnalysisBatchRequest):
             temperature,
             timeout,
         )
-        raw_text, usage = chat_with_usage(
+        raw_text, usage = await achat_with_usage(
             messages,
             provider=provider,
             model=model,
@@ -1819,34 +2087,28 @@ def _prepare_report_context(
     payload: ReportRequest,
     prompt_builder: Callable[[Chart, Any, List[Any], List[str]], Dict[str, Any]] = build_report_prompt,
 ):
-    if payload.chart:
+    if payload.chart_id:
+        session = _get_chart_session(payload.chart_id)
+    elif payload.chart:
         try:
-            chart = Chart.model_validate(payload.chart)
+            session = chart_sessions.open(_load_chart(payload.chart))
         except Exception as exc:
             raise HTTPException(status_code=400, detail=f"命盘数据无效: {exc}") from exc
     else:
         if payload.year is None or payload.month is None or payload.day is None or not payload.gender:
             raise HTTPException(status_code=400, detail="缺少排盘所需的日期或性别信息")
         try:
-            solar_datetime = _build_solar_datetime(payload)
-            chart = engine.calculate_chart(
-                name=_normalize_name(payload.name),
-                gender=payload.gender,
-                solar_datetime=solar_datetime,
-                tz_offset_hours=payload.tz_offset_hours,
-                longitude=payload.longitude,
-                latitude=payload.latitude,
-                birth_place=payload.birth_place,
-            )
+            session = _chart_response_session(_build_chart_response(payload))
         except Exception as exc:
             raise HTTPException(status_code=400, detail=f"排盘失败: {exc}") from exc
 
-    analysis = evaluate_chart(chart)
+    chart = session.chart
+    analysis = session.analysis
     knowledge = retrieve_knowledge(
         pattern_tags=analysis.pattern_tags, yi_yong_shen=analysis.yi_yong_shen, focus=payload.focus
     )
     prompt = prompt_builder(chart, analysis, knowledge, payload.focus)
-    return chart, analysis, knowledge, prompt
+    return chart, analysis, knowledge, prompt, session.chart_id
 
 
 def _sse_pack(data: Dict[str, Any]) -> str:
@@ -2003,6 +2265,17 @@ def _validate_and_normalize_report_event(
 
 
 def _build_chat_prompt(payload: ChatRequest) -> Dict[str, Any]:
+    if payload.chart_id:
+        # 会话中的字典已预先生成，每轮只需携带 chart_id 与对话历史
+        session = _get_chart_session(payload.chart_id)
+        chart_data = session.chart_data
+        analysis_data = payload.analysis if payload.analysis is not None else session.analysis_data
+    else:
+        try:
+            chart_data = _chart_dict(payload.chart)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=f"命盘数据无效: {exc}") from exc
+        analysis_data = payload.analysis
     return {
         "system": (
             "你在持续解读同一命盘，请保持前后一致。禁止新增格局或修改四柱。"
@@ -2010,8 +2283,8 @@ def _build_chat_prompt(payload: ChatRequest) -> Dict[str, Any]:
             "请直接输出自然语言答复，不需要固定结构。"
         ),
         "user": {
-            "chart": payload.chart,
-            "analysis": payload.analysis,
+            "chart": chart_data,
+            "analysis": analysis_data,
             "history": [turn.model_dump() for turn in payload.history],
             "focus": payload.focus,
         },
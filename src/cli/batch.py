@@ -0,0 +1,238 @@
+"""
+离线批量排盘命令行
+
+读取 CSV 或 JSONL 格式的出生记录（字段与 ``ChartRequest`` 相同），分块交给进程池
+排盘，按输入顺序写出结果，结束时在 stderr 报告吞吐量：
+
+    python -m src.cli.batch users.csv -o charts.jsonl --fields year_pillar,month_pillar,day_pillar,hour_pillar
+    python -m src.cli.batch users.jsonl -o charts.csv --format csv
+
+输出格式：
+- jsonl：每行 {"index", "chart", "destiny_relations_map"}，与 ``/api/bazi/chart`` 一致；
+  ``--fields`` 选择 Chart 字段与 destiny_relations_map（优先于记录自带的 fields），
+  未选的部分不计算。
+- csv：列式表格，由 ``calculate_charts_batch`` 计算四柱、五行个数、起运与首步大运；
+  ``--fields`` 选择 CSV_COLUMNS 中的列。
+
+出错的记录不会中断任务：jsonl 输出 {"index", "error"}，csv 填写 error 列。
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import os
+import sys
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date, datetime
+from pathlib import Path
+from typing import IO, Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from src.api.batch_charts import (
+    BatchRecord,
+    compute_chart_lines,
+    describe_error,
+    get_worker_engine,
+    init_worker,
+    iter_chunks,
+    iter_ndjson,
+    parse_record,
+    submit_in_order,
+)
+from src.api.chart_payload import build_solar_datetime, normalize_fields
+from src.api.schemas import ChartRequest
+from src.engine.bazi_engine import BaziPaipanEngine
+from src.engine.chart_batch import CHART_BATCH_COLUMNS
+
+CSV_COLUMNS: Tuple[str, ...] = (
+    "year_pillar",
+    "month_pillar",
+    "day_pillar",
+    "hour_pillar",
+    *CHART_BATCH_COLUMNS,
+    "qiyun_date",
+)
+
+
+def _csv_rows(
+    engine: BaziPaipanEngine,
+    valid: List[Tuple[int, ChartRequest, datetime]],
+    columns: Sequence[str],
+    as_of: Optional[datetime],
+) -> List[List[Any]]:
+    batch = engine.calculate_charts_batch(
+        [solar_datetime for _, _, solar_datetime in valid],
+        [payload.gender for _, payload, _ in valid],
+        tz_offsets=[payload.tz_offset_hours for _, payload, _ in valid],
+        longitudes=[payload.longitude for _, payload, _ in valid],
+        latitudes=[payload.latitude for _, payload, _ in valid],
+        as_of=as_of,
+    )
+    rows: List[List[Any]] = []
+    for position, (index, _, _) in enumerate(valid):
+        values = batch.row(position)
+        values.update(zip(("year_pillar", "month_pillar", "day_pillar", "hour_pillar"), batch.pillars(position)))
+        values["qiyun_date"] = values["qiyun_date"].isoformat()
+        rows.append([index, ""] + [values[column] for column in columns])
+    return rows
+
+
+def _csv_chunk(
+    records: List[BatchRecord], columns: Sequence[str], as_of: Optional[datetime]
+) -> Tuple[str, int]:
+    engine = get_worker_engine()
+    rows: Dict[int, List[Any]] = {}
+    valid: List[Tuple[int, ChartRequest, datetime]] = []
+    for index, raw in records:
+        try:
+            payload = parse_record(raw)
+            valid.append((index, payload, build_solar_datetime(engine, payload)))
+        except Exception as exc:
+            rows[index] = [index, describe_error(exc)] + [""] * len(columns)
+
+    try:
+        computed = _csv_rows(engine, valid, columns, as_of)
+    except Exception:
+        # 整块排盘失败时逐条重算，只有出错的记录填写 error 列
+        computed = []
+        for item in valid:
+            try:
+                computed.extend(_csv_rows(engine, [item], columns, as_of))
+            except Exception as exc:
+                computed.append([item[0], describe_error(exc)] + [""] * len(columns))
+    for row in computed:
+        rows[row[0]] = row
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    for index, _ in records:
+        writer.writerow(rows[index])
+    return buffer.getvalue(), sum(1 for row in rows.values() if row[1])
+
+
+def csv_columns(fields: Optional[Sequence[str]]) -> List[str]:
+    """解析 csv 输出列，未指定时输出全部 CSV_COLUMNS；含未知列时抛出 ValueError"""
+    columns = list(CSV_COLUMNS) if fields is None else [column.strip() for column in fields if column.strip()]
+    unknown = set(columns) - set(CSV_COLUMNS)
+    if unknown:
+        raise ValueError(f"未知列: {', '.join(sorted(unknown))}")
+    return columns
+
+
+def iter_records(source: IO[str], input_format: str) -> Iterator[BatchRecord]:
+    """逐条读取输入记录（JSONL 跳过空行，行号从 0 起计）"""
+    if input_format == "csv":
+        return enumerate(csv.DictReader(source))
+    return iter_ndjson(source)
+
+
+def run_batch(
+    source: IO[str],
+    output: IO[str],
+    *,
+    input_format: str = "jsonl",
+    output_format: str = "jsonl",
+    fields: Optional[Sequence[str]] = None,
+    workers: int = 0,
+    chunk_size: int = 256,
+    as_of: Optional[datetime] = None,
+    progress: Optional[IO[str]] = None,
+) -> Tuple[int, int, float]:
+    """
+    批量排盘主流程，返回 (记录数, 出错数, 耗时秒数)。
+
+    Args:
+        workers: 子进程数；0 表示 CPU 核数，1 表示单个子进程，负数表示在当前进程的线程中计算
+        chunk_size: 每块记录数；同时在途的块不超过子进程数的 2 倍
+        as_of: 记录未指定 as_of 时使用的参考时间，默认为当天
+        progress: 进度输出（约每 5 秒一行），None 表示不输出
+    """
+    workers = workers or (os.cpu_count() or 1)
+    if output_format == "csv":
+        columns = csv_columns(fields)
+        output.write(",".join(["index", "error", *columns]) + "\n")
+        task, task_arg = _csv_chunk, columns
+    else:
+        task, task_arg = compute_chart_lines, normalize_fields(fields)
+
+    executor: Executor = (
+        ThreadPoolExecutor(max_workers=1)
+        if workers < 0
+        else ProcessPoolExecutor(max_workers=workers, initializer=init_worker)
+    )
+    total = errors = 0
+    started = last_report = time.perf_counter()
+
+    with executor:
+        for count, future in submit_in_order(
+            lambda chunk: executor.submit(task, chunk, task_arg, as_of),
+            iter_chunks(iter_records(source, input_format), max(1, chunk_size)),
+            2 * max(1, workers),
+        ):
+            text, chunk_errors = future.result()
+            output.write(text)
+            total += count
+            errors += chunk_errors
+            now = time.perf_counter()
+            if progress is not None and now - last_report >= 5:
+                last_report = now
+                progress.write(f"{total} records, {total / (now - started):.0f} records/s\n")
+                progress.flush()
+    return total, errors, time.perf_counter() - started
+
+
+def _detect_format(path: str, explicit: Optional[str]) -> str:
+    if explicit:
+        return explicit
+    return "csv" if Path(path).suffix.lower() == ".csv" else "jsonl"
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m src.cli.batch", description="离线批量排盘（CSV/JSONL 输入）"
+    )
+    parser.add_argument("input", help="输入文件路径，- 表示标准输入")
+    parser.add_argument("-o", "--output", default="-", help="输出文件路径，- 表示标准输出")
+    parser.add_argument("--input-format", choices=("csv", "jsonl"), help="输入格式，默认按扩展名判断")
+    parser.add_argument("--format", dest="output_format", choices=("jsonl", "csv"), help="输出格式，默认按扩展名判断")
+    parser.add_argument("--fields", help="逗号分隔的输出字段（jsonl 为命盘字段，csv 为列名）")
+    parser.add_argument("--workers", type=int, default=0, help="子进程数，默认 CPU 核数；负数表示不用进程池")
+    parser.add_argument("--chunk-size", type=int, default=256, help="每块记录数")
+    parser.add_argument("--as-of", type=datetime.fromisoformat, help="参考时间（ISO 格式），默认当天")
+    args = parser.parse_args(argv)
+
+    input_format = _detect_format(args.input, args.input_format)
+    output_format = _detect_format(args.output, args.output_format)
+    fields = args.fields.split(",") if args.fields else None
+    try:
+        csv_columns(fields) if output_format == "csv" else normalize_fields(fields)
+    except ValueError as exc:
+        parser.error(str(exc))
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8", newline="")
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8", newline="")
+    try:
+        total, errors, elapsed = run_batch(
+            source,
+            output,
+            input_format=input_format,
+            output_format=output_format,
+            fields=fields,
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+            as_of=args.as_of or datetime.combine(date.today(), datetime.min.time()),
+            progress=sys.stderr,
+        )
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+    rate = total / elapsed if elapsed > 0 else 0.0
+    print(f"{total} records ({errors} errors) in {elapsed:.2f}s, {rate:.0f} records/s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
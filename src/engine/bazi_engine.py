@@ -1,15 +1,35 @@
 from __future__ import annotations
 
-from datetime import datetime, timedelta
+import logging
+from bisect import bisect_right
+from datetime import date, datetime, timedelta, timezone
 from itertools import product
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Collection, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
 import sxtwl
 
-from src.data.changsheng_table import STEM_CHANG_SHENG_TABLE
-from src.data.nayin_data import NA_YIN_TABLE, NA_YIN_TRAITS
+from src.data.nayin_data import NA_YIN_TABLE
+from src.engine.calendar_table import SolarDay, get_calendar_table, lunar_day, solar_day
+from src.engine.chart_batch import ChartBatch
+from src.engine.day_table import get_day_table
+from src.engine.ganzhi_kernel import JIAZI_DAY_ORDINAL, GanZhiKernel, gz_index
+from src.engine.jieqi_table import get_jieqi_table
+from src.engine.pillar_index import get_pillar_index
+from src.engine.relation_tables import (
+    BRANCH_HARM,
+    BRANCH_SIX_CLASH,
+    BRANCH_SIX_COMBINE,
+    STEM_CLASH,
+    STEM_COMBINE,
+    STEM_KE,
+    RelationCache,
+    RelationTables,
+    branch_mask,
+)
 from src.engine.true_solar_time import calculate_true_solar_time
 from src.models.chart import (
+    AnnualFortuneInfo,
+    AnnualTimeline,
     Chart,
     DestinyCycleInfo,
     DestinyPillarInfo,
@@ -26,6 +46,8 @@ from src.models.chart import (
     StartAge,
 )
 
+logger = logging.getLogger(__name__)
+
 
 class BaziPaipanEngine:
     """八字排盘引擎：负责确定性排盘，不做任何解读。"""
@@ -197,6 +219,48 @@ class BaziPaipanEngine:
         "寒露", "霜降", "立冬", "小雪", "大雪", "冬至",
     ]
 
+    # 农历月份名称
+    LUNAR_MONTH_LABELS = [
+        "正月", "二月", "三月", "四月", "五月", "六月",
+        "七月", "八月", "九月", "十月", "冬月", "腊月",
+    ]
+
+    # 十二节在 1795-2205 年间落在的公历日期范围 (月, 最早日, 最晚日)，
+    # 依次为立春(寅月)、惊蛰(卯月)……大雪(子月)、小寒(丑月)
+    JIE_DATE_RANGES = [
+        (2, 3, 5), (3, 4, 7), (4, 4, 6), (5, 4, 7), (6, 4, 7), (7, 6, 8),
+        (8, 6, 9), (9, 6, 9), (10, 7, 9), (11, 6, 8), (12, 6, 8), (1, 4, 7),
+    ]
+
+    # calculate_chart 中可按需跳过的字段（未请求时保留 Chart 模型默认值）
+    OPTIONAL_CHART_FIELDS = frozenset(
+        {
+            "birth_jieqi",
+            "zodiac_sign",
+            "star_mansion",
+            "tai_yuan",
+            "tai_xi",
+            "shen_gong",
+            "ming_gong",
+            "ren_yuan_si_ling",
+            "kong_wang",
+            "current_year_pillar",
+            "ganzi_relations",
+        }
+    )
+    # 可选字段中只取决于四柱干支的部分（紧凑编码据此从四柱重建）
+    PILLAR_DERIVED_FIELDS: Tuple[str, ...] = (
+        "tai_yuan",
+        "tai_xi",
+        "shen_gong",
+        "ming_gong",
+        "ren_yuan_si_ling",
+        "kong_wang",
+    )
+
+    # 干支关系缓存条目数（一张命盘的 10 步大运 + 当前流年约占十余条）
+    RELATION_CACHE_SIZE = 4096
+
     # 星座对应日期范围
     ZODIAC_SIGNS = [
         ("摩羯座", 1, 20), ("水瓶座", 2, 19), ("双鱼座", 3, 20),
@@ -321,6 +385,43 @@ class BaziPaipanEngine:
         ("酉", "戌"),  # 酉戌害
     ]
 
+    def __init__(self) -> None:
+        # 整数内核：十神/纳音/长生等查找表，排盘热路径只做下标访问
+        self.kernel = GanZhiKernel(
+            stem_names=self.TIAN_GAN_NAMES,
+            branch_names=self.DI_ZHI_NAMES,
+            stem_elements=self.HEAVEN_STEM_ELEMENT_MAP,
+            branch_elements=self.EARTH_BRANCH_ELEMENT_MAP,
+            stem_yinyang=self.TIAN_GAN_YIN_YANG,
+            branch_yinyang=self.DI_ZHI_YIN_YANG,
+            element_relations=self.FIVE_ELEMENTS_RELATIONS,
+            ten_gods=self.TEN_GODS,
+            branch_hidden_stems=self.BRANCH_HIDDEN_STEM,
+        )
+        self.relation_tables = RelationTables(
+            stem_names=self.TIAN_GAN_NAMES,
+            branch_names=self.DI_ZHI_NAMES,
+            stem_combinations=self.STEM_COMBINATIONS,
+            stem_clashes=self.STEM_CLASHES,
+            stem_ke_pairs=self.STEM_KE_PAIRS,
+            branch_six_combinations=self.BRANCH_SIX_COMBINATIONS,
+            branch_three_combinations=self.BRANCH_THREE_COMBINATIONS,
+            branch_three_meetings=self.BRANCH_THREE_MEETINGS,
+            branch_six_clashes=self.BRANCH_SIX_CLASHES,
+            branch_punishments=self.BRANCH_PUNISHMENTS,
+            branch_harms=self.BRANCH_HARMS,
+        )
+        self.relation_cache = RelationCache(maxsize=self.RELATION_CACHE_SIZE)
+        # 享元：60 甲子 x 10 日干 只有 600 种柱信息，预先构建一次，所有命盘共享同一份
+        # （PillarInfo 及其天干/地支模型均为 frozen，不会被就地修改）
+        self._pillar_prototypes: List[List[PillarInfo]] = [
+            [
+                self._build_pillar_info(gz % 10, gz % 12, day_stem_index)
+                for day_stem_index in range(10)
+            ]
+            for gz in range(60)
+        ]
+
     def lunar_to_solar(
         self,
         year: int,
@@ -330,15 +431,116 @@ class BaziPaipanEngine:
         hour: int = 0,
         minute: int = 0,
     ) -> datetime:
-        lunar_day = sxtwl.fromLunar(year, month, day, is_leap_month)
+        try:
+            converted = lunar_day(year, month, day, is_leap_month)
+        except ValueError:
+            # 不存在的农历日期沿用 sxtwl 的顺延结果
+            converted = sxtwl.fromLunar(year, month, day, is_leap_month)
         return datetime(
-            lunar_day.getSolarYear(),
-            lunar_day.getSolarMonth(),
-            lunar_day.getSolarDay(),
+            converted.getSolarYear(),
+            converted.getSolarMonth(),
+            converted.getSolarDay(),
             hour,
             minute,
         )
 
+    def convert_calendar_dates(
+        self,
+        calendar: str,
+        years: Sequence[int],
+        months: Sequence[int],
+        days: Sequence[int],
+        is_leap_months: Optional[Sequence[bool]] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        批量公历/农历互转，逐条产出转换结果（按需迭代，便于流式输出）。
+
+        历表范围内直接读取逐日历表，范围外退回 sxtwl。
+
+        Args:
+            calendar: 输入历法 ("solar" / "lunar")
+            years, months, days: 等长的年/月/日序列
+            is_leap_months: 农历是否闰月，仅 calendar="lunar" 时使用；默认均为非闰月
+
+        Yields:
+            {"index", "solar", "lunar", "lunar_display", "year_pillar", "month_pillar", "day_pillar"}；
+            日期无效时为 {"index", "error"}
+        """
+        table = get_calendar_table()
+        cycle = self.SEXAGENARY_CYCLE
+        for index in range(len(years)):
+            year, month, day = years[index], months[index], days[index]
+            is_leap = bool(is_leap_months[index]) if is_leap_months is not None else False
+            try:
+                if calendar == "lunar":
+                    if not (1 <= month <= 12 and 1 <= day <= 30):
+                        raise ValueError("农历月份须为 1-12、日期须为 1-30")
+                    ordinal = table.lunar_ordinal(year, month, day, is_leap) if table else None
+                    if ordinal is None:
+                        converted = sxtwl.fromLunar(year, month, day, is_leap)
+                        # 闰月不存在或超过当月天数时，sxtwl 会顺延，换算结果与输入对不上
+                        if (
+                            converted.getLunarYear(),
+                            converted.getLunarMonth(),
+                            converted.getLunarDay(),
+                            bool(converted.isLunarLeap()),
+                        ) != (year, month, day, is_leap):
+                            raise ValueError("农历日期不存在")
+                        ordinal = date(
+                            converted.getSolarYear(), converted.getSolarMonth(), converted.getSolarDay()
+                        ).toordinal()
+                else:
+                    ordinal = date(year, month, day).toordinal()
+            except ValueError as exc:
+                yield {"index": index, "error": f"日期无效: {exc}"}
+                continue
+
+            solar_date = date.fromordinal(ordinal)
+            record = table.record(ordinal) if table else None
+            if record is not None:
+                year_gz, month_gz, day_gz, lunar_year, lunar_month, lunar_day_of_month = record[:6]
+                lunar_is_leap = record.is_leap_month
+            else:
+                converted = sxtwl.fromSolar(solar_date.year, solar_date.month, solar_date.day)
+                year_gz, month_gz, day_gz = (
+                    self._sxtwl_gz_index(gz)
+                    for gz in (converted.getYearGZ(), converted.getMonthGZ(), converted.getDayGZ())
+                )
+                lunar_year = converted.getLunarYear()
+                lunar_month = converted.getLunarMonth()
+                lunar_day_of_month = converted.getLunarDay()
+                lunar_is_leap = bool(converted.isLunarLeap())
+            yield {
+                "index": index,
+                "solar": {"year": solar_date.year, "month": solar_date.month, "day": solar_date.day},
+                "lunar": {
+                    "year": lunar_year,
+                    "month": lunar_month,
+                    "day": lunar_day_of_month,
+                    "is_leap_month": lunar_is_leap,
+                },
+                "lunar_display": self._format_lunar_display(
+                    lunar_year, lunar_month, lunar_day_of_month, lunar_is_leap
+                ),
+                "year_pillar": cycle[year_gz],
+                "month_pillar": cycle[month_gz],
+                "day_pillar": cycle[day_gz],
+            }
+
+    def _format_lunar_display(self, year: int, month: int, day: int, is_leap_month: bool) -> str:
+        """农历日期展示文本，如：农历2023年闰二月10日"""
+        return f"农历{year}年{'闰' if is_leap_month else ''}{self.LUNAR_MONTH_LABELS[month - 1]}{day}日"
+
+    @staticmethod
+    def normalize_as_of(as_of: Optional[datetime] = None) -> datetime:
+        """参考时间：默认当前时间；带时区的时间统一换算为北京时间的 naive datetime"""
+        if as_of is None:
+            return datetime.now()
+        if as_of.tzinfo is not None:
+            # 出生时间按北京时间的 naive datetime 处理，参考时间也需一致
+            return as_of.astimezone(timezone(timedelta(hours=8))).replace(tzinfo=None)
+        return as_of
+
     def calculate_chart(
         self,
         name: Optional[str],
@@ -349,6 +551,8 @@ class BaziPaipanEngine:
         longitude: Optional[float] = None,
         latitude: Optional[float] = None,
         birth_place: str = "",
+        as_of: Optional[datetime] = None,
+        fields: Optional[Collection[str]] = None,
     ) -> Chart:
         """
         计算排盘，返回结构化 Chart。
@@ -362,7 +566,14 @@ class BaziPaipanEngine:
             longitude: 出生地经度（用于计算真太阳时）
             latitude: 出生地纬度
             birth_place: 出生地点名称
+            as_of: 参考时间，用于判定当前大运、流年及相关干支关系；默认为当前时间。
+                指定后同一输入总是得到相同的命盘
+            fields: 需要计算的可选字段（见 OPTIONAL_CHART_FIELDS）；默认全部计算。
+                未列出的可选字段不计算，保留模型默认值
         """
+        as_of = self.normalize_as_of(as_of)
+        wanted = self.OPTIONAL_CHART_FIELDS if fields is None else frozenset(fields)
+
         # 先进行时区调整
         adjusted_dt = solar_datetime + timedelta(hours=tz_offset_hours)
 
@@ -381,7 +592,7 @@ class BaziPaipanEngine:
             # 未提供经度时，真太阳时与输入时间一致
             true_solar_datetime = adjusted_dt
 
-        birth_day = sxtwl.fromSolar(adjusted_dt.year, adjusted_dt.month, adjusted_dt.day)
+        birth_day = solar_day(adjusted_dt.year, adjusted_dt.month, adjusted_dt.day)
         year_gz = birth_day.getYearGZ()
         month_gz = birth_day.getMonthGZ()
         day_gz = birth_day.getDayGZ()
@@ -400,6 +611,7 @@ class BaziPaipanEngine:
             minute=adjusted_dt.minute,
             gender=gender,
             day_stem=day_stem_name,
+            as_of=as_of,
         )
 
         lunar_date = LunarDate(
@@ -409,8 +621,13 @@ class BaziPaipanEngine:
             is_leap_month=birth_day.isLunarLeap(),
         )
 
-        five_elements_count = self._calculate_five_elements(
-            [year_pillar, month_pillar, day_pillar, hour_pillar]
+        five_elements_count = self.kernel.count_five_elements(
+            [
+                (year_gz.tg, year_gz.dz),
+                (month_gz.tg, month_gz.dz),
+                (day_gz.tg, day_gz.dz),
+                hour_gz,
+            ]
         )
         five_elements_ratio = self._calculate_five_elements_ratio(five_elements_count)
         # 根据年柱地支计算生肖属相
@@ -420,66 +637,68 @@ class BaziPaipanEngine:
         # 真太阳时：目前简化处理，与阳历相同（TODO: 实现真太阳时计算）
         true_solar_datetime = adjusted_dt
 
-        # 计算星座
-        zodiac_sign = self._calculate_zodiac_sign(adjusted_dt.month, adjusted_dt.day)
-
-        # 计算星宿（简化：基于日期计算）
-        star_mansion = self._calculate_star_mansion(birth_day)
-
         # 命主五行展示
         day_master_display = f"{day_pillar.heaven_stem.name}{day_pillar.heaven_stem.yinyang}{day_pillar.heaven_stem.element}"
 
         # 天运五行（年柱纳音）
-        year_gz_str = f"{self.TIAN_GAN_NAMES[year_gz.tg]}{self.DI_ZHI_NAMES[year_gz.dz]}"
-        fortune_element = NA_YIN_TABLE.get(year_gz_str, "")
-
-        # 计算胎元
-        tai_yuan = self._calculate_tai_yuan(month_gz.tg, month_gz.dz, day_stem_name)
-
-        # 计算胎息（TODO: 实现真实计算）
-        tai_xi = NaYinInfo(gan_zhi="戊辰", na_yin="大林木")
-
-        # 计算身宫（TODO: 实现真实计算）
-        shen_gong = self._calculate_shen_gong(month_gz.tg, month_gz.dz, hour_gz[0], hour_gz[1], day_stem_name)
+        fortune_element = self.kernel.nayin[gz_index(year_gz.tg, year_gz.dz)][0]
 
-        # 计算命宫
-        ming_gong = self._calculate_ming_gong(month_gz.dz, hour_gz[1], day_stem_name)
+        # 以下为可选字段，只计算 fields 中列出的部分
+        optional: Dict[str, Any] = {}
 
-        # 人元司令分野（TODO: 实现真实计算）
-        ren_yuan_si_ling = self._calculate_ren_yuan_si_ling(birth_day)
+        # 计算星座
+        if "zodiac_sign" in wanted:
+            optional["zodiac_sign"] = self._calculate_zodiac_sign(adjusted_dt.month, adjusted_dt.day)
 
-        # 计算空亡
-        kong_wang = KongWangInfo(
-            year=self._calculate_kong_wang(year_gz.tg, year_gz.dz),
-            month=self._calculate_kong_wang(month_gz.tg, month_gz.dz),
-            day=self._calculate_kong_wang(day_gz.tg, day_gz.dz),
-            hour=self._calculate_kong_wang(hour_gz[0], hour_gz[1]),
+        # 计算星宿（简化：基于日期计算）
+        if "star_mansion" in wanted:
+            optional["star_mansion"] = self._calculate_star_mansion(birth_day)
+
+        # 胎元、胎息、身宫、命宫、人元司令、空亡
+        optional.update(
+            self.calculate_pillar_derived_fields(
+                (year_gz.tg, year_gz.dz),
+                (month_gz.tg, month_gz.dz),
+                (day_gz.tg, day_gz.dz),
+                hour_gz,
+                wanted,
+            )
         )
 
         # 计算节气信息
-        birth_jieqi = self._calculate_birth_jieqi(birth_day, adjusted_dt.hour, adjusted_dt.minute)
+        if "birth_jieqi" in wanted:
+            optional["birth_jieqi"] = self._calculate_birth_jieqi(
+                birth_day, adjusted_dt.hour, adjusted_dt.minute
+            )
 
         # 计算干支关系（一次性计算所有关系：本命+大运+流年）
-        current_year: Optional[PillarInfo] = None
-        try:
-            # 获取当前大运
-            current_destiny = self.get_current_destiny_pillar(original_solar_datetime, destiny_cycle)
-            # 获取当前流年
-            current_year = self.get_current_year_pillar(day_stem=day_stem_name)
-            
-            # 计算所有关系
-            ganzi_relations = self.calculate_all_ganzi_relations(
-                year_pillar=year_pillar,
-                month_pillar=month_pillar,
-                day_pillar=day_pillar,
-                hour_pillar=hour_pillar,
-                destiny_pillar=current_destiny,
-                year_fortune_pillar=current_year
-            )
-        except Exception as e:
-            # 如果计算关系失败，返回空关系
-            print(f"Warning: Failed to calculate ganzi relations: {e}")
-            ganzi_relations = GanZhiRelations()
+        if "current_year_pillar" in wanted or "ganzi_relations" in wanted:
+            current_year: Optional[PillarInfo] = None
+            try:
+                if "ganzi_relations" in wanted:
+                    # 获取当前大运
+                    current_destiny = self.get_current_destiny_pillar(
+                        original_solar_datetime, destiny_cycle, as_of=as_of
+                    )
+                # 获取当前流年
+                current_year = self.get_current_year_pillar(day_stem=day_stem_name, as_of=as_of)
+                if "ganzi_relations" in wanted:
+                    # 计算所有关系
+                    optional["ganzi_relations"] = self.calculate_all_ganzi_relations(
+                        year_pillar=year_pillar,
+                        month_pillar=month_pillar,
+                        day_pillar=day_pillar,
+                        hour_pillar=hour_pillar,
+                        destiny_pillar=current_destiny,
+                        year_fortune_pillar=current_year
+                    )
+            except Exception as e:
+                # 如果计算关系失败，返回空关系
+                logger.warning("Failed to calculate ganzi relations: %s", e)
+                if "ganzi_relations" in wanted:
+                    optional["ganzi_relations"] = GanZhiRelations()
+            if "current_year_pillar" in wanted:
+                optional["current_year_pillar"] = current_year
 
         return Chart(
             name=name,
@@ -497,52 +716,214 @@ class BaziPaipanEngine:
             zodiac_animal=zodiac_animal,
             true_solar_datetime=true_solar_datetime,  # 真太阳时
             birth_place=birth_place,  # 出生地点
-            birth_jieqi=birth_jieqi,
-            zodiac_sign=zodiac_sign,
-            star_mansion=star_mansion,
             day_master_display=day_master_display,
             fortune_element=fortune_element,
-            tai_yuan=tai_yuan,
-            tai_xi=tai_xi,
-            shen_gong=shen_gong,
-            ming_gong=ming_gong,
-            ren_yuan_si_ling=ren_yuan_si_ling,
-            kong_wang=kong_wang,
-            current_year_pillar=current_year,
-            ganzi_relations=ganzi_relations,
+            **optional,
+        )
+
+    def calculate_charts_batch(
+        self,
+        solar_datetimes: Sequence[datetime],
+        genders: Sequence[str],
+        tz_offsets: Optional[Sequence[int]] = None,
+        longitudes: Optional[Sequence[Optional[float]]] = None,
+        latitudes: Optional[Sequence[Optional[float]]] = None,
+        names: Optional[Sequence[Optional[str]]] = None,
+        birth_places: Optional[Sequence[str]] = None,
+        as_of: Optional[datetime] = None,
+    ) -> ChartBatch:
+        """
+        批量排盘，返回列式结果 ChartBatch。
+
+        与逐条调用 calculate_chart 的排盘规则相同（时区调整、真太阳时、以日为界的
+        年柱/月柱、起运与大运），但四柱取自逐日干支表、节气取自节气索引，
+        不再为每条记录创建 sxtwl 对象；完整 Chart 通过 ChartBatch.chart(i) 按需生成。
+
+        Args:
+            solar_datetimes: 阳历出生时间（北京时间）
+            genders: 性别 ("male" / "female")
+            tz_offsets: 时区偏移（相对UTC），默认全部为 0
+            longitudes: 出生地经度，None 表示不做真太阳时校正
+            latitudes: 出生地纬度
+            names: 姓名（仅用于懒加载 Chart）
+            birth_places: 出生地点名称（仅用于懒加载 Chart）
+            as_of: 参考时间（仅用于懒加载 Chart）
+        """
+        count = len(solar_datetimes)
+        if len(genders) != count:
+            raise ValueError("genders 与 solar_datetimes 长度不一致")
+        tz_offsets = tz_offsets if tz_offsets is not None else [0] * count
+        longitudes = longitudes if longitudes is not None else [None] * count
+        latitudes = latitudes if latitudes is not None else [None] * count
+        for column_name, column in (("tz_offsets", tz_offsets), ("longitudes", longitudes), ("latitudes", latitudes)):
+            if len(column) != count:
+                raise ValueError(f"{column_name} 与 solar_datetimes 长度不一致")
+
+        batch = ChartBatch(
+            self,
+            solar_datetimes=solar_datetimes,
+            genders=genders,
+            tz_offsets=tz_offsets,
+            longitudes=longitudes,
+            latitudes=latitudes,
+            names=names if names is not None else [None] * count,
+            birth_places=birth_places if birth_places is not None else [""] * count,
+            as_of=as_of,
         )
+        columns = batch.columns
+        year_col, month_col = columns["year_gz"], columns["month_gz"]
+        day_col, hour_col = columns["day_gz"], columns["hour_gz"]
+        element_cols = [columns[name] for name in ("wood", "fire", "earth", "metal", "water")]
+        forward_col = columns["is_forward"]
+        age_year_col, age_month_col = columns["start_age_year"], columns["start_age_month"]
+        age_day_col, qiyun_col = columns["start_age_day"], columns["qiyun_ordinal"]
+        destiny_gz_col, destiny_year_col = columns["destiny_first_gz"], columns["destiny_first_year"]
+
+        day_table = get_day_table()
+        jieqi_table = get_jieqi_table()
+        element_counts = self.kernel.gz_element_counts
+        stem_is_yang = [yinyang == "阳" for yinyang in self.kernel.stem_yinyang]
+
+        for i in range(count):
+            adjusted_dt = solar_datetimes[i] + timedelta(hours=tz_offsets[i])
+            if longitudes[i] is not None:
+                adjusted_dt = calculate_true_solar_time(adjusted_dt, longitudes[i], latitudes[i] or 0.0)
+
+            found = day_table.lookup(adjusted_dt.toordinal())
+            if found is None:
+                # 超出逐日表范围时退回 sxtwl
+                birth_day = sxtwl.fromSolar(adjusted_dt.year, adjusted_dt.month, adjusted_dt.day)
+                found = tuple(
+                    gz_index(gz.tg, gz.dz)
+                    for gz in (birth_day.getYearGZ(), birth_day.getMonthGZ(), birth_day.getDayGZ())
+                )
+            year_gz, month_gz, day_gz = found
+            hour_gz = gz_index(*self._get_hour_gz(day_gz % 10, adjusted_dt.hour))
+
+            year_col.append(year_gz)
+            month_col.append(month_gz)
+            day_col.append(day_gz)
+            hour_col.append(hour_gz)
+            for column, a, b, c, d in zip(
+                element_cols,
+                element_counts[year_gz],
+                element_counts[month_gz],
+                element_counts[day_gz],
+                element_counts[hour_gz],
+            ):
+                column.append(a + b + c + d)
+
+            # 起运与大运：阳男阴女顺行，阴男阳女逆行
+            is_yang_year = stem_is_yang[year_gz % 10]
+            is_forward = (genders[i] == "male" and is_yang_year) or (genders[i] == "female" and not is_yang_year)
+            nearest = jieqi_table.find_nearest(
+                adjusted_dt.year, adjusted_dt.month, adjusted_dt.day, is_forward
+            )
+            if nearest is None:
+                nearest = self._get_nearest_jieqi_time(
+                    sxtwl.fromSolar(adjusted_dt.year, adjusted_dt.month, adjusted_dt.day), is_forward
+                )
+            _minutes, years, months, days, qiyun_date = self._split_dayun_start(
+                (adjusted_dt.year, adjusted_dt.month, adjusted_dt.day, adjusted_dt.hour, adjusted_dt.minute),
+                nearest[1],
+            )
+            forward_col.append(is_forward)
+            age_year_col.append(years)
+            age_month_col.append(months)
+            age_day_col.append(days)
+            qiyun_col.append(qiyun_date.toordinal())
+            destiny_gz_col.append((month_gz + (1 if is_forward else -1)) % 60)
+            destiny_year_col.append(qiyun_date.year)
+
+        return batch
+
+    def calculate_pillar_derived_fields(
+        self,
+        year_gz: Tuple[int, int],
+        month_gz: Tuple[int, int],
+        day_gz: Tuple[int, int],
+        hour_gz: Tuple[int, int],
+        wanted: Collection[str] = PILLAR_DERIVED_FIELDS,
+    ) -> Dict[str, Any]:
+        """
+        计算只取决于四柱的可选字段（胎元、胎息、身宫、命宫、人元司令、空亡）。
+
+        各柱以 (天干序号, 地支序号) 表示；只返回 wanted 中列出的字段。
+        """
+        day_stem_name = self.TIAN_GAN_NAMES[day_gz[0]]
+        fields: Dict[str, Any] = {}
+
+        # 计算胎元
+        if "tai_yuan" in wanted:
+            fields["tai_yuan"] = self._calculate_tai_yuan(month_gz[0], month_gz[1], day_stem_name)
+
+        # 计算胎息（TODO: 实现真实计算）
+        if "tai_xi" in wanted:
+            fields["tai_xi"] = NaYinInfo(gan_zhi="戊辰", na_yin="大林木")
+
+        # 计算身宫（TODO: 实现真实计算）
+        if "shen_gong" in wanted:
+            fields["shen_gong"] = self._calculate_shen_gong(
+                month_gz[0], month_gz[1], hour_gz[0], hour_gz[1], day_stem_name
+            )
+
+        # 计算命宫
+        if "ming_gong" in wanted:
+            fields["ming_gong"] = self._calculate_ming_gong(month_gz[1], hour_gz[1], day_stem_name)
+
+        # 人元司令分野（TODO: 实现真实计算）
+        if "ren_yuan_si_ling" in wanted:
+            fields["ren_yuan_si_ling"] = self._calculate_ren_yuan_si_ling(month_gz[1])
+
+        # 计算空亡
+        if "kong_wang" in wanted:
+            fields["kong_wang"] = KongWangInfo(
+                year=self._calculate_kong_wang(*year_gz),
+                month=self._calculate_kong_wang(*month_gz),
+                day=self._calculate_kong_wang(*day_gz),
+                hour=self._calculate_kong_wang(*hour_gz),
+            )
+        return fields
 
     def _create_pillar_info(
         self, stem_index: int, branch_index: int, day_stem: str
     ) -> PillarInfo:
-        stem_name = self.TIAN_GAN_NAMES[stem_index]
-        branch_name = self.DI_ZHI_NAMES[branch_index]
-
-        hidden_stem_list: List[HeavenStemInfo] = []
-        for hidden_stem in self.BRANCH_HIDDEN_STEM[branch_name]:
-            hidden_stem_list.append(
-                HeavenStemInfo(
-                    name=hidden_stem,
-                    element=self.HEAVEN_STEM_ELEMENT_MAP[hidden_stem],
-                    yinyang=self.TIAN_GAN_YIN_YANG[hidden_stem],
-                    ten_god=self._calculate_stem_ten_god(hidden_stem, day_stem),
-                )
+        day_stem_index = self.kernel.stem_index[day_stem]
+        if stem_index % 2 != branch_index % 2:
+            # 阴阳不配的组合不在六十甲子内，不走缓存
+            return self._build_pillar_info(stem_index, branch_index, day_stem_index)
+        return self._pillar_prototypes[gz_index(stem_index, branch_index)][day_stem_index]
+
+    def _build_pillar_info(
+        self, stem_index: int, branch_index: int, day_stem_index: int
+    ) -> PillarInfo:
+        kernel = self.kernel
+        ten_gods = kernel.ten_god[day_stem_index]
+
+        hidden_stem_list: List[HeavenStemInfo] = [
+            HeavenStemInfo(
+                name=kernel.stem_names[hidden_stem],
+                element=kernel.stem_element[hidden_stem],
+                yinyang=kernel.stem_yinyang[hidden_stem],
+                ten_god=ten_gods[hidden_stem],
             )
+            for hidden_stem in kernel.hidden_stems[branch_index]
+        ]
 
         heaven_stem = HeavenStemInfo(
-            name=stem_name,
-            element=self.HEAVEN_STEM_ELEMENT_MAP[stem_name],
-            yinyang=self.TIAN_GAN_YIN_YANG[stem_name],
-            ten_god=self._calculate_stem_ten_god(stem_name, day_stem),
+            name=kernel.stem_names[stem_index],
+            element=kernel.stem_element[stem_index],
+            yinyang=kernel.stem_yinyang[stem_index],
+            ten_god=ten_gods[stem_index],
         )
 
-        na_yin, na_yin_trait = self._calculate_nayin(stem_name, branch_name)
+        na_yin, na_yin_trait = kernel.nayin[gz_index(stem_index, branch_index)]
         earth_branch = EarthBranchInfo(
-            name=branch_name,
-            element=self.EARTH_BRANCH_ELEMENT_MAP[branch_name],
-            yinyang=self.DI_ZHI_YIN_YANG[branch_name],
+            name=kernel.branch_names[branch_index],
+            element=kernel.branch_element[branch_index],
+            yinyang=kernel.branch_yinyang[branch_index],
             hidden_stems=hidden_stem_list,
-            star_fortune=self._calculate_star_fortune(day_stem, branch_name),
+            star_fortune=kernel.star_fortune[day_stem_index][branch_index],
         )
 
         return PillarInfo(
@@ -553,24 +934,22 @@ class BaziPaipanEngine:
         )
 
     def _calculate_stem_ten_god(self, stem: str, day_stem: str) -> str:
-        stem_element = self.HEAVEN_STEM_ELEMENT_MAP[stem]
-        day_element = self.HEAVEN_STEM_ELEMENT_MAP[day_stem]
-        relation = self.FIVE_ELEMENTS_RELATIONS[day_element][stem_element]
-        stem_yinyang = self.TIAN_GAN_YIN_YANG[stem]
-        day_yinyang = self.TIAN_GAN_YIN_YANG[day_stem]
-        return self.TEN_GODS[("同" if stem_yinyang == day_yinyang else "异", relation)]
+        kernel = self.kernel
+        return kernel.ten_god[kernel.stem_index[day_stem]][kernel.stem_index[stem]]
 
     def _calculate_nayin(self, stem: str, branch: str) -> Tuple[str, str]:
-        gan_zhi = f"{stem}{branch}"
-        na_yin = NA_YIN_TABLE.get(gan_zhi, "")
-        na_yin_trait = NA_YIN_TRAITS.get(na_yin, "") if na_yin else ""
-        return na_yin, na_yin_trait
+        gz = self._parse_gz_index(f"{stem}{branch}")
+        if gz is None:
+            return "", ""
+        return self.kernel.nayin[gz]
 
     def _calculate_star_fortune(self, day_stem: str, branch: str) -> str:
-        stem_table = STEM_CHANG_SHENG_TABLE.get(day_stem)
-        if not stem_table:
+        kernel = self.kernel
+        stem_index = kernel.stem_index.get(day_stem)
+        branch_index = kernel.branch_index.get(branch)
+        if stem_index is None or branch_index is None:
             return ""
-        return stem_table.get(branch, "")
+        return kernel.star_fortune[stem_index][branch_index]
 
     def _get_hour_gz(self, day_stem: int, hour: int) -> Tuple[int, int]:
         branch_index = (hour + 1) // 2 % 12
@@ -601,11 +980,17 @@ class BaziPaipanEngine:
         return {key: round(value / total * 100, 1) for key, value in counts.items()}
 
     def _calculate_dayun(
-        self, birth_day: sxtwl.Day, hour: int, minute: int, gender: str, day_stem: str
+        self,
+        birth_day: SolarDay,
+        hour: int,
+        minute: int,
+        gender: str,
+        day_stem: str,
+        as_of: Optional[datetime] = None,
     ) -> DestinyCycleInfo:
         year_gz = birth_day.getYearGZ()
         month_gz = birth_day.getMonthGZ()
-        is_yang_year = self.TIAN_GAN_YIN_YANG[self.TIAN_GAN_NAMES[year_gz.tg]] == "阳"
+        is_yang_year = self.kernel.stem_yinyang[year_gz.tg] == "阳"
         is_forward = (gender == "male" and is_yang_year) or (gender == "female" and not is_yang_year)
 
         _jieqi_idx, jieqi_time = self._get_nearest_jieqi_time(birth_day, is_forward)
@@ -617,19 +1002,12 @@ class BaziPaipanEngine:
         qiyun_date_solar = dayun_start_info["qiyun_date_solar"]
 
         destiny_pillars: List[DestinyPillarInfo] = []
-        current_gz_index = self.SEXAGENARY_CYCLE.index(
-            f"{self.TIAN_GAN_NAMES[month_gz.tg]}{self.DI_ZHI_NAMES[month_gz.dz]}"
-        )
+        current_gz_index = gz_index(month_gz.tg, month_gz.dz)
         first_cycle_year = qiyun_date_solar.year
 
         for i in range(12):
             current_gz_index = (current_gz_index + 1) % 60 if is_forward else (current_gz_index - 1 + 60) % 60
-            gz = self.SEXAGENARY_CYCLE[current_gz_index]
-            stem = gz[0]
-            branch = gz[1]
-            stem_index = self.TIAN_GAN_NAMES.index(stem)
-            branch_index = self.DI_ZHI_NAMES.index(branch)
-            pillar_info = self._create_pillar_info(stem_index, branch_index, day_stem)
+            pillar_info = self._create_pillar_info(current_gz_index % 10, current_gz_index % 12, day_stem)
             destiny_pillars.append(
                 DestinyPillarInfo(
                     heaven_stem=pillar_info.heaven_stem,
@@ -638,7 +1016,7 @@ class BaziPaipanEngine:
                 )
             )
 
-        current_year = datetime.now().year
+        current_year = (as_of or datetime.now()).year
         for idx, pillar in enumerate(destiny_pillars):
             next_year = destiny_pillars[idx + 1].year if idx + 1 < len(destiny_pillars) else None
             if current_year >= pillar.year and (next_year is None or current_year < next_year):
@@ -654,8 +1032,14 @@ class BaziPaipanEngine:
         )
 
     def _get_nearest_jieqi_time(
-        self, day: sxtwl.Day, is_forward: bool
+        self, day: SolarDay, is_forward: bool
     ) -> Tuple[int, Tuple[int, int, int, int, int, int]]:
+        # 优先查预计算的节气索引（二分查找），超出索引范围时再逐日遍历
+        found = get_jieqi_table().find_nearest(
+            day.getSolarYear(), day.getSolarMonth(), day.getSolarDay(), is_forward
+        )
+        if found is not None:
+            return found
         _day = sxtwl.fromSolar(day.getSolarYear(), day.getSolarMonth(), day.getSolarDay())
         while True:
             if _day.hasJieQi():
@@ -663,7 +1047,11 @@ class BaziPaipanEngine:
                 return _day.getJieQi(), (t.Y, t.M, t.D, round(t.h), round(t.m), round(t.s))
             _day = _day.after(1) if is_forward else _day.before(1)
 
-    def _calculate_dayun_start_age(self, birth_time: Tuple, jieqi_time: Tuple) -> dict:
+    @staticmethod
+    def _split_dayun_start(
+        birth_time: Tuple, jieqi_time: Tuple
+    ) -> Tuple[int, int, int, int, datetime]:
+        """出生到节气的分钟数折算起运：返回 (分钟数, 岁, 月, 日, 起运时间)"""
         dt1 = datetime(birth_time[0], birth_time[1], birth_time[2], birth_time[3], birth_time[4])
         dt2 = datetime(jieqi_time[0], jieqi_time[1], jieqi_time[2], jieqi_time[3], jieqi_time[4])
         delta_minutes = abs(int((dt2 - dt1).total_seconds() / 60))
@@ -680,10 +1068,18 @@ class BaziPaipanEngine:
         remaining_months_in_days = (remaining_days * 4) % 1
         final_days = int(remaining_months_in_days * 30)
 
-        birth_date = dt1
         total_days_for_date = years * 365 + months * 30 + final_days
-        qiyun_date = birth_date + timedelta(days=total_days_for_date)
-        qiyun_date_day = sxtwl.fromSolar(qiyun_date.year, qiyun_date.month, qiyun_date.day)
+        qiyun_date = dt1 + timedelta(days=total_days_for_date)
+        return delta_minutes, years, months, final_days, qiyun_date
+
+    def _calculate_dayun_start_age(self, birth_time: Tuple, jieqi_time: Tuple) -> dict:
+        delta_minutes, years, months, final_days, qiyun_date = self._split_dayun_start(
+            birth_time, jieqi_time
+        )
+        days = delta_minutes // (24 * 60)
+        hours = delta_minutes % (24 * 60) // 60
+        minutes = delta_minutes % 60
+        qiyun_date_day = solar_day(qiyun_date.year, qiyun_date.month, qiyun_date.day)
 
         return {
             "raw_minutes": delta_minutes,
@@ -710,7 +1106,7 @@ class BaziPaipanEngine:
         # 默认返回摩羯座（12月22日后）
         return "摩羯座"
 
-    def _calculate_star_mansion(self, birth_day: sxtwl.Day) -> str:
+    def _calculate_star_mansion(self, birth_day: SolarDay) -> str:
         """计算星宿（简化版：基于日期索引）"""
         # 简化计算：基于儒略日计算星宿索引
         # TODO: 实现精确的星宿计算
@@ -763,13 +1159,12 @@ class BaziPaipanEngine:
         na_yin = NA_YIN_TABLE.get(gan_zhi, "")
         return NaYinInfo(gan_zhi=gan_zhi, na_yin=na_yin)
 
-    def _calculate_ren_yuan_si_ling(self, birth_day: sxtwl.Day) -> str:
+    def _calculate_ren_yuan_si_ling(self, month_branch_idx: int) -> str:
         """
         计算人元司令分野（简化版）
         基于月支藏干的当令情况
         """
-        month_gz = birth_day.getMonthGZ()
-        month_branch = self.DI_ZHI_NAMES[month_gz.dz]
+        month_branch = self.DI_ZHI_NAMES[month_branch_idx]
         hidden_stems = self.BRANCH_HIDDEN_STEM.get(month_branch, [])
         if hidden_stems:
             # 返回主气（藏干第一位）+ "用事"
@@ -790,7 +1185,7 @@ class BaziPaipanEngine:
         kong_wang_2 = self.DI_ZHI_NAMES[(xun_start_branch + 11) % 12]
         return f"{kong_wang_1}{kong_wang_2}"
 
-    def _calculate_birth_jieqi(self, birth_day: sxtwl.Day, hour: int, minute: int) -> JieQiInfo:
+    def _calculate_birth_jieqi(self, birth_day: SolarDay, hour: int, minute: int) -> JieQiInfo:
         """计算出生时间距离前后节气的时间"""
         birth_dt = datetime(
             birth_day.getSolarYear(), birth_day.getSolarMonth(), birth_day.getSolarDay(),
@@ -847,10 +1242,6 @@ class BaziPaipanEngine:
         Returns:
             包含所有关系的GanZhiRelations对象
         """
-        stem_relations: List[GanZhiRelation] = []
-        branch_relations: List[GanZhiRelation] = []
-        stem_branch_relations: List[GanZhiRelation] = []
-        
         # 构建柱字典：{pillar_id: PillarInfo}
         pillar_dict = {
             "year": year_pillar,
@@ -863,283 +1254,306 @@ class BaziPaipanEngine:
         if year_fortune_pillar:
             pillar_dict["year_fortune"] = year_fortune_pillar
         
-        # 提取所有天干和地支
-        stem_dict = {pid: p.heaven_stem.name for pid, p in pillar_dict.items()}
-        branch_dict = {pid: p.earth_branch.name for pid, p in pillar_dict.items()}
+        key = self._relation_key(pillar_dict.items())
+        cached = self.relation_cache.get(key)
+        if cached is not None:
+            return cached
+        relations = self._assemble_relations(self._relation_entries(key))
+        self.relation_cache.put(key, relations)
+        return relations
+
+    def calculate_extra_pillar_relations(
+        self,
+        year_pillar: PillarInfo,
+        month_pillar: PillarInfo,
+        day_pillar: PillarInfo,
+        hour_pillar: PillarInfo,
+        extra_pillars: Sequence[Any],
+        slot: str = "destiny",
+    ) -> List[GanZhiRelations]:
+        """
+        本命四柱分别与每一个额外柱（如各步大运）组合后的全部干支关系
+        
+        本命四柱之间的关系只计算一次，每个额外柱只增量计算与它有关的关系
+        （包括由它补全的三合、三会），再按完整计算时的顺序合并。结果与逐个
+        调用 calculate_all_ganzi_relations 完全一致，并共用同一份缓存。
+        
+        Args:
+            year_pillar: 年柱
+            month_pillar: 月柱
+            day_pillar: 日柱
+            hour_pillar: 时柱
+            extra_pillars: 额外柱列表，只需具备 heaven_stem.name / earth_branch.name
+            slot: 额外柱的柱ID（destiny 或 year_fortune）
+        
+        Returns:
+            与 extra_pillars 一一对应的 GanZhiRelations 列表
+        """
+        natal_key = self._relation_key(
+            (("year", year_pillar), ("month", month_pillar), ("day", day_pillar), ("hour", hour_pillar))
+        )
+        natal_entries: Optional[List[Tuple[Tuple[int, ...], GanZhiRelation]]] = None
+        results: List[GanZhiRelations] = []
+        for pillar in extra_pillars:
+            key = natal_key + self._relation_key(((slot, pillar),))
+            relations = self.relation_cache.get(key)
+            if relations is None:
+                if natal_entries is None:
+                    natal_entries = self._relation_entries(natal_key)
+                delta_entries = self._relation_entries(key, focus=len(natal_key))
+                relations = self._assemble_relations(
+                    sorted(natal_entries + delta_entries, key=lambda entry: entry[0])
+                )
+                self.relation_cache.put(key, relations)
+            results.append(relations)
+        return results
+
+    def _relation_key(self, pillars: Iterable[Tuple[str, Any]]) -> Tuple[Tuple[str, int, int], ...]:
+        """关系只取决于各柱的位置与干支，以 (柱ID, 天干序号, 地支序号) 元组作为缓存键"""
+        return tuple(
+            (
+                pid,
+                self.kernel.stem_index[pillar.heaven_stem.name],
+                self.kernel.branch_index[pillar.earth_branch.name],
+            )
+            for pid, pillar in pillars
+        )
+
+    @staticmethod
+    def _assemble_relations(
+        entries: List[Tuple[Tuple[int, ...], GanZhiRelation]]
+    ) -> GanZhiRelations:
+        """按类别拆分已排序的关系条目并去重"""
+        grouped: Dict[str, Dict[tuple, GanZhiRelation]] = {
+            "stem": {},
+            "branch": {},
+            "stem_branch": {},
+        }
+        for _, relation in entries:
+            seen = grouped[relation.category]
+            dedupe_key = (relation.type, tuple(sorted(relation.pillars)), tuple(sorted(relation.ganzi_items)))
+            if dedupe_key not in seen:
+                seen[dedupe_key] = relation
+        return GanZhiRelations(
+            stem_relations=list(grouped["stem"].values()),
+            branch_relations=list(grouped["branch"].values()),
+            stem_branch_relations=list(grouped["stem_branch"].values()),
+        )
+
+    def _relation_entries(
+        self, key: Tuple[Tuple[str, int, int], ...], focus: Optional[int] = None
+    ) -> List[Tuple[Tuple[int, ...], GanZhiRelation]]:
+        """
+        按 (柱ID, 天干序号, 地支序号) 序列计算干支关系（不经过缓存，不去重）
+        
+        返回 (排序键, 关系) 列表，按排序键升序即为完整计算时的输出顺序，
+        因此增量结果可以与本命结果直接合并排序。focus 不为空时只返回
+        涉及第 focus 个柱的关系。
+        """
+        entries: List[Tuple[Tuple[int, ...], GanZhiRelation]] = []
+        
+        # 所有柱ID列表，以及对应的天干/地支名称与序号
+        all_pillar_ids = [pid for pid, _, _ in key]
+        stems = [stem for _, stem, _ in key]
+        branches = [branch for _, _, branch in key]
+        stem_names = [self.TIAN_GAN_NAMES[stem] for stem in stems]
+        branch_names = [self.DI_ZHI_NAMES[branch] for branch in branches]
+        fortune_flags = [pid in ("destiny", "year_fortune") for pid in all_pillar_ids]
+        count = len(all_pillar_ids)
+        tables = self.relation_tables
+        
+        # 每对柱（i < j）只查一次表，后续按关系类型依次输出
+        pairs = [
+            (i, j)
+            for i in range(count)
+            for j in range(i + 1, count)
+            if focus is None or focus in (i, j)
+        ]
+        stem_pairs = [(i, j, tables.stem_pair[stems[i]][stems[j]]) for i, j in pairs]
+        branch_pairs = [(i, j, tables.branch_pair[branches[i]][branches[j]]) for i, j in pairs]
+        stem_pairs = [item for item in stem_pairs if item[2]]
+        branch_pairs = [item for item in branch_pairs if item[2]]
         
-        # 所有柱ID列表
-        all_pillar_ids = list(pillar_dict.keys())
+        # 排序键首位为类别（天干 0 / 地支 1 / 同柱 2），次位为关系类型
         
         # ========== 天干关系计算 ==========
         
         # 1. 天干五合
-        for i, pid1 in enumerate(all_pillar_ids):
-            for pid2 in all_pillar_ids[i+1:]:
-                stem1, stem2 = stem_dict[pid1], stem_dict[pid2]
-                pair = (stem1, stem2)
-                pair_rev = (stem2, stem1)
-                for combo_pair, element in self.STEM_COMBINATIONS.items():
-                    if pair == combo_pair or pair_rev == combo_pair:
-                        involves_fortune = pid1 in ['destiny', 'year_fortune'] or pid2 in ['destiny', 'year_fortune']
-                        stem_relations.append(GanZhiRelation(
-                            type="合化",
-                            pillars=[pid1, pid2],
-                            ganzi_items=[stem1, stem2],
-                            description=f"{stem1}{stem2}合化{element}",
-                            element=element,
-                            category="stem",
-                            involves_fortune=involves_fortune
-                        ))
-                        break
+        for i, j, mask in stem_pairs:
+            if mask & STEM_COMBINE:
+                stem1, stem2 = stem_names[i], stem_names[j]
+                element = tables.stem_combine_element[stems[i]][stems[j]]
+                entries.append(((0, 0, i, j), GanZhiRelation(
+                    type="合化",
+                    pillars=[all_pillar_ids[i], all_pillar_ids[j]],
+                    ganzi_items=[stem1, stem2],
+                    description=f"{stem1}{stem2}合化{element}",
+                    element=element,
+                    category="stem",
+                    involves_fortune=fortune_flags[i] or fortune_flags[j]
+                )))
         
         # 2. 天干相冲
-        for i, pid1 in enumerate(all_pillar_ids):
-            for pid2 in all_pillar_ids[i+1:]:
-                stem1, stem2 = stem_dict[pid1], stem_dict[pid2]
-                pair = (stem1, stem2)
-                pair_rev = (stem2, stem1)
-                for clash_pair in self.STEM_CLASHES:
-                    if pair == clash_pair or pair_rev == clash_pair:
-                        involves_fortune = pid1 in ['destiny', 'year_fortune'] or pid2 in ['destiny', 'year_fortune']
-                        stem_relations.append(GanZhiRelation(
-                            type="相冲",
-                            pillars=[pid1, pid2],
-                            ganzi_items=[stem1, stem2],
-                            description=f"{stem1}{stem2}冲",
-                            element=None,
-                            category="stem",
-                            involves_fortune=involves_fortune
-                        ))
-                        break
+        for i, j, mask in stem_pairs:
+            if mask & STEM_CLASH:
+                stem1, stem2 = stem_names[i], stem_names[j]
+                entries.append(((0, 1, i, j), GanZhiRelation(
+                    type="相冲",
+                    pillars=[all_pillar_ids[i], all_pillar_ids[j]],
+                    ganzi_items=[stem1, stem2],
+                    description=f"{stem1}{stem2}冲",
+                    element=None,
+                    category="stem",
+                    involves_fortune=fortune_flags[i] or fortune_flags[j]
+                )))
         
-        # 3. 天干相克
-        for pid1 in all_pillar_ids:
-            for pid2 in all_pillar_ids:
-                if pid1 == pid2:
+        # 3. 天干相克（有方向，需遍历有序对）
+        for i in range(count):
+            ke_row = tables.stem_pair[stems[i]]
+            for j in range(count):
+                if i == j or (focus is not None and focus not in (i, j)):
                     continue
-                stem1, stem2 = stem_dict[pid1], stem_dict[pid2]
-                pair = (stem1, stem2)
-                for ke_pair in self.STEM_KE_PAIRS:
-                    if pair == ke_pair:
-                        involves_fortune = pid1 in ['destiny', 'year_fortune'] or pid2 in ['destiny', 'year_fortune']
-                        stem_relations.append(GanZhiRelation(
-                            type="相克",
-                            pillars=[pid1, pid2],
-                            ganzi_items=[stem1, stem2],
-                            description=f"{stem1}克{stem2}",
-                            element=None,
-                            category="stem",
-                            involves_fortune=involves_fortune
-                        ))
-                        break
+                if ke_row[stems[j]] & STEM_KE:
+                    stem1, stem2 = stem_names[i], stem_names[j]
+                    entries.append(((0, 2, i, j), GanZhiRelation(
+                        type="相克",
+                        pillars=[all_pillar_ids[i], all_pillar_ids[j]],
+                        ganzi_items=[stem1, stem2],
+                        description=f"{stem1}克{stem2}",
+                        element=None,
+                        category="stem",
+                        involves_fortune=fortune_flags[i] or fortune_flags[j]
+                    )))
         
         # ========== 地支关系计算 ==========
+        present_mask = branch_mask(branches)
+        # 增量计算时，三合/三会/相刑必须包含新柱的地支
+        focus_mask = 1 << branches[focus] if focus is not None else present_mask
+        positions = tables.positions_by_branch(branches)
         
         # 4. 地支六合
-        for i, pid1 in enumerate(all_pillar_ids):
-            for pid2 in all_pillar_ids[i+1:]:
-                branch1, branch2 = branch_dict[pid1], branch_dict[pid2]
-                pair = (branch1, branch2)
-                pair_rev = (branch2, branch1)
-                for combo_pair, element in self.BRANCH_SIX_COMBINATIONS.items():
-                    if pair == combo_pair or pair_rev == combo_pair:
-                        involves_fortune = pid1 in ['destiny', 'year_fortune'] or pid2 in ['destiny', 'year_fortune']
-                        branch_relations.append(GanZhiRelation(
-                            type="六合",
-                            pillars=[pid1, pid2],
-                            ganzi_items=[branch1, branch2],
-                            description=f"{branch1}{branch2}合化{element}",
-                            element=element,
-                            category="branch",
-                            involves_fortune=involves_fortune
-                        ))
-                        break
-        
-        # 5. 地支三合
-        for combo_set, element in self.BRANCH_THREE_COMBINATIONS.items():
-            # 找到每个地支在哪些柱位出现
-            branch_positions = {}  # {地支: [柱位列表]}
-            for branch in combo_set:
-                branch_positions[branch] = [pid for pid in all_pillar_ids if branch_dict[pid] == branch]
-
-            # 生成所有可能的三合组合
-            # 例如：寅在[大运,时柱]，午在[月柱]，戌在[日柱]
-            # 应该生成：[(大运,月柱,日柱), (时柱,月柱,日柱)]
-            branches_list = list(combo_set)
-            positions_list = [branch_positions[b] for b in branches_list]
-
-            # 使用笛卡尔积生成所有组合
-            for combo in product(*positions_list):
-                # combo 是一个元组，如 (大运, 月柱, 日柱)
-                unique_pillars = list(dict.fromkeys(combo))  # 去重并保持顺序
-
-                if len(unique_pillars) >= 2:
-                    found_branches = [branch_dict[pid] for pid in unique_pillars]
-                    involves_fortune = any(pid in ['destiny', 'year_fortune'] for pid in unique_pillars)
-
-                    if len(unique_pillars) == 3:
-                        branch_relations.append(GanZhiRelation(
-                            type="三合",
-                            pillars=unique_pillars,
-                            ganzi_items=found_branches,
-                            description=f"{''.join(found_branches)}三合{element}局",
-                            element=element,
-                            category="branch",
-                            involves_fortune=involves_fortune
-                        ))
-                    elif len(unique_pillars) == 2:
-                        branch_relations.append(GanZhiRelation(
-                            type="半合",
-                            pillars=unique_pillars,
-                            ganzi_items=found_branches,
-                            description=f"{''.join(found_branches)}半合{element}局",
-                            element=element,
-                            category="branch",
-                            involves_fortune=involves_fortune
-                        ))
+        for i, j, mask in branch_pairs:
+            if mask & BRANCH_SIX_COMBINE:
+                branch1, branch2 = branch_names[i], branch_names[j]
+                element = tables.branch_combine_element[branches[i]][branches[j]]
+                entries.append(((1, 0, i, j), GanZhiRelation(
+                    type="六合",
+                    pillars=[all_pillar_ids[i], all_pillar_ids[j]],
+                    ganzi_items=[branch1, branch2],
+                    description=f"{branch1}{branch2}合化{element}",
+                    element=element,
+                    category="branch",
+                    involves_fortune=fortune_flags[i] or fortune_flags[j]
+                )))
         
-        # 6. 地支三会
-        for combo_set, element in self.BRANCH_THREE_MEETINGS.items():
-            # 找到每个地支在哪些柱位出现
-            branch_positions = {}  # {地支: [柱位列表]}
-            for branch in combo_set:
-                branch_positions[branch] = [pid for pid in all_pillar_ids if branch_dict[pid] == branch]
-
-            # 生成所有可能的三会组合
-            branches_list = list(combo_set)
-            positions_list = [branch_positions[b] for b in branches_list]
-
-            # 使用笛卡尔积生成所有组合
-            for combo in product(*positions_list):
-                # combo 是一个元组，如 (大运, 月柱, 日柱)
-                unique_pillars = list(dict.fromkeys(combo))  # 去重并保持顺序
-
-                if len(unique_pillars) == 3:
-                    found_branches = [branch_dict[pid] for pid in unique_pillars]
-                    involves_fortune = any(pid in ['destiny', 'year_fortune'] for pid in unique_pillars)
-                    branch_relations.append(GanZhiRelation(
-                        type="三会",
-                        pillars=unique_pillars,
-                        ganzi_items=found_branches,
-                        description=f"{''.join(found_branches)}三会{element}方",
+        # 5. 地支三合 / 6. 地支三会：三个地支须同时出现（掩码判断），
+        # 再按各地支所在柱位做笛卡尔积，如寅在[大运,时柱]、午在[月柱]、戌在[日柱]
+        # 生成 (大运,月柱,日柱)、(时柱,月柱,日柱)
+        for rank, triads, relation_type, suffix in (
+            (1, tables.three_combinations, "三合", "局"),
+            (2, tables.three_meetings, "三会", "方"),
+        ):
+            for combo_index, (combo, combo_mask, element) in enumerate(triads):
+                if present_mask & combo_mask != combo_mask or not combo_mask & focus_mask:
+                    continue
+                found_branches = [self.DI_ZHI_NAMES[b] for b in combo]
+                label = "".join(found_branches)
+                for combo_positions in product(*(positions[b] for b in combo)):
+                    if focus is not None and focus not in combo_positions:
+                        continue
+                    entries.append(((1, rank, combo_index) + combo_positions, GanZhiRelation(
+                        type=relation_type,
+                        pillars=[all_pillar_ids[i] for i in combo_positions],
+                        ganzi_items=list(found_branches),
+                        description=f"{label}{relation_type}{element}{suffix}",
                         element=element,
                         category="branch",
-                        involves_fortune=involves_fortune
-                    ))
+                        involves_fortune=any(fortune_flags[i] for i in combo_positions)
+                    )))
         
         # 7. 地支六冲
-        for i, pid1 in enumerate(all_pillar_ids):
-            for pid2 in all_pillar_ids[i+1:]:
-                branch1, branch2 = branch_dict[pid1], branch_dict[pid2]
-                pair = (branch1, branch2)
-                pair_rev = (branch2, branch1)
-                for clash_pair in self.BRANCH_SIX_CLASHES:
-                    if pair == clash_pair or pair_rev == clash_pair:
-                        involves_fortune = pid1 in ['destiny', 'year_fortune'] or pid2 in ['destiny', 'year_fortune']
-                        branch_relations.append(GanZhiRelation(
-                            type="六冲",
-                            pillars=[pid1, pid2],
-                            ganzi_items=[branch1, branch2],
-                            description=f"{branch1}{branch2}冲",
-                            element=None,
-                            category="branch",
-                            involves_fortune=involves_fortune
-                        ))
-                        break
+        for i, j, mask in branch_pairs:
+            if mask & BRANCH_SIX_CLASH:
+                branch1, branch2 = branch_names[i], branch_names[j]
+                entries.append(((1, 3, i, j), GanZhiRelation(
+                    type="六冲",
+                    pillars=[all_pillar_ids[i], all_pillar_ids[j]],
+                    ganzi_items=[branch1, branch2],
+                    description=f"{branch1}{branch2}冲",
+                    element=None,
+                    category="branch",
+                    involves_fortune=fortune_flags[i] or fortune_flags[j]
+                )))
         
         # 8. 地支相刑
-        for punishment_type, pairs in self.BRANCH_PUNISHMENTS.items():
-            for pair in pairs:
-                if pair[0] == pair[1]:
-                    # 自刑：检查同一个地支出现两次或以上
-                    found_pillars = [pid for pid in all_pillar_ids if branch_dict[pid] == pair[0]]
-                    if len(found_pillars) >= 2:
-                        # 每两个相同地支之间都存在自刑关系
-                        for i in range(len(found_pillars)-1):
-                            for j in range(i+1, len(found_pillars)):
-                                pid1, pid2 = found_pillars[i], found_pillars[j]
-                                involves_fortune = pid1 in ['destiny', 'year_fortune'] or pid2 in ['destiny', 'year_fortune']
-                                branch_relations.append(GanZhiRelation(
-                                    type="自刑",
-                                    pillars=[pid1, pid2],
-                                    ganzi_items=[pair[0], pair[0]],
-                                    description=f"{pair[0]}{pair[0]}自刑",
-                                    element=None,
-                                    category="branch",
-                                    involves_fortune=involves_fortune
-                                ))
-                else:
-                    # 其他刑：建立所有可能的组合关系
-                    pid1_list = [pid for pid in all_pillar_ids if branch_dict[pid] == pair[0]]
-                    pid2_list = [pid for pid in all_pillar_ids if branch_dict[pid] == pair[1]]
-                    # 为每对匹配的地支建立关系
-                    for pid1 in pid1_list:
-                        for pid2 in pid2_list:
-                            involves_fortune = pid1 in ['destiny', 'year_fortune'] or pid2 in ['destiny', 'year_fortune']
-                            branch_relations.append(GanZhiRelation(
-                                type="相刑",
-                                pillars=[pid1, pid2],
-                                ganzi_items=[pair[0], pair[1]],
-                                description=f"{pair[0]}刑{pair[1]}（{punishment_type}）",
-                                element=None,
-                                category="branch",
-                                involves_fortune=involves_fortune
-                            ))
+        for punishment_index, (punishment_type, first, second, pair_mask) in enumerate(tables.punishments):
+            if present_mask & pair_mask != pair_mask or not pair_mask & focus_mask:
+                continue
+            name1, name2 = self.DI_ZHI_NAMES[first], self.DI_ZHI_NAMES[second]
+            if first == second:
+                # 自刑：每两个相同地支之间都存在自刑关系
+                found = positions[first]
+                matches = [
+                    (found[a], found[b])
+                    for a in range(len(found) - 1)
+                    for b in range(a + 1, len(found))
+                ]
+                relation_type = "自刑"
+                description = f"{name1}{name1}自刑"
+            else:
+                # 其他刑：为每对匹配的地支建立关系
+                matches = [(i, j) for i in positions[first] for j in positions[second]]
+                relation_type = "相刑"
+                description = f"{name1}刑{name2}（{punishment_type}）"
+            for i, j in matches:
+                if focus is not None and focus not in (i, j):
+                    continue
+                entries.append(((1, 4, punishment_index, i, j), GanZhiRelation(
+                    type=relation_type,
+                    pillars=[all_pillar_ids[i], all_pillar_ids[j]],
+                    ganzi_items=[name1, name2],
+                    description=description,
+                    element=None,
+                    category="branch",
+                    involves_fortune=fortune_flags[i] or fortune_flags[j]
+                )))
         
         # 9. 地支相害
-        for i, pid1 in enumerate(all_pillar_ids):
-            for pid2 in all_pillar_ids[i+1:]:
-                branch1, branch2 = branch_dict[pid1], branch_dict[pid2]
-                pair = (branch1, branch2)
-                pair_rev = (branch2, branch1)
-                for harm_pair in self.BRANCH_HARMS:
-                    if pair == harm_pair or pair_rev == harm_pair:
-                        involves_fortune = pid1 in ['destiny', 'year_fortune'] or pid2 in ['destiny', 'year_fortune']
-                        branch_relations.append(GanZhiRelation(
-                            type="相害",
-                            pillars=[pid1, pid2],
-                            ganzi_items=[branch1, branch2],
-                            description=f"{branch1}{branch2}害",
-                            element=None,
-                            category="branch",
-                            involves_fortune=involves_fortune
-                        ))
-                        break
+        for i, j, mask in branch_pairs:
+            if mask & BRANCH_HARM:
+                branch1, branch2 = branch_names[i], branch_names[j]
+                entries.append(((1, 5, i, j), GanZhiRelation(
+                    type="相害",
+                    pillars=[all_pillar_ids[i], all_pillar_ids[j]],
+                    ganzi_items=[branch1, branch2],
+                    description=f"{branch1}{branch2}害",
+                    element=None,
+                    category="branch",
+                    involves_fortune=fortune_flags[i] or fortune_flags[j]
+                )))
         
         # ========== 天干地支相生关系计算（同柱）==========
-        for pid in all_pillar_ids:
-            stem = stem_dict[pid]
-            branch = branch_dict[pid]
-            stem_element = self.HEAVEN_STEM_ELEMENT_MAP[stem]
-            branch_element = self.EARTH_BRANCH_ELEMENT_MAP[branch]
+        for i, pid in enumerate(all_pillar_ids):
+            if focus is not None and i != focus:
+                continue
+            stem = stem_names[i]
+            branch = branch_names[i]
+            stem_element = self.kernel.stem_element[stems[i]]
+            branch_element = self.kernel.branch_element[branches[i]]
             
             # 检查地支生天干
             if self.FIVE_ELEMENTS_生.get(branch_element) == stem_element:
-                involves_fortune = pid in ['destiny', 'year_fortune']
-                stem_branch_relations.append(GanZhiRelation(
+                entries.append(((2, 0, i), GanZhiRelation(
                     type="相生",
                     pillars=[pid],
                     ganzi_items=[branch, stem],
                     description=f"{branch}{branch_element}生{stem}{stem_element}",
                     element=stem_element,
                     category="stem_branch",
-                    involves_fortune=involves_fortune
-                ))
-        
-        # 去重
-        def dedupe(relations: List[GanZhiRelation]) -> List[GanZhiRelation]:
-            seen_dict = {}
-            for r in relations:
-                key = (r.type, tuple(sorted(r.pillars)), tuple(sorted(r.ganzi_items)))
-                if key not in seen_dict:
-                    seen_dict[key] = r
-            return list(seen_dict.values())
+                    involves_fortune=fortune_flags[i]
+                )))
         
-        return GanZhiRelations(
-            stem_relations=dedupe(stem_relations),
-            branch_relations=dedupe(branch_relations),
-            stem_branch_relations=dedupe(stem_branch_relations),
-        )
+        return entries
 
     def find_dates_by_pillars(
         self,
@@ -1149,6 +1563,7 @@ class BaziPaipanEngine:
         hour_pillar: str,
         start_year: int = 1801,
         end_year: int = 2099,
+        solver: str = "index",
     ) -> List[Dict[str, Any]]:
         """
         根据四柱八字查找对应的日期
@@ -1160,12 +1575,14 @@ class BaziPaipanEngine:
             hour_pillar: 时柱，如"丁卯"
             start_year: 查找起始年份
             end_year: 查找结束年份
+            solver: 反查方式
+                - index: 索引范围内查倒排索引，范围外用六十日周期推算（默认）
+                - cycle: 全部用六十日周期推算，不依赖预计算数据
+                - scan: 逐日比对（最慢，用于对照校验）
             
         Returns:
             匹配的日期列表
         """
-        matched_dates = []
-        
         # 验证四柱格式
         if (
             len(year_pillar) != 2
@@ -1174,7 +1591,127 @@ class BaziPaipanEngine:
             or len(hour_pillar) != 2
         ):
             raise ValueError("四柱格式错误，每柱应为两个字符（天干+地支）")
-        
+
+        if solver not in ("index", "cycle", "scan"):
+            raise ValueError(f"未知的反查方式：{solver}")
+
+        gz_indices = [
+            self._parse_gz_index(pillar) for pillar in (year_pillar, month_pillar, day_pillar)
+        ]
+        if any(gz is None for gz in gz_indices):
+            return []
+
+        pillars = (year_pillar, month_pillar, day_pillar, hour_pillar)
+        if solver == "scan":
+            return self._scan_dates_by_pillars(*pillars, start_year, end_year)
+        if solver == "cycle":
+            return self._cycle_dates_by_pillars(*pillars, start_year, end_year)
+
+        # 索引覆盖范围内走倒排索引，范围外的年份用六十日周期推算
+        index = get_pillar_index()
+        indexed_start = max(start_year, index.start_year)
+        indexed_end = min(end_year, index.end_year)
+        if indexed_start > indexed_end:
+            return self._cycle_dates_by_pillars(*pillars, start_year, end_year)
+
+        matched_dates: List[Dict[str, Any]] = []
+        if start_year < indexed_start:
+            matched_dates.extend(
+                self._cycle_dates_by_pillars(*pillars, start_year, indexed_start - 1)
+            )
+        for solar_date in index.lookup(*gz_indices, start_year=indexed_start, end_year=indexed_end):
+            birth_day = solar_day(solar_date.year, solar_date.month, solar_date.day)
+            matched_dates.extend(
+                self._match_hour_pillar(
+                    birth_day, solar_date.year, solar_date.month, solar_date.day, hour_pillar
+                )
+            )
+        if end_year > indexed_end:
+            matched_dates.extend(
+                self._cycle_dates_by_pillars(*pillars, indexed_end + 1, end_year)
+            )
+        return matched_dates
+
+    def _parse_gz_index(self, gan_zhi: str) -> Optional[int]:
+        """干支字符串转六十甲子序号，无法识别时返回 None"""
+        return self.kernel.gz_lookup.get(gan_zhi)
+
+    def _cycle_dates_by_pillars(
+        self,
+        year_pillar: str,
+        month_pillar: str,
+        day_pillar: str,
+        hour_pillar: str,
+        start_year: int,
+        end_year: int,
+    ) -> List[Dict[str, Any]]:
+        """
+        六十日周期反查：不依赖预计算数据，适用于任意年份范围
+
+        年柱每 60 年重复一次，月柱由节（立春、惊蛰……）划定的月份窗口决定，
+        日柱每 60 天重复一次。因此只需在每个候选年份的目标月份窗口内
+        定位唯一一个日柱相符的日子，再校验一次年/月/日柱即可。
+        """
+        gz_lookup = self.kernel.gz_lookup
+        year_gz = gz_lookup[year_pillar]
+        month_gz = gz_lookup[month_pillar]
+        day_gz = gz_lookup[day_pillar]
+        # 月份窗口序号：0=寅月（立春起）... 11=丑月（小寒起，落在次年1月）
+        window_index = (month_gz % 12 - 2) % 12
+
+        matched_dates: List[Dict[str, Any]] = []
+        # 立春所在公历年 L 的年柱为 (L - 4) % 60；丑月、子月窗口会跨到 L+1 年，
+        # 因此从 start_year - 1 开始找满足年柱的 L，此后每 60 年一个候选
+        jieqi_year = start_year - 1 + (year_gz + 4 - (start_year - 1)) % 60
+        while jieqi_year <= end_year:
+            window_start, window_end = self._jie_window(jieqi_year, window_index)
+            offset = (day_gz - self._day_gz_index(window_start)) % 60
+            candidate = window_start + timedelta(days=offset)
+            if candidate <= window_end and start_year <= candidate.year <= end_year:
+                birth_day = solar_day(candidate.year, candidate.month, candidate.day)
+                if (
+                    self._sxtwl_gz_index(birth_day.getYearGZ()) == year_gz
+                    and self._sxtwl_gz_index(birth_day.getMonthGZ()) == month_gz
+                    and self._sxtwl_gz_index(birth_day.getDayGZ()) == day_gz
+                ):
+                    matched_dates.extend(
+                        self._match_hour_pillar(
+                            birth_day, candidate.year, candidate.month, candidate.day, hour_pillar
+                        )
+                    )
+            jieqi_year += 60
+        return matched_dates
+
+    def _jie_window(self, jieqi_year: int, window_index: int) -> Tuple[date, date]:
+        """返回某节气年第 window_index 个月份窗口可能覆盖的公历日期范围（含两端余量）"""
+        start_month, start_min_day, _ = self.JIE_DATE_RANGES[window_index]
+        end_month, _, end_max_day = self.JIE_DATE_RANGES[(window_index + 1) % 12]
+        start_year = jieqi_year + 1 if window_index == 11 else jieqi_year
+        end_year = jieqi_year + 1 if window_index >= 10 else jieqi_year
+        window_start = date(start_year, start_month, start_min_day) - timedelta(days=1)
+        window_end = date(end_year, end_month, end_max_day) + timedelta(days=1)
+        return window_start, window_end
+
+    def _day_gz_index(self, solar_date: date) -> int:
+        """日柱六十甲子序号（以 1949-10-01 甲子日为基准推算）"""
+        return (solar_date.toordinal() - JIAZI_DAY_ORDINAL) % 60
+
+    @staticmethod
+    def _sxtwl_gz_index(gz: Any) -> int:
+        return gz_index(gz.tg, gz.dz)
+
+    def _scan_dates_by_pillars(
+        self,
+        year_pillar: str,
+        month_pillar: str,
+        day_pillar: str,
+        hour_pillar: str,
+        start_year: int,
+        end_year: int,
+    ) -> List[Dict[str, Any]]:
+        """逐日比对年/月/日柱（索引范围外的兜底路径）"""
+        matched_dates = []
+
         # 遍历每一年
         for year in range(start_year, end_year + 1):
             # 遍历每一天（使用简单的日期遍历）
@@ -1194,7 +1731,7 @@ class BaziPaipanEngine:
                 for day in range(1, days_in_month + 1):
                     # 尝试计算这一天的四柱
                     try:
-                        birth_day = sxtwl.fromSolar(year, month, day)
+                        birth_day = solar_day(year, month, day)
                         year_gz = birth_day.getYearGZ()
                         month_gz = birth_day.getMonthGZ()
                         day_gz = birth_day.getDayGZ()
@@ -1210,40 +1747,52 @@ class BaziPaipanEngine:
                             and month_str == month_pillar
                             and day_str == day_pillar
                         ):
-                            # 遍历每个时辰（24小时，每2小时一个时辰）
-                            for hour in range(0, 24, 2):
-                                hour_gz = self._get_hour_gz(day_gz.tg, hour)
-                                hour_str = f"{self.TIAN_GAN_NAMES[hour_gz[0]]}{self.DI_ZHI_NAMES[hour_gz[1]]}"
-                                
-                                if hour_str == hour_pillar:
-                                    # 找到匹配的日期时间
-                                    # 计算农历信息用于显示
-                                    lunar_year = birth_day.getLunarYear()
-                                    lunar_month = birth_day.getLunarMonth()
-                                    lunar_day = birth_day.getLunarDay()
-                                    is_leap = birth_day.isLunarLeap()
-                                    
-                                    lunar_month_labels = [
-                                        "正月", "二月", "三月", "四月", "五月", "六月",
-                                        "七月", "八月", "九月", "十月", "冬月", "腊月"
-                                    ]
-                                    lunar_display = f"农历{lunar_year}年{'闰' if is_leap else ''}{lunar_month_labels[lunar_month - 1]}{lunar_day}日 {hour:02d}时"
-                                    
-                                    matched_dates.append({
-                                        "year": year,
-                                        "month": month,
-                                        "day": day,
-                                        "hour": hour,
-                                        "minute": 0,
-                                        "lunar_display": lunar_display,
-                                    })
+                            matched_dates.extend(
+                                self._match_hour_pillar(birth_day, year, month, day, hour_pillar)
+                            )
                     except Exception:
                         # 跳过无效日期
                         continue
         
         return matched_dates
 
-    def get_current_year_pillar(self, day_stem: Optional[str] = None, year: Optional[int] = None) -> PillarInfo:
+    def _match_hour_pillar(
+        self, birth_day: SolarDay, year: int, month: int, day: int, hour_pillar: str
+    ) -> List[Dict[str, Any]]:
+        """年/月/日柱已匹配的日期上，逐个时辰比对时柱"""
+        matched_dates = []
+        day_gz = birth_day.getDayGZ()
+        # 遍历每个时辰（24小时，每2小时一个时辰）
+        for hour in range(0, 24, 2):
+            hour_gz = self._get_hour_gz(day_gz.tg, hour)
+            hour_str = f"{self.TIAN_GAN_NAMES[hour_gz[0]]}{self.DI_ZHI_NAMES[hour_gz[1]]}"
+            
+            if hour_str == hour_pillar:
+                # 找到匹配的日期时间
+                # 计算农历信息用于显示
+                lunar_display = self._format_lunar_display(
+                    birth_day.getLunarYear(),
+                    birth_day.getLunarMonth(),
+                    birth_day.getLunarDay(),
+                    birth_day.isLunarLeap(),
+                ) + f" {hour:02d}时"
+                
+                matched_dates.append({
+                    "year": year,
+                    "month": month,
+                    "day": day,
+                    "hour": hour,
+                    "minute": 0,
+                    "lunar_display": lunar_display,
+                })
+        return matched_dates
+
+    def get_current_year_pillar(
+        self,
+        day_stem: Optional[str] = None,
+        year: Optional[int] = None,
+        as_of: Optional[datetime] = None,
+    ) -> PillarInfo:
         """
         获取流年干支柱
         
@@ -1252,24 +1801,30 @@ class BaziPaipanEngine:
         
         Args:
             year: 年份，默认为None（使用当前日期）。如果指定年份，会使用该年立春后的日期
+            as_of: 参考时间，未指定年份时代替当前日期
         
         Returns:
             流年的干支柱信息
         """
         # 使用当前日期计算流年（sxtwl会自动根据立春判断年份）
-        now = datetime.now()
+        now = as_of or datetime.now()
         if year is not None:
             # 如果指定了年份，使用该年立春后的日期（通常立春在2月4-5日）
             # 使用2月5日确保在立春之后，获取正确的流年
-            day = sxtwl.fromSolar(year, 2, 5)
+            day = solar_day(year, 2, 5)
         else:
             # 使用当前日期，sxtwl会自动根据立春判断
-            day = sxtwl.fromSolar(now.year, now.month, now.day)
+            day = solar_day(now.year, now.month, now.day)
         
         year_gz = day.getYearGZ()
-        
-        stem_name = self.TIAN_GAN_NAMES[year_gz.tg]
-        branch_name = self.DI_ZHI_NAMES[year_gz.dz]
+        return self.build_year_fortune_pillar(year_gz.tg, year_gz.dz, day_stem)
+
+    def build_year_fortune_pillar(
+        self, stem_index: int, branch_index: int, day_stem: Optional[str] = None
+    ) -> PillarInfo:
+        """由干支序号构建流年柱（不含十神与藏干，星运按日干推算）"""
+        stem_name = self.TIAN_GAN_NAMES[stem_index]
+        branch_name = self.DI_ZHI_NAMES[branch_index]
         
         # 构建天干信息
         heaven_stem = HeavenStemInfo(
@@ -1296,10 +1851,105 @@ class BaziPaipanEngine:
             na_yin_trait=na_yin_trait,
         )
 
+    def calculate_annual_timeline(
+        self,
+        chart: Chart,
+        start_year: Optional[int] = None,
+        end_year: Optional[int] = None,
+    ) -> AnnualTimeline:
+        """
+        流年时间线：逐年给出流年柱、所在大运与干支关系。
+
+        本命四柱之间的关系只计算一次；每步大运与本命的增量关系在该步的各年之间共用，
+        每个流年只增量计算与流年柱有关的关系。各年的完整关系与调用
+        calculate_all_ganzi_relations（本命 + 所在大运 + 流年）一致，并共用同一份缓存。
+
+        Args:
+            chart: 命盘
+            start_year: 起始年份（含），默认为出生年
+            end_year: 结束年份（含），默认为起始年后 100 年
+
+        Raises:
+            ValueError: 补全默认值后的区间倒置、跨度超过 200 年或年份超出 1800-2200
+        """
+        birth_year = chart.solar_datetime.year
+        start_year = birth_year if start_year is None else start_year
+        end_year = start_year + 100 if end_year is None else end_year
+        if end_year < start_year:
+            raise ValueError("end_year 不能早于 start_year")
+        if end_year - start_year > 200:
+            raise ValueError("时间线跨度不能超过 200 年")
+        if start_year < 1800 or end_year > 2200:
+            raise ValueError("时间线年份须在 1800-2200 之间")
+        day_stem = chart.day_pillar.heaven_stem.name
+        natal_key = self._relation_key(
+            (
+                ("year", chart.year_pillar),
+                ("month", chart.month_pillar),
+                ("day", chart.day_pillar),
+                ("hour", chart.hour_pillar),
+            )
+        )
+        destiny_pillars = chart.destiny_cycle.destiny_pillars
+        destiny_years = [pillar.year for pillar in destiny_pillars]
+        destiny_keys = [self._relation_key((("destiny", pillar),)) for pillar in destiny_pillars]
+
+        # 未排序合并前的关系条目：本命，以及本命 + 各步大运
+        base_entries: Dict[Tuple[Tuple[str, int, int], ...], List[Tuple[Tuple[int, ...], GanZhiRelation]]] = {}
+
+        def _entries(base_key: Tuple[Tuple[str, int, int], ...]) -> List[Tuple[Tuple[int, ...], GanZhiRelation]]:
+            entries = base_entries.get(base_key)
+            if entries is None:
+                if base_key == natal_key:
+                    entries = self._relation_entries(natal_key)
+                else:
+                    entries = _entries(natal_key) + self._relation_entries(base_key, focus=len(natal_key))
+                base_entries[base_key] = entries
+            return entries
+
+        years: List[AnnualFortuneInfo] = []
+        for year in range(start_year, end_year + 1):
+            # 干支纪年：公元 4 年为甲子年
+            gz = (year - 4) % 60
+            pillar = self._create_pillar_info(gz % 10, gz % 12, day_stem)
+            destiny_index = bisect_right(destiny_years, year) - 1
+            base_key = natal_key if destiny_index < 0 else natal_key + destiny_keys[destiny_index]
+            key = base_key + (("year_fortune", gz % 10, gz % 12),)
+            relations = self.relation_cache.get(key)
+            if relations is None:
+                delta_entries = self._relation_entries(key, focus=len(base_key))
+                relations = self._assemble_relations(
+                    sorted(_entries(base_key) + delta_entries, key=lambda entry: entry[0])
+                )
+                self.relation_cache.put(key, relations)
+            destiny = destiny_pillars[destiny_index] if destiny_index >= 0 else None
+            years.append(
+                AnnualFortuneInfo(
+                    year=year,
+                    age=year - birth_year,
+                    pillar=pillar,
+                    destiny_index=destiny_index if destiny is not None else None,
+                    destiny_gan_zhi=f"{destiny.heaven_stem.name}{destiny.earth_branch.name}" if destiny else "",
+                    relations=GanZhiRelations(
+                        stem_relations=[r for r in relations.stem_relations if r.involves_fortune],
+                        branch_relations=[r for r in relations.branch_relations if r.involves_fortune],
+                        stem_branch_relations=[r for r in relations.stem_branch_relations if r.involves_fortune],
+                    ),
+                )
+            )
+
+        return AnnualTimeline(
+            natal_relations=self.calculate_all_ganzi_relations(
+                chart.year_pillar, chart.month_pillar, chart.day_pillar, chart.hour_pillar
+            ),
+            years=years,
+        )
+
     def get_current_destiny_pillar(
         self, 
         birth_datetime: datetime, 
-        destiny_cycle: DestinyCycleInfo
+        destiny_cycle: DestinyCycleInfo,
+        as_of: Optional[datetime] = None,
     ) -> Optional[PillarInfo]:
         """
         获取当前大运柱
@@ -1307,11 +1957,12 @@ class BaziPaipanEngine:
         Args:
             birth_datetime: 出生日期时间
             destiny_cycle: 大运信息
+            as_of: 参考时间，默认为当前时间
         
         Returns:
             当前大运柱，如果还未起运则返回 None
         """
-        now = datetime.now()
+        now = as_of or datetime.now()
         
         # 计算起运日期
         start_age = destiny_cycle.start_age
@@ -0,0 +1,335 @@
+"""
+逐日历表文件（内存映射）
+
+排盘、流年、起运日农历、四柱反查都要经过 ``sxtwl.fromSolar``。这里提供一个构建
+步骤，把 1801-2100 年每一天的年/月/日柱、农历年/月/日/闰月标记，以及当天的
+节气序号与交节时刻（儒略日）写成一个定长记录的二进制文件：
+
+    python -m src.engine.calendar_table            # 或 make calendar-table
+
+运行时以只读 ``mmap`` 打开该文件，按日期 ordinal 直接定位记录，读取时不做任何
+解析；多个 worker 进程映射同一文件时共享操作系统的页缓存。文件缺失、损坏或
+日期超出范围时统一退回 sxtwl。
+"""
+
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+import sys
+import threading
+from datetime import date
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional, Tuple, Union
+
+import sxtwl
+
+from src.engine.ganzhi_kernel import gz_index
+
+CALENDAR_TABLE_START_YEAR = 1801
+CALENDAR_TABLE_END_YEAR = 2100
+
+DEFAULT_CALENDAR_TABLE_PATH = Path(__file__).resolve().parents[1] / "data" / "calendar_table.bin"
+CALENDAR_TABLE_PATH = Path(os.getenv("CALENDAR_TABLE_PATH", "").strip() or DEFAULT_CALENDAR_TABLE_PATH)
+
+_MAGIC = b"BZCT"
+_VERSION = 1
+# 文件头：魔数、版本、记录长度、首日 ordinal、记录条数
+_HEADER = struct.Struct("<4sHHiI")
+# 记录：年柱、月柱、日柱、农历年、农历月、农历日、标记位、节气序号、交节儒略日
+_RECORD = struct.Struct("<BBBhBBBBd")
+_GZ_PREFIX = struct.Struct("<BBB")
+
+_FLAG_LEAP = 0x01
+_FLAG_JIEQI = 0x02
+
+
+class CalendarGZ(NamedTuple):
+    """与 ``sxtwl.GZ`` 相同的 tg/dz 字段"""
+
+    tg: int
+    dz: int
+
+
+class CalendarRecord(NamedTuple):
+    """历表中的一条逐日记录（干支为六十甲子序号）"""
+
+    year_gz: int
+    month_gz: int
+    day_gz: int
+    lunar_year: int
+    lunar_month: int
+    lunar_day: int
+    flags: int
+    jieqi_index: int
+    jieqi_jd: float
+
+    @property
+    def is_leap_month(self) -> bool:
+        return bool(self.flags & _FLAG_LEAP)
+
+    @property
+    def has_jieqi(self) -> bool:
+        return bool(self.flags & _FLAG_JIEQI)
+
+
+class CalendarDay:
+    """
+    由历表记录还原的某一天。
+
+    只实现排盘用到的 ``sxtwl.Day`` 方法，可在引擎中与 sxtwl.Day 互换使用。
+    """
+
+    __slots__ = ("_date", "_record")
+
+    def __init__(self, solar_date: date, record: CalendarRecord) -> None:
+        self._date = solar_date
+        self._record = record
+
+    def getSolarYear(self) -> int:
+        return self._date.year
+
+    def getSolarMonth(self) -> int:
+        return self._date.month
+
+    def getSolarDay(self) -> int:
+        return self._date.day
+
+    def getYearGZ(self) -> CalendarGZ:
+        gz = self._record.year_gz
+        return CalendarGZ(gz % 10, gz % 12)
+
+    def getMonthGZ(self) -> CalendarGZ:
+        gz = self._record.month_gz
+        return CalendarGZ(gz % 10, gz % 12)
+
+    def getDayGZ(self) -> CalendarGZ:
+        gz = self._record.day_gz
+        return CalendarGZ(gz % 10, gz % 12)
+
+    def getLunarYear(self) -> int:
+        return self._record.lunar_year
+
+    def getLunarMonth(self) -> int:
+        return self._record.lunar_month
+
+    def getLunarDay(self) -> int:
+        return self._record.lunar_day
+
+    def isLunarLeap(self) -> bool:
+        return self._record.is_leap_month
+
+    def hasJieQi(self) -> bool:
+        return self._record.has_jieqi
+
+    def getJieQi(self) -> int:
+        return self._record.jieqi_index
+
+    def getJieQiJD(self) -> float:
+        return self._record.jieqi_jd
+
+
+SolarDay = Union["sxtwl.Day", CalendarDay]
+
+
+def build_calendar_table(
+    path: Union[str, Path] = CALENDAR_TABLE_PATH,
+    start_year: int = CALENDAR_TABLE_START_YEAR,
+    end_year: int = CALENDAR_TABLE_END_YEAR,
+) -> Path:
+    """用 sxtwl 逐日生成历表文件（先写临时文件再原子替换），返回写入路径。"""
+    path = Path(path)
+    first_ordinal = date(start_year, 1, 1).toordinal()
+    last_ordinal = date(end_year, 12, 31).toordinal()
+    count = last_ordinal - first_ordinal + 1
+
+    buffer = bytearray(_HEADER.size + count * _RECORD.size)
+    _HEADER.pack_into(buffer, 0, _MAGIC, _VERSION, _RECORD.size, first_ordinal, count)
+    offset = _HEADER.size
+    for ordinal in range(first_ordinal, last_ordinal + 1):
+        current = date.fromordinal(ordinal)
+        day = sxtwl.fromSolar(current.year, current.month, current.day)
+        year_gz = day.getYearGZ()
+        month_gz = day.getMonthGZ()
+        day_gz = day.getDayGZ()
+        flags = _FLAG_LEAP if day.isLunarLeap() else 0
+        jieqi_index, jieqi_jd = 0, 0.0
+        if day.hasJieQi():
+            flags |= _FLAG_JIEQI
+            jieqi_index, jieqi_jd = day.getJieQi(), day.getJieQiJD()
+        _RECORD.pack_into(
+            buffer,
+            offset,
+            gz_index(year_gz.tg, year_gz.dz),
+            gz_index(month_gz.tg, month_gz.dz),
+            gz_index(day_gz.tg, day_gz.dz),
+            day.getLunarYear(),
+            day.getLunarMonth(),
+            day.getLunarDay(),
+            flags,
+            jieqi_index,
+            jieqi_jd,
+        )
+        offset += _RECORD.size
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_bytes(buffer)
+    os.replace(tmp_path, path)
+    return path
+
+
+class CalendarTable:
+    """只读映射的逐日历表：按公历日期 ordinal O(1) 取记录。"""
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = Path(path)
+        with open(self.path, "rb") as handle:
+            self._mmap = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mmap) < _HEADER.size:
+            self._mmap.close()
+            raise ValueError(f"历表文件过短: {self.path}")
+        magic, version, record_size, first_ordinal, count = _HEADER.unpack_from(self._mmap, 0)
+        if (
+            magic != _MAGIC
+            or version != _VERSION
+            or record_size != _RECORD.size
+            or len(self._mmap) != _HEADER.size + count * record_size
+        ):
+            self._mmap.close()
+            raise ValueError(f"历表文件格式不匹配: {self.path}")
+        self.first_ordinal = first_ordinal
+        self.last_ordinal = first_ordinal + count - 1
+        self.start_year = date.fromordinal(self.first_ordinal).year
+        self.end_year = date.fromordinal(self.last_ordinal).year
+        # (农历月初一倒排表, (首个完整农历年, 末个完整农历年))，首次反查农历时构建
+        self._lunar_index: Optional[Tuple[Dict[Tuple[int, int, bool], int], Tuple[int, int]]] = None
+        self._lunar_lock = threading.Lock()
+
+    def covers(self, ordinal: int) -> bool:
+        return self.first_ordinal <= ordinal <= self.last_ordinal
+
+    def lookup(self, ordinal: int) -> Optional[Tuple[int, int, int]]:
+        """返回 (年柱, 月柱, 日柱) 六十甲子序号；超出范围时返回 None（与 DayTable 一致）"""
+        if not self.first_ordinal <= ordinal <= self.last_ordinal:
+            return None
+        return _GZ_PREFIX.unpack_from(
+            self._mmap, _HEADER.size + (ordinal - self.first_ordinal) * _RECORD.size
+        )
+
+    def record(self, ordinal: int) -> Optional[CalendarRecord]:
+        """返回该日的记录；超出范围时返回 None"""
+        if not self.first_ordinal <= ordinal <= self.last_ordinal:
+            return None
+        return CalendarRecord._make(
+            _RECORD.unpack_from(self._mmap, _HEADER.size + (ordinal - self.first_ordinal) * _RECORD.size)
+        )
+
+    def day(self, solar_date: date) -> Optional[CalendarDay]:
+        """返回该日的 CalendarDay；超出范围时返回 None"""
+        record = self.record(solar_date.toordinal())
+        return CalendarDay(solar_date, record) if record is not None else None
+
+    def jieqi_entries(self, start_year: int, end_year: int) -> Dict[int, Tuple[int, float]]:
+        """[start_year, end_year] 与历表重叠部分的节气：节气所在日 ordinal -> (节气序号, 儒略日)"""
+        first = max(self.first_ordinal, date(max(start_year, 1), 1, 1).toordinal())
+        last = min(self.last_ordinal, date(min(end_year, 9999), 12, 31).toordinal())
+        entries = {}
+        for ordinal in range(first, last + 1):
+            record = _RECORD.unpack_from(
+                self._mmap, _HEADER.size + (ordinal - self.first_ordinal) * _RECORD.size
+            )
+            if record[6] & _FLAG_JIEQI:
+                entries[ordinal] = (record[7], record[8])
+        return entries
+
+    def lunar_ordinal(self, year: int, month: int, day: int, is_leap_month: bool) -> Optional[int]:
+        """
+        农历日期对应的公历 ordinal；农历年不完整落在历表内时返回 None（由调用方退回 sxtwl）。
+
+        Raises:
+            ValueError: 农历年在历表内，但该月（含闰月）不存在或没有这一天
+        """
+        if self._lunar_index is None:
+            with self._lunar_lock:
+                if self._lunar_index is None:
+                    self._lunar_index = self._build_lunar_index()
+        month_starts, (first_year, last_year) = self._lunar_index
+        if not first_year <= year <= last_year:
+            return None
+        start = month_starts.get((year, month, bool(is_leap_month)))
+        if start is None:
+            raise ValueError(f"农历{year}年没有{'闰' if is_leap_month else ''}{month}月")
+        ordinal = start + day - 1
+        # 超过当月天数时会落到下个月
+        if not 1 <= day <= 30 or _RECORD.unpack_from(
+            self._mmap, _HEADER.size + (ordinal - self.first_ordinal) * _RECORD.size
+        )[5] != day:
+            raise ValueError(f"农历{year}年{'闰' if is_leap_month else ''}{month}月没有{day}日")
+        return ordinal
+
+    def _build_lunar_index(self) -> Tuple[Dict[Tuple[int, int, bool], int], Tuple[int, int]]:
+        """扫描一遍记录，以每个农历月初一的 ordinal 建立倒排表"""
+        starts = {}
+        for offset, record in enumerate(_RECORD.iter_unpack(self._mmap[_HEADER.size :])):
+            if record[5] == 1:
+                starts[(record[3], record[4], bool(record[6] & _FLAG_LEAP))] = self.first_ordinal + offset
+        # 首尾两个农历年只有部分日子在历表内
+        years = (
+            _RECORD.unpack_from(self._mmap, _HEADER.size)[3] + 1,
+            _RECORD.unpack_from(self._mmap, len(self._mmap) - _RECORD.size)[3] - 1,
+        )
+        return starts, years
+
+
+_table: Optional[CalendarTable] = None
+_table_loaded = False
+_table_lock = threading.Lock()
+
+
+def get_calendar_table() -> Optional[CalendarTable]:
+    """懒加载全局历表；文件不存在或格式不符时返回 None（调用方退回 sxtwl）。"""
+    global _table, _table_loaded
+    if not _table_loaded:
+        with _table_lock:
+            if not _table_loaded:
+                try:
+                    _table = CalendarTable(CALENDAR_TABLE_PATH)
+                except (OSError, ValueError) as e:
+                    if CALENDAR_TABLE_PATH.exists():
+                        print(f"Warning: Failed to load calendar table: {e}")
+                    _table = None
+                _table_loaded = True
+    return _table
+
+
+def solar_day(year: int, month: int, day: int) -> SolarDay:
+    """公历日期对应的 Day：历表范围内直接读记录，否则调用 sxtwl.fromSolar"""
+    table = get_calendar_table()
+    if table is not None:
+        found = table.day(date(year, month, day))
+        if found is not None:
+            return found
+    return sxtwl.fromSolar(year, month, day)
+
+
+def lunar_day(year: int, month: int, day: int, is_leap_month: bool) -> SolarDay:
+    """
+    农历日期对应的 Day：历表范围内按农历月初一倒排表定位，否则调用 sxtwl.fromLunar。
+
+    Raises:
+        ValueError: 农历年在历表内但日期不存在（sxtwl 对这类输入不报错）
+    """
+    table = get_calendar_table()
+    if table is not None:
+        ordinal = table.lunar_ordinal(year, month, day, is_leap_month)
+        if ordinal is not None:
+            return table.day(date.fromordinal(ordinal))
+    return sxtwl.fromLunar(year, month, day, is_leap_month)
+
+
+if __name__ == "__main__":
+    output = Path(sys.argv[1]) if len(sys.argv) > 1 else CALENDAR_TABLE_PATH
+    written = build_calendar_table(output)
+    print(f"calendar table written to {written} ({written.stat().st_size} bytes)")
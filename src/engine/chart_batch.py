@@ -0,0 +1,122 @@
+"""
+批量排盘的列式结果
+
+``BaziPaipanEngine.calculate_charts_batch`` 一次处理成千上万条出生记录，只计算
+导入与统计最常用的整数字段（四柱、五行个数、起运与大运），按列存放在紧凑的
+``array`` 中；需要完整 ``Chart`` 时再按下标懒加载。
+"""
+
+from __future__ import annotations
+
+from array import array
+from datetime import date, datetime
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from src.models.chart import Chart
+
+if TYPE_CHECKING:
+    from src.engine.bazi_engine import BaziPaipanEngine
+
+# 列名 -> array 类型码
+CHART_BATCH_COLUMNS: Dict[str, str] = {
+    "year_gz": "B",
+    "month_gz": "B",
+    "day_gz": "B",
+    "hour_gz": "B",
+    "wood": "H",
+    "fire": "H",
+    "earth": "H",
+    "metal": "H",
+    "water": "H",
+    "is_forward": "B",
+    "start_age_year": "H",
+    "start_age_month": "H",
+    "start_age_day": "H",
+    "qiyun_ordinal": "i",
+    "destiny_first_gz": "B",
+    "destiny_first_year": "h",
+}
+
+DESTINY_STEPS = 12
+
+
+class ChartBatch:
+    """
+    批量排盘结果（列式）
+
+    每一列是一个 ``array``，第 i 个元素对应第 i 条输入记录。干支均为六十甲子序号
+    （0=甲子 ... 59=癸亥）；第 k 步大运的干支为 destiny_first_gz ± k（顺行加、逆行减），
+    起始年份为 destiny_first_year + 10k。
+    """
+
+    def __init__(
+        self,
+        engine: "BaziPaipanEngine",
+        *,
+        solar_datetimes: Sequence[datetime],
+        genders: Sequence[str],
+        tz_offsets: Sequence[int],
+        longitudes: Sequence[Optional[float]],
+        latitudes: Sequence[Optional[float]],
+        names: Sequence[Optional[str]],
+        birth_places: Sequence[str],
+        as_of: Optional[datetime],
+    ):
+        self._engine = engine
+        self.solar_datetimes = solar_datetimes
+        self.genders = genders
+        self.tz_offsets = tz_offsets
+        self.longitudes = longitudes
+        self.latitudes = latitudes
+        self.names = names
+        self.birth_places = birth_places
+        self.as_of = as_of
+        self.columns: Dict[str, array] = {
+            name: array(typecode) for name, typecode in CHART_BATCH_COLUMNS.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.solar_datetimes)
+
+    def __getitem__(self, name: str) -> array:
+        return self.columns[name]
+
+    def pillars(self, index: int) -> Tuple[str, str, str, str]:
+        """第 index 条记录的四柱名称（年、月、日、时）"""
+        gz_name = self._engine.kernel.gz_name
+        return tuple(  # type: ignore[return-value]
+            gz_name[self.columns[column][index]]
+            for column in ("year_gz", "month_gz", "day_gz", "hour_gz")
+        )
+
+    def destiny_sequence(self, index: int) -> List[Tuple[int, int]]:
+        """第 index 条记录的大运序列：[(六十甲子序号, 起始年份), ...]"""
+        step = 1 if self.columns["is_forward"][index] else -1
+        first_gz = self.columns["destiny_first_gz"][index]
+        first_year = self.columns["destiny_first_year"][index]
+        return [
+            ((first_gz + step * k) % 60, first_year + 10 * k) for k in range(DESTINY_STEPS)
+        ]
+
+    def row(self, index: int) -> Dict[str, Any]:
+        """第 index 条记录的全部列值"""
+        record: Dict[str, Any] = {name: column[index] for name, column in self.columns.items()}
+        record["qiyun_date"] = date.fromordinal(record["qiyun_ordinal"])
+        return record
+
+    def chart(self, index: int) -> Chart:
+        """按需生成第 index 条记录的完整命盘（与单条调用 calculate_chart 一致）"""
+        return self._engine.calculate_chart(
+            name=self.names[index],
+            gender=self.genders[index],
+            solar_datetime=self.solar_datetimes[index],
+            tz_offset_hours=self.tz_offsets[index],
+            longitude=self.longitudes[index],
+            latitude=self.latitudes[index],
+            birth_place=self.birth_places[index],
+            as_of=self.as_of,
+        )
+
+    def charts(self) -> Iterator[Chart]:
+        for index in range(len(self)):
+            yield self.chart(index)
@@ -0,0 +1,263 @@
+"""
+命盘紧凑编码
+
+``Chart.model_dump()`` 中每根柱都带着天干/地支/藏干的五行、阴阳、十神等字符串，
+12 步大运又各重复一遍，而这些内容都能由干支序号和日干查表得到。紧凑编码只保存
+无法推导的部分，整体是一个按位置排列的 JSON 数组，首元素为版本标记：
+
+    0  版本 "bz1"
+    1  姓名             2  性别
+    3  阳历时间 (ISO)    4  真太阳时 (ISO / null)
+    5  出生地点
+    6  农历 [年, 月, 日, 闰月 0/1]
+    7  四柱 [年, 月, 日, 时] 六十甲子序号（0=甲子 ... 59=癸亥）
+    8  大运 [顺排 0/1, 首步起运年, 当前大运下标（-1 表示无）, [各步序号],
+             [起运岁 年, 月, 日], [起运阳历 年, 月, 日], [起运农历 年, 月, 日, 闰月]]
+    9  由四柱推导的可选字段位掩码（顺序见 BaziPaipanEngine.PILLAR_DERIVED_FIELDS）
+    10 出生节气 [前节气, 距前节气, 后节气, 距后节气] / null
+    11 星座             12 星宿
+    13 当前流年柱序号 / null
+    14 干支关系 [所用大运序号, 所用流年序号]（-1 表示未参与）；
+       无法由四柱复算时为完整字典，未计算时为 null
+
+解码时用引擎的柱信息享元、五行计数与干支关系缓存重建 ``Chart``，结果与编码前的
+命盘相等。编码格式变化时需同时更新版本标记，旧版本数据会被拒绝。
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+from src.engine.bazi_engine import BaziPaipanEngine
+from src.engine.ganzhi_kernel import gz_index
+from src.models.chart import (
+    Chart,
+    DestinyCycleInfo,
+    DestinyPillarInfo,
+    GanZhiRelations,
+    JieQiInfo,
+    LunarDate,
+    PillarInfo,
+    SolarDate,
+    StartAge,
+)
+
+COMPACT_CHART_VERSION = "bz1"
+
+
+def is_compact_chart(data: Any) -> bool:
+    """判断命盘数据是否为紧凑编码（任意版本）"""
+    return isinstance(data, list) and bool(data) and isinstance(data[0], str) and data[0].startswith("bz")
+
+
+def _pillar_gz(engine: BaziPaipanEngine, pillar: PillarInfo) -> int:
+    stem = engine.kernel.stem_index[pillar.heaven_stem.name]
+    branch = engine.kernel.branch_index[pillar.earth_branch.name]
+    if stem % 2 != branch % 2:
+        raise ValueError(f"{pillar.heaven_stem.name}{pillar.earth_branch.name} 不在六十甲子内，无法紧凑编码")
+    return gz_index(stem, branch)
+
+
+def _gz_pair(gz: int) -> Tuple[int, int]:
+    if not 0 <= gz < 60:
+        raise ValueError(f"干支序号超出范围: {gz}")
+    return gz % 10, gz % 12
+
+
+def _encode_relations(
+    engine: BaziPaipanEngine, chart: Chart, pillars: Sequence[PillarInfo]
+) -> Any:
+    relations = chart.ganzi_relations
+    if relations is None:
+        return None
+    if not (relations.stem_relations or relations.branch_relations or relations.stem_branch_relations):
+        return []
+    # 关系只取决于参与的各柱干支：找出与命盘一致的大运/流年组合，只记录其序号
+    year_fortune = chart.current_year_pillar
+    destiny_pillars = chart.destiny_cycle.destiny_pillars
+    candidates: List[Optional[PillarInfo]] = sorted(
+        destiny_pillars, key=lambda pillar: not pillar.is_current
+    )
+    candidates.append(None)
+    for destiny in candidates:
+        recomputed = engine.calculate_all_ganzi_relations(
+            *pillars, destiny_pillar=destiny, year_fortune_pillar=year_fortune
+        )
+        if recomputed == relations:
+            return [
+                -1 if destiny is None else _pillar_gz(engine, destiny),
+                -1 if year_fortune is None else _pillar_gz(engine, year_fortune),
+            ]
+    return relations.model_dump(mode="json")
+
+
+def encode_chart(engine: BaziPaipanEngine, chart: Chart) -> List[Any]:
+    """Chart -> 紧凑编码（可直接 json.dumps）"""
+    pillars = (chart.year_pillar, chart.month_pillar, chart.day_pillar, chart.hour_pillar)
+    destiny = chart.destiny_cycle
+    destiny_pillars = destiny.destiny_pillars
+    first_year = destiny_pillars[0].year if destiny_pillars else 0
+    current = -1
+    for index, pillar in enumerate(destiny_pillars):
+        if pillar.year != first_year + index * 10:
+            raise ValueError("大运年份不是逐步相差十年，无法紧凑编码")
+        if pillar.is_current and current < 0:
+            current = index
+
+    derived_mask = 0
+    for bit, field in enumerate(engine.PILLAR_DERIVED_FIELDS):
+        if getattr(chart, field):
+            derived_mask |= 1 << bit
+
+    lunar = chart.lunar_date
+    start_age = destiny.start_age
+    qiyun_solar = destiny.qiyun_date_solar
+    qiyun_lunar = destiny.qiyun_date_lunar
+    jieqi = chart.birth_jieqi
+    return [
+        COMPACT_CHART_VERSION,
+        chart.name,
+        chart.gender,
+        chart.solar_datetime.isoformat(),
+        chart.true_solar_datetime.isoformat() if chart.true_solar_datetime else None,
+        chart.birth_place,
+        [lunar.year, lunar.month, lunar.day, int(lunar.is_leap_month)],
+        [_pillar_gz(engine, pillar) for pillar in pillars],
+        [
+            int(destiny.is_forward),
+            first_year,
+            current,
+            [_pillar_gz(engine, pillar) for pillar in destiny_pillars],
+            [start_age.year, start_age.month, start_age.day],
+            [qiyun_solar.year, qiyun_solar.month, qiyun_solar.day],
+            [qiyun_lunar.year, qiyun_lunar.month, qiyun_lunar.day, int(qiyun_lunar.is_leap_month)],
+        ],
+        derived_mask,
+        [jieqi.prev_jieqi, jieqi.prev_distance, jieqi.next_jieqi, jieqi.next_distance] if jieqi else None,
+        chart.zodiac_sign,
+        chart.star_mansion,
+        _pillar_gz(engine, chart.current_year_pillar) if chart.current_year_pillar else None,
+        _encode_relations(engine, chart, pillars),
+    ]
+
+
+def _decode(engine: BaziPaipanEngine, data: Sequence[Any]) -> Chart:
+    (
+        _version,
+        name,
+        gender,
+        solar_datetime,
+        true_solar_datetime,
+        birth_place,
+        lunar,
+        pillar_gz,
+        destiny,
+        derived_mask,
+        jieqi,
+        zodiac_sign,
+        star_mansion,
+        current_year_gz,
+        relations_data,
+    ) = data
+
+    year_gz, month_gz, day_gz, hour_gz = (_gz_pair(gz) for gz in pillar_gz)
+    day_stem = engine.TIAN_GAN_NAMES[day_gz[0]]
+    pillars = [
+        engine._create_pillar_info(stem, branch, day_stem)
+        for stem, branch in (year_gz, month_gz, day_gz, hour_gz)
+    ]
+    year_pillar, month_pillar, day_pillar, hour_pillar = pillars
+
+    is_forward, first_year, current, destiny_gz, start_age, qiyun_solar, qiyun_lunar = destiny
+    destiny_pillars: List[DestinyPillarInfo] = []
+    for index, gz in enumerate(destiny_gz):
+        pillar = engine._create_pillar_info(*_gz_pair(gz), day_stem)
+        destiny_pillars.append(
+            DestinyPillarInfo(
+                heaven_stem=pillar.heaven_stem,
+                earth_branch=pillar.earth_branch,
+                year=first_year + index * 10,
+                is_current=index == current,
+            )
+        )
+    destiny_cycle = DestinyCycleInfo(
+        destiny_pillars=destiny_pillars,
+        start_age=StartAge(year=start_age[0], month=start_age[1], day=start_age[2]),
+        qiyun_date_solar=SolarDate(year=qiyun_solar[0], month=qiyun_solar[1], day=qiyun_solar[2]),
+        qiyun_date_lunar=LunarDate(
+            year=qiyun_lunar[0],
+            month=qiyun_lunar[1],
+            day=qiyun_lunar[2],
+            is_leap_month=bool(qiyun_lunar[3]),
+        ),
+        is_forward=bool(is_forward),
+    )
+
+    optional = engine.calculate_pillar_derived_fields(
+        year_gz,
+        month_gz,
+        day_gz,
+        hour_gz,
+        [field for bit, field in enumerate(engine.PILLAR_DERIVED_FIELDS) if derived_mask >> bit & 1],
+    )
+    if jieqi is not None:
+        optional["birth_jieqi"] = JieQiInfo(
+            prev_jieqi=jieqi[0], prev_distance=jieqi[1], next_jieqi=jieqi[2], next_distance=jieqi[3]
+        )
+    current_year: Optional[PillarInfo] = None
+    if current_year_gz is not None:
+        current_year = engine.build_year_fortune_pillar(*_gz_pair(current_year_gz), day_stem)
+        optional["current_year_pillar"] = current_year
+    if isinstance(relations_data, dict):
+        optional["ganzi_relations"] = GanZhiRelations.model_validate(relations_data)
+    elif relations_data == []:
+        optional["ganzi_relations"] = GanZhiRelations()
+    elif relations_data is not None:
+        destiny_index, year_index = relations_data
+        relation_destiny = (
+            None if destiny_index < 0 else engine._create_pillar_info(*_gz_pair(destiny_index), day_stem)
+        )
+        relation_year = (
+            None if year_index < 0 else engine.build_year_fortune_pillar(*_gz_pair(year_index), day_stem)
+        )
+        optional["ganzi_relations"] = engine.calculate_all_ganzi_relations(
+            *pillars, destiny_pillar=relation_destiny, year_fortune_pillar=relation_year
+        )
+
+    five_elements_count = engine.kernel.count_five_elements([year_gz, month_gz, day_gz, hour_gz])
+    day_master = day_pillar.heaven_stem
+    return Chart(
+        name=name,
+        gender=gender,
+        solar_datetime=datetime.fromisoformat(solar_datetime),
+        lunar_date=LunarDate(year=lunar[0], month=lunar[1], day=lunar[2], is_leap_month=bool(lunar[3])),
+        year_pillar=year_pillar,
+        month_pillar=month_pillar,
+        day_pillar=day_pillar,
+        hour_pillar=hour_pillar,
+        day_master=day_master,
+        five_elements_count=five_elements_count,
+        five_elements_ratio=engine._calculate_five_elements_ratio(five_elements_count),
+        destiny_cycle=destiny_cycle,
+        zodiac_animal=engine.ZODIAC_ANIMALS[year_gz[1]],
+        true_solar_datetime=datetime.fromisoformat(true_solar_datetime) if true_solar_datetime else None,
+        birth_place=birth_place,
+        zodiac_sign=zodiac_sign,
+        star_mansion=star_mansion,
+        day_master_display=f"{day_master.name}{day_master.yinyang}{day_master.element}",
+        fortune_element=engine.kernel.nayin[pillar_gz[0]][0],
+        **optional,
+    )
+
+
+def decode_chart(engine: BaziPaipanEngine, data: Sequence[Any]) -> Chart:
+    """紧凑编码 -> Chart；版本不符或结构错误时抛出 ValueError"""
+    if not is_compact_chart(data):
+        raise ValueError("不是紧凑编码的命盘数据")
+    if data[0] != COMPACT_CHART_VERSION:
+        raise ValueError(f"不支持的紧凑命盘版本: {data[0]}")
+    try:
+        return _decode(engine, data)
+    except (IndexError, KeyError, TypeError, ValueError) as exc:
+        raise ValueError(f"紧凑命盘数据无效: {exc}") from exc
@@ -0,0 +1,75 @@
+"""
+逐日干支表
+
+sxtwl 的 ``Day`` 对象首次取年柱/月柱时开销较大（每次约 0.1-1 ms），批量排盘时
+逐条记录创建 ``Day`` 会成为瓶颈。年柱、月柱在 sxtwl 中都是按"日"切换的，
+因此这里预先为 1801-2100 年的每一天记录年柱、月柱的六十甲子序号，日柱则按
+60 天循环直接推算，批量排盘和四柱反查都只需按日期下标取值。
+
+已生成逐日历表文件（见 ``calendar_table``）时直接使用其内存映射，不再在进程内构建。
+"""
+
+from __future__ import annotations
+
+import threading
+from array import array
+from datetime import date
+from typing import Optional, Tuple, Union
+
+import sxtwl
+
+from src.engine.calendar_table import CalendarTable, get_calendar_table
+from src.engine.ganzhi_kernel import JIAZI_DAY_ORDINAL, gz_index
+
+DAY_TABLE_START_YEAR = 1801
+DAY_TABLE_END_YEAR = 2100
+
+
+class DayTable:
+    """按公历日期 ordinal 下标存放年柱、月柱六十甲子序号。"""
+
+    def __init__(self, start_year: int = DAY_TABLE_START_YEAR, end_year: int = DAY_TABLE_END_YEAR):
+        self.start_year = start_year
+        self.end_year = end_year
+        self.first_ordinal = date(start_year, 1, 1).toordinal()
+        self.last_ordinal = date(end_year, 12, 31).toordinal()
+        self.year_gz = array("B")
+        self.month_gz = array("B")
+        self._build()
+
+    def _build(self) -> None:
+        for ordinal in range(self.first_ordinal, self.last_ordinal + 1):
+            current = date.fromordinal(ordinal)
+            day = sxtwl.fromSolar(current.year, current.month, current.day)
+            year_gz = day.getYearGZ()
+            month_gz = day.getMonthGZ()
+            self.year_gz.append(gz_index(year_gz.tg, year_gz.dz))
+            self.month_gz.append(gz_index(month_gz.tg, month_gz.dz))
+
+    def covers(self, ordinal: int) -> bool:
+        return self.first_ordinal <= ordinal <= self.last_ordinal
+
+    def lookup(self, ordinal: int) -> Optional[Tuple[int, int, int]]:
+        """返回 (年柱, 月柱, 日柱) 六十甲子序号；超出范围时返回 None"""
+        if not self.first_ordinal <= ordinal <= self.last_ordinal:
+            return None
+        offset = ordinal - self.first_ordinal
+        return self.year_gz[offset], self.month_gz[offset], (ordinal - JIAZI_DAY_ORDINAL) % 60
+
+
+_table: Optional[Union[DayTable, CalendarTable]] = None
+_table_lock = threading.Lock()
+
+
+def get_day_table() -> Union[DayTable, CalendarTable]:
+    """懒加载全局逐日干支表：优先使用历表文件，否则首次使用时构建（进程内共享）。"""
+    global _table
+    if _table is None:
+        calendar = get_calendar_table()
+        if calendar is not None:
+            _table = calendar
+            return _table
+        with _table_lock:
+            if _table is None:
+                _table = DayTable()
+    return _table
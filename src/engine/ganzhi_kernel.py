@@ -0,0 +1,114 @@
+"""
+干支整数内核
+
+排盘中的十神、纳音、十二长生等都只取决于少量整数：天干 0-9、地支 0-11、
+六十甲子 0-59。这里把引擎里的字符串常量一次性展开成按下标访问的查找表，
+排盘热路径只做列表索引，最后再在边界处组装 pydantic 模型。
+"""
+
+from __future__ import annotations
+
+from datetime import date
+from typing import Dict, List, Mapping, Sequence, Tuple
+
+from src.data.changsheng_table import STEM_CHANG_SHENG_TABLE
+from src.data.nayin_data import NA_YIN_TABLE, NA_YIN_TRAITS
+
+FIVE_ELEMENTS: Tuple[str, ...] = ("木", "火", "土", "金", "水")
+
+# 1949-10-01 为甲子日，日柱按 60 天循环推算
+JIAZI_DAY_ORDINAL = date(1949, 10, 1).toordinal()
+
+
+def gz_index(stem_index: int, branch_index: int) -> int:
+    """天干/地支序号转六十甲子序号（要求阴阳相配）。"""
+    return (6 * stem_index - 5 * branch_index) % 60
+
+
+class GanZhiKernel:
+    """由引擎的字符串常量推导出的整数查找表。"""
+
+    def __init__(
+        self,
+        *,
+        stem_names: Sequence[str],
+        branch_names: Sequence[str],
+        stem_elements: Mapping[str, str],
+        branch_elements: Mapping[str, str],
+        stem_yinyang: Mapping[str, str],
+        branch_yinyang: Mapping[str, str],
+        element_relations: Mapping[str, Mapping[str, str]],
+        ten_gods: Mapping[Tuple[str, str], str],
+        branch_hidden_stems: Mapping[str, Sequence[str]],
+    ):
+        self.stem_names: List[str] = list(stem_names)
+        self.branch_names: List[str] = list(branch_names)
+        self.stem_index: Dict[str, int] = {name: i for i, name in enumerate(self.stem_names)}
+        self.branch_index: Dict[str, int] = {name: i for i, name in enumerate(self.branch_names)}
+
+        self.stem_element: List[str] = [stem_elements[name] for name in self.stem_names]
+        self.stem_yinyang: List[str] = [stem_yinyang[name] for name in self.stem_names]
+        self.branch_element: List[str] = [branch_elements[name] for name in self.branch_names]
+        self.branch_yinyang: List[str] = [branch_yinyang[name] for name in self.branch_names]
+
+        # 五行序号（木火土金水），用于整数计数
+        element_order = {element: i for i, element in enumerate(FIVE_ELEMENTS)}
+        self.stem_element_index: List[int] = [element_order[e] for e in self.stem_element]
+        self.branch_element_index: List[int] = [element_order[e] for e in self.branch_element]
+
+        # 藏干：地支 -> 天干序号元组
+        self.hidden_stems: List[Tuple[int, ...]] = [
+            tuple(self.stem_index[stem] for stem in branch_hidden_stems[name])
+            for name in self.branch_names
+        ]
+
+        # 十神：ten_god[日干][天干]
+        self.ten_god: List[List[str]] = []
+        for day_stem in self.stem_names:
+            day_element = stem_elements[day_stem]
+            row = []
+            for stem in self.stem_names:
+                relation = element_relations[day_element][stem_elements[stem]]
+                same = "同" if stem_yinyang[stem] == stem_yinyang[day_stem] else "异"
+                row.append(ten_gods[(same, relation)])
+            self.ten_god.append(row)
+
+        # 十二长生：star_fortune[日干][地支]
+        self.star_fortune: List[List[str]] = [
+            [STEM_CHANG_SHENG_TABLE.get(stem, {}).get(branch, "") for branch in self.branch_names]
+            for stem in self.stem_names
+        ]
+
+        # 六十甲子：名称、天干、地支、纳音、纳音性情
+        self.gz_stem: List[int] = [i % 10 for i in range(60)]
+        self.gz_branch: List[int] = [i % 12 for i in range(60)]
+        self.gz_name: List[str] = [
+            f"{self.stem_names[i % 10]}{self.branch_names[i % 12]}" for i in range(60)
+        ]
+        self.gz_lookup: Dict[str, int] = {name: i for i, name in enumerate(self.gz_name)}
+        # 每个六十甲子的五行个数（天干 + 地支 + 藏干），批量排盘时直接相加
+        self.gz_element_counts: List[Tuple[int, ...]] = []
+        for gz in range(60):
+            counts = [0, 0, 0, 0, 0]
+            counts[self.stem_element_index[gz % 10]] += 1
+            counts[self.branch_element_index[gz % 12]] += 1
+            for hidden in self.hidden_stems[gz % 12]:
+                counts[self.stem_element_index[hidden]] += 1
+            self.gz_element_counts.append(tuple(counts))
+        self.nayin: List[Tuple[str, str]] = []
+        for name in self.gz_name:
+            na_yin = NA_YIN_TABLE.get(name, "")
+            self.nayin.append((na_yin, NA_YIN_TRAITS.get(na_yin, "") if na_yin else ""))
+
+    def count_five_elements(
+        self, pillars: Sequence[Tuple[int, int]], include_hidden: bool = True
+    ) -> Dict[str, int]:
+        """按 (天干, 地支) 序号统计五行个数，键顺序固定为木火土金水。"""
+        counts = [0, 0, 0, 0, 0]
+        for stem, branch in pillars:
+            counts[self.stem_element_index[stem]] += 1
+            counts[self.branch_element_index[branch]] += 1
+            if include_hidden:
+                for hidden in self.hidden_stems[branch]:
+                    counts[self.stem_element_index[hidden]] += 1
+        return dict(zip(FIVE_ELEMENTS, counts))
@@ -0,0 +1,127 @@
+"""
+节气索引表
+
+排盘时需要查找出生日前后最近的节（气），原实现逐日调用 sxtwl 的
+``Day.after(1)`` / ``Day.before(1)`` 直到遇到 ``hasJieQi()``，每张命盘最多要走
+几十次 sxtwl。这里一次性预计算 1800-2101 年的全部节气（按出生"日"对齐），
+查询时在有序数组上二分即可。
+
+注意：查找语义与原逐日遍历保持一致——以"日"为粒度，出生当天如有节气，
+无论前后方向都会命中当天的节气。
+"""
+
+from __future__ import annotations
+
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import sxtwl
+
+from src.engine.calendar_table import get_calendar_table
+
+# 覆盖范围比排盘支持的 1801-2100 各多一年，保证边界日期向前/向后都能找到节气
+JIEQI_TABLE_START_YEAR = 1800
+JIEQI_TABLE_END_YEAR = 2101
+
+JieQiTime = Tuple[int, int, int, int, int, int]
+
+
+class JieQiTable:
+    """按日期有序的节气索引：day_keys[i] 为节气所在日的 ordinal。"""
+
+    def __init__(self, start_year: int = JIEQI_TABLE_START_YEAR, end_year: int = JIEQI_TABLE_END_YEAR):
+        self.start_year = start_year
+        self.end_year = end_year
+        self.day_keys: List[int] = []
+        self.jieqi_indices: List[int] = []
+        self.jieqi_jds: List[float] = []
+        self.jieqi_times: List[JieQiTime] = []
+        self._build()
+
+    def _build(self) -> None:
+        entries: Dict[int, Tuple[int, float]] = {}
+        years: Iterable[int] = range(self.start_year, self.end_year + 1)
+        calendar = get_calendar_table()
+        if calendar is not None:
+            # 历表范围内直接读取逐日记录中的节气，范围外的年份再用 sxtwl 补齐
+            # getJieQiByYear 的结果会跨到相邻公历年，相邻年份一并计算才能得到完整节气
+            outside = [year for year in years if not calendar.start_year <= year <= calendar.end_year]
+            years = sorted(
+                {
+                    neighbour
+                    for year in outside
+                    for neighbour in (year - 1, year, year + 1)
+                    if self.start_year <= neighbour <= self.end_year
+                }
+            )
+            entries.update(self._sxtwl_entries(years))
+            entries.update(calendar.jieqi_entries(self.start_year, self.end_year))
+        else:
+            entries.update(self._sxtwl_entries(years))
+
+        for key in sorted(entries):
+            jq_index, jd = entries[key]
+            t = sxtwl.JD2DD(jd)
+            self.day_keys.append(key)
+            self.jieqi_indices.append(jq_index)
+            self.jieqi_jds.append(jd)
+            self.jieqi_times.append((t.Y, t.M, t.D, round(t.h), round(t.m), round(t.s)))
+
+    @staticmethod
+    def _sxtwl_entries(years: Iterable[int]) -> Dict[int, Tuple[int, float]]:
+        """用 sxtwl 计算指定年份的节气：节气所在日 ordinal -> (节气序号, 儒略日)"""
+        candidates = {}
+        for year in years:
+            for info in sxtwl.getJieQiByYear(year):
+                candidates[info.jd] = info.jqIndex
+
+        entries = {}
+        for jd, jq_index in sorted(candidates.items()):
+            t = sxtwl.JD2DD(jd)
+            base = date(t.Y, t.M, t.D)
+            # getJieQiByYear 的时刻与 Day.getJieQiJD 在零点附近可能差一天，
+            # 以 Day 对象为准，保证与逐日遍历的结果完全一致
+            for offset in (0, -1, 1):
+                candidate = base + timedelta(days=offset)
+                day = sxtwl.fromSolar(candidate.year, candidate.month, candidate.day)
+                if day.hasJieQi() and day.getJieQi() == jq_index:
+                    entries[candidate.toordinal()] = (jq_index, day.getJieQiJD())
+                    break
+        return entries
+
+    def covers(self, day_key: int) -> bool:
+        return bool(self.day_keys) and self.day_keys[0] <= day_key <= self.day_keys[-1]
+
+    def find_nearest(
+        self, year: int, month: int, day: int, is_forward: bool
+    ) -> Optional[Tuple[int, JieQiTime]]:
+        """
+        查找指定日期当天或之后（is_forward=True）/ 当天或之前的最近节气。
+
+        Returns:
+            (sxtwl 节气序号, (年, 月, 日, 时, 分, 秒))；超出索引范围时返回 None
+        """
+        day_key = date(year, month, day).toordinal()
+        if not self.covers(day_key):
+            return None
+        if is_forward:
+            pos = bisect_left(self.day_keys, day_key)
+        else:
+            pos = bisect_right(self.day_keys, day_key) - 1
+        return self.jieqi_indices[pos], self.jieqi_times[pos]
+
+
+_table: Optional[JieQiTable] = None
+_table_lock = threading.Lock()
+
+
+def get_jieqi_table() -> JieQiTable:
+    """懒加载全局节气索引（首次调用时构建，进程内共享）。"""
+    global _table
+    if _table is None:
+        with _table_lock:
+            if _table is None:
+                _table = JieQiTable()
+    return _table
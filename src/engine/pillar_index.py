@@ -0,0 +1,95 @@
+"""
+四柱反查倒排索引
+
+``find_dates_by_pillars`` 原先对查找范围内的每一天调用 sxtwl 计算年/月/日柱，
+每次请求约 11 万次 sxtwl 调用。这里预先按 (年柱, 月柱, 日柱) 建立倒排索引，
+反查时只需一次字典查找，再对命中的少数日期校验时柱。
+
+干支统一用六十甲子序号（0=甲子 ... 59=癸亥）表示。
+"""
+
+from __future__ import annotations
+
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+import sxtwl
+
+from src.engine.day_table import get_day_table
+from src.engine.ganzhi_kernel import gz_index
+
+PILLAR_INDEX_START_YEAR = 1801
+PILLAR_INDEX_END_YEAR = 2100
+
+
+class PillarIndex:
+    """(年柱, 月柱, 日柱) -> 按日期升序排列的公历日期 ordinal 列表。"""
+
+    def __init__(self, start_year: int = PILLAR_INDEX_START_YEAR, end_year: int = PILLAR_INDEX_END_YEAR):
+        self.start_year = start_year
+        self.end_year = end_year
+        self._dates: Dict[int, List[int]] = {}
+        self._build()
+
+    @staticmethod
+    def _key(year_gz: int, month_gz: int, day_gz: int) -> int:
+        return (year_gz * 60 + month_gz) * 60 + day_gz
+
+    def _build(self) -> None:
+        current = date(self.start_year, 1, 1)
+        last = date(self.end_year, 12, 31)
+        table = get_day_table()
+        if table.covers(current.toordinal()) and table.covers(last.toordinal()):
+            # 直接复用逐日干支表，避免再逐日调用一遍 sxtwl
+            for ordinal in range(current.toordinal(), last.toordinal() + 1):
+                key = self._key(*table.lookup(ordinal))
+                self._dates.setdefault(key, []).append(ordinal)
+            return
+        one_day = timedelta(days=1)
+        while current <= last:
+            day = sxtwl.fromSolar(current.year, current.month, current.day)
+            year_gz = day.getYearGZ()
+            month_gz = day.getMonthGZ()
+            day_gz = day.getDayGZ()
+            key = self._key(
+                gz_index(year_gz.tg, year_gz.dz),
+                gz_index(month_gz.tg, month_gz.dz),
+                gz_index(day_gz.tg, day_gz.dz),
+            )
+            self._dates.setdefault(key, []).append(current.toordinal())
+            current += one_day
+
+    def lookup(
+        self,
+        year_gz: int,
+        month_gz: int,
+        day_gz: int,
+        start_year: Optional[int] = None,
+        end_year: Optional[int] = None,
+    ) -> List[date]:
+        """返回年/月/日柱均匹配、且公历年份落在 [start_year, end_year] 内的日期。"""
+        ordinals = self._dates.get(self._key(year_gz, month_gz, day_gz))
+        if not ordinals:
+            return []
+        lo = date(max(start_year or self.start_year, self.start_year), 1, 1).toordinal()
+        hi = date(min(end_year or self.end_year, self.end_year), 12, 31).toordinal()
+        return [
+            date.fromordinal(ordinal)
+            for ordinal in ordinals[bisect_left(ordinals, lo) : bisect_right(ordinals, hi)]
+        ]
+
+
+_index: Optional[PillarIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_pillar_index() -> PillarIndex:
+    """懒加载全局四柱索引（首次反查时构建，进程内共享）。"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = PillarIndex()
+    return _index
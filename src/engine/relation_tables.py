@@ -0,0 +1,164 @@
+"""
+干支关系查找表
+
+``calculate_all_ganzi_relations`` 原先对每一对柱都遍历一遍五合、相冲、六合……
+等关系列表并正反比较元组。这里把这些关系预先展开成 10x10 天干对、12x12 地支对
+的位掩码表，三合/三会/相刑则借助 12 位地支出现掩码快速跳过不可能成立的组合，
+每一对柱只需一次查表。
+
+表内一律使用整数序号：天干 0-9、地支 0-11。
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Mapping, Optional, Sequence, Tuple
+
+from src.models.chart import GanZhiRelations
+
+# 天干对关系位
+STEM_COMBINE = 1  # 五合（无方向）
+STEM_CLASH = 2  # 相冲（无方向）
+STEM_KE = 4  # 相克（有方向：前者克后者）
+
+# 地支对关系位
+BRANCH_SIX_COMBINE = 1  # 六合
+BRANCH_SIX_CLASH = 2  # 六冲
+BRANCH_HARM = 4  # 相害
+
+
+def branch_mask(branches: Sequence[int]) -> int:
+    """地支出现掩码：第 i 位表示地支 i 出现过。"""
+    mask = 0
+    for branch in branches:
+        mask |= 1 << branch
+    return mask
+
+
+class RelationTables:
+    """由引擎的干支关系常量推导出的查找表。"""
+
+    def __init__(
+        self,
+        *,
+        stem_names: Sequence[str],
+        branch_names: Sequence[str],
+        stem_combinations: Mapping[Tuple[str, str], str],
+        stem_clashes: Sequence[Tuple[str, str]],
+        stem_ke_pairs: Sequence[Tuple[str, str]],
+        branch_six_combinations: Mapping[Tuple[str, str], str],
+        branch_three_combinations: Mapping[Tuple[str, str, str], str],
+        branch_three_meetings: Mapping[Tuple[str, str, str], str],
+        branch_six_clashes: Sequence[Tuple[str, str]],
+        branch_punishments: Mapping[str, Sequence[Tuple[str, str]]],
+        branch_harms: Sequence[Tuple[str, str]],
+    ):
+        stem_index = {name: i for i, name in enumerate(stem_names)}
+        branch_index = {name: i for i, name in enumerate(branch_names)}
+
+        # stem_pair[a][b]：天干 a 与 b 的关系位；合化五行单独存放
+        self.stem_pair: List[List[int]] = [[0] * 10 for _ in range(10)]
+        self.stem_combine_element: List[List[Optional[str]]] = [[None] * 10 for _ in range(10)]
+        for (first, second), element in stem_combinations.items():
+            a, b = stem_index[first], stem_index[second]
+            for x, y in ((a, b), (b, a)):
+                self.stem_pair[x][y] |= STEM_COMBINE
+                self.stem_combine_element[x][y] = element
+        for first, second in stem_clashes:
+            a, b = stem_index[first], stem_index[second]
+            self.stem_pair[a][b] |= STEM_CLASH
+            self.stem_pair[b][a] |= STEM_CLASH
+        for first, second in stem_ke_pairs:
+            self.stem_pair[stem_index[first]][stem_index[second]] |= STEM_KE
+
+        # branch_pair[a][b]：地支 a 与 b 的关系位；六合五行单独存放
+        self.branch_pair: List[List[int]] = [[0] * 12 for _ in range(12)]
+        self.branch_combine_element: List[List[Optional[str]]] = [[None] * 12 for _ in range(12)]
+        for (first, second), element in branch_six_combinations.items():
+            a, b = branch_index[first], branch_index[second]
+            for x, y in ((a, b), (b, a)):
+                self.branch_pair[x][y] |= BRANCH_SIX_COMBINE
+                self.branch_combine_element[x][y] = element
+        for pairs, bit in ((branch_six_clashes, BRANCH_SIX_CLASH), (branch_harms, BRANCH_HARM)):
+            for first, second in pairs:
+                a, b = branch_index[first], branch_index[second]
+                self.branch_pair[a][b] |= bit
+                self.branch_pair[b][a] |= bit
+
+        # 三合、三会：(地支序号元组, 掩码, 五行)，保持常量中的顺序
+        self.three_combinations: List[Tuple[Tuple[int, ...], int, str]] = []
+        for combo, element in branch_three_combinations.items():
+            indices = tuple(branch_index[name] for name in combo)
+            self.three_combinations.append((indices, branch_mask(indices), element))
+        self.three_meetings: List[Tuple[Tuple[int, ...], int, str]] = []
+        for combo, element in branch_three_meetings.items():
+            indices = tuple(branch_index[name] for name in combo)
+            self.three_meetings.append((indices, branch_mask(indices), element))
+
+        # 相刑：(刑名, 地支a, 地支b, 掩码)，保持常量中的顺序
+        self.punishments: List[Tuple[str, int, int, int]] = []
+        for punishment_type, pairs in branch_punishments.items():
+            for first, second in pairs:
+                a, b = branch_index[first], branch_index[second]
+                self.punishments.append((punishment_type, a, b, branch_mask((a, b))))
+
+    def positions_by_branch(self, branches: Sequence[int]) -> Dict[int, List[int]]:
+        """地支 -> 出现该地支的柱下标列表（按柱顺序）。"""
+        positions: Dict[int, List[int]] = {}
+        for i, branch in enumerate(branches):
+            positions.setdefault(branch, []).append(i)
+        return positions
+
+
+class RelationCache:
+    """
+    干支关系结果的有界 LRU 缓存。
+
+    缓存值为不可变的 ``GanZhiRelations``，命中时直接返回同一个对象，
+    调用方不应修改其中的列表。
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, GanZhiRelations]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[GanZhiRelations]:
+        with self._lock:
+            relations = self._entries.get(key)
+            if relations is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return relations
+
+    def put(self, key: Hashable, relations: GanZhiRelations) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = relations
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, float]:
+        """命中/未命中计数，用于评估缓存容量是否合适。"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
@@ -1,6 +1,13 @@
 from __future__ import annotations
 
-from src.llm.client import chat, chat_with_usage, stream_chat, stream_chat_with_reasoning
+from src.llm.client import (
+    achat_with_usage,
+    astream_chat_with_reasoning,
+    chat,
+    chat_with_usage,
+    stream_chat,
+    stream_chat_with_reasoning,
+)
 from src.llm.types import ChatChunk, LLMError, OllamaError, OpenAICompatibleError
 
 __all__ = [
@@ -8,6 +15,8 @@ __all__ = [
     "LLMError",
     "OllamaError",
     "OpenAICompatibleError",
+    "achat_with_usage",
+    "astream_chat_with_reasoning",
     "chat",
     "chat_with_usage",
     "stream_chat",
@@ -0,0 +1,530 @@
+"""
+大模型接口的 asyncio HTTP 长连接池
+
+``http_pool`` 的非阻塞版本，供 ``async def`` 接口使用：基于 ``asyncio.open_connection``
+收发 HTTP/1.1，等待模型输出时不占用线程，一个 worker 可以同时挂住数百个流式响应。
+
+连接管理与同步版一致：每个主机的连接数有上限、空闲连接超时关闭、响应读完才归还复用、
+空闲期间被服务端断开的连接换新连接重试一次。响应体支持 Content-Length、chunked
+以及读到连接关闭三种形式。
+
+错误类型也与同步版一致：4xx/5xx 抛出 ``HTTPStatusError``，连接错误与超时抛出
+OSError（超时为 TimeoutError），协议错误抛出 ``http.client.HTTPException``。
+连接绑定在创建它的事件循环上，循环更换（如测试中多次 asyncio.run）时旧连接作废。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import http.client
+import ssl
+import sys
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Deque, Dict, List, Mapping, Optional, Tuple, TypeVar
+from urllib.parse import urlsplit
+
+from src.llm.http_pool import HTTPStatusError, PoolKey, PoolTimeoutError
+
+_T = TypeVar("_T")
+_READ_SIZE = 65536
+
+
+if sys.version_info >= (3, 11):
+
+    async def _with_timeout(awaitable: Awaitable[_T], timeout: float) -> _T:
+        # asyncio.timeout 只登记一个定时回调；wait_for 在 3.11 中每次都新建 Task，
+        # 流式响应每个事件要读好几次，开销会成为每事件的主要成本
+        try:
+            async with asyncio.timeout(timeout):
+                return await awaitable
+        except TimeoutError:
+            raise TimeoutError("timed out") from None
+
+else:
+
+    async def _with_timeout(awaitable: Awaitable[_T], timeout: float) -> _T:
+        try:
+            return await asyncio.wait_for(awaitable, timeout)
+        except asyncio.TimeoutError:
+            # Python 3.11 之前 asyncio.TimeoutError 不是 OSError，统一成内置 TimeoutError
+            raise TimeoutError("timed out") from None
+
+
+class _AsyncConnection:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+class AsyncPooledResponse:
+    """连接池中的响应；关闭时按是否读完决定连接归还还是丢弃"""
+
+    def __init__(
+        self,
+        pool: "AsyncHTTPConnectionPool",
+        key: PoolKey,
+        conn: _AsyncConnection,
+        status: int,
+        reason: str,
+        headers: Dict[str, str],
+        version: str,
+        method: str,
+        timeout: float,
+    ):
+        self._pool = pool
+        self._key = key
+        self._conn = conn
+        self._timeout = timeout
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        connection = headers.get("connection", "").lower()
+        self.will_close = "close" in connection or (version == "HTTP/1.0" and "keep-alive" not in connection)
+        self._chunked = "chunked" in headers.get("transfer-encoding", "").lower()
+        self._remaining: Optional[int] = None
+        # chunked 响应：整块读入缓冲区后在内存中拆分块头与数据，_pos 为已消费的位置
+        self._buffer = b""
+        self._pos = 0
+        self._chunk_left = 0
+        self._need_crlf = False
+        self._complete = False
+        self._broken = False
+        self._released = False
+        if method == "HEAD" or status in (204, 304) or 100 <= status < 200:
+            self._complete = True
+        elif not self._chunked:
+            length = headers.get("content-length")
+            if length is not None:
+                try:
+                    self._remaining = int(length)
+                except ValueError:
+                    raise http.client.HTTPException(f"Content-Length 无效: {length}") from None
+                self._complete = self._remaining == 0
+            else:
+                # 既无长度也非 chunked：读到连接关闭为止，连接不可复用
+                self.will_close = True
+
+    async def _fill(self) -> None:
+        data = await _with_timeout(self._conn.reader.read(_READ_SIZE), self._timeout)
+        if not data:
+            raise http.client.IncompleteRead(b"")
+        self._buffer = self._buffer[self._pos :] + data
+        self._pos = 0
+
+    async def _read_chunked(self) -> bytes:
+        """
+        解析 chunked 响应体，返回缓冲区中已到达的全部数据。
+
+        SSE 每个事件通常单独成块，块头、数据、结尾 CRLF 分别等待 socket 的话每个事件要
+        等待三次；这里只在缓冲区耗尽时读一次 socket，已到达的多个块一并拆出。
+        """
+        pieces: List[bytes] = []
+        while True:
+            buffer, pos = self._buffer, self._pos
+            if self._need_crlf:
+                if len(buffer) - pos < 2:
+                    if pieces:
+                        break
+                    await self._fill()
+                    continue
+                self._pos = pos + 2
+                self._need_crlf = False
+                continue
+            if self._chunk_left == 0:
+                end = buffer.find(b"\n", pos)
+                if end < 0:
+                    if pieces:
+                        break
+                    await self._fill()
+                    continue
+                size_line = buffer[pos:end]
+                self._pos = end + 1
+                try:
+                    size = int(size_line.split(b";", 1)[0].strip(), 16)
+                except ValueError:
+                    raise http.client.HTTPException(f"分块长度无效: {size_line!r}") from None
+                if size == 0:
+                    await self._skip_trailer()
+                    break
+                self._chunk_left = size
+                continue
+            take = min(self._chunk_left, len(buffer) - pos)
+            if take == 0:
+                if pieces:
+                    break
+                await self._fill()
+                continue
+            pieces.append(buffer[pos : pos + take])
+            self._pos = pos + take
+            self._chunk_left -= take
+            self._need_crlf = self._chunk_left == 0
+        return b"".join(pieces)
+
+    async def _skip_trailer(self) -> None:
+        # 跳过 trailer，直到空行
+        while True:
+            end = self._buffer.find(b"\n", self._pos)
+            if end < 0:
+                await self._fill()
+                continue
+            line = self._buffer[self._pos : end]
+            self._pos = end + 1
+            if line in (b"\r", b""):
+                break
+        self._complete = True
+        if self._pos < len(self._buffer):
+            # 响应之后还有多余数据，连接状态不可信
+            self.will_close = True
+        self._buffer = b""
+        self._pos = 0
+
+    async def _read_piece(self) -> bytes:
+        """读取下一段响应体；读完后返回 b\"\""""
+        if self._complete:
+            return b""
+        reader = self._conn.reader
+        try:
+            if self._chunked:
+                return await self._read_chunked()
+            if self._remaining is not None:
+                piece = await _with_timeout(reader.read(min(self._remaining, _READ_SIZE)), self._timeout)
+                if not piece:
+                    raise http.client.IncompleteRead(b"", self._remaining)
+                self._remaining -= len(piece)
+                self._complete = self._remaining == 0
+                return piece
+            piece = await _with_timeout(reader.read(_READ_SIZE), self._timeout)
+            if not piece:
+                self._complete = True
+            return piece
+        except BaseException:
+            self._broken = True
+            raise
+
+    async def read(self) -> bytes:
+        pieces: List[bytes] = []
+        while True:
+            piece = await self._read_piece()
+            if not piece:
+                return b"".join(pieces)
+            pieces.append(piece)
+
+    async def iter_chunks(self) -> AsyncIterator[bytes]:
+        """逐块产出响应体：每次返回已到达的数据，不按行切分"""
+        while True:
+            piece = await self._read_piece()
+            if not piece:
+                return
+            yield piece
+
+    async def iter_lines(self) -> AsyncIterator[bytes]:
+        """逐行产出响应体（保留行尾换行符，末尾不完整的一行也会产出）"""
+        buffer = b""
+        while True:
+            piece = await self._read_piece()
+            if not piece:
+                break
+            buffer += piece
+            start = 0
+            while True:
+                end = buffer.find(b"\n", start)
+                if end < 0:
+                    break
+                yield buffer[start : end + 1]
+                start = end + 1
+            buffer = buffer[start:]
+        if buffer:
+            yield buffer
+
+    async def drain(self, limit: int = 65536) -> None:
+        """读完剩余响应体以便连接复用；剩余超过 limit 字节或读取出错时放弃复用"""
+        try:
+            while limit > 0 and not self._complete:
+                piece = await self._read_piece()
+                if not piece:
+                    break
+                limit -= len(piece)
+        except (OSError, http.client.HTTPException):
+            self._broken = True
+
+    def close(self) -> None:
+        if self._released:
+            return
+        self._released = True
+        reusable = self._complete and not self._broken and not self.will_close
+        self._pool._release(self._key, self._conn, reusable)
+
+    async def __aenter__(self) -> "AsyncPooledResponse":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+class AsyncHTTPConnectionPool:
+    """按主机划分的 asyncio HTTP/1.1 持久连接池（单事件循环内使用）"""
+
+    def __init__(
+        self,
+        max_per_host: int = 16,
+        idle_timeout: float = 60.0,
+        wait_timeout: Optional[float] = None,
+        ssl_context: Optional[ssl.SSLContext] = None,
+    ):
+        """参数含义同 ``HTTPConnectionPool``"""
+        self.max_per_host = max(1, max_per_host)
+        self.idle_timeout = idle_timeout
+        self.wait_timeout = wait_timeout
+        self._ssl_context = ssl_context
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # 主机 -> [(归还时间, 连接)]，后进先出
+        self._idle: Dict[PoolKey, List[Tuple[float, _AsyncConnection]]] = {}
+        self._open: Dict[PoolKey, int] = {}
+        # 主机 -> 等待空闲连接的请求，先到先得
+        self._waiters: Dict[PoolKey, Deque[asyncio.Future]] = {}
+        self.requests = 0
+        self.reused = 0
+        self.retries = 0
+        self.evicted = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def _bind_loop(self) -> asyncio.AbstractEventLoop:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # 旧循环里的连接无法在新循环中使用，直接作废
+            for entries in self._idle.values():
+                for _, conn in entries:
+                    try:
+                        conn.writer.transport.abort()
+                    except Exception:
+                        pass
+            self._idle.clear()
+            self._open.clear()
+            self._waiters.clear()
+            self._loop = loop
+        return loop
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        body: Optional[bytes] = None,
+        headers: Optional[Mapping[str, str]] = None,
+        timeout: float = 60.0,
+    ) -> AsyncPooledResponse:
+        """发送请求并返回响应（调用方负责关闭，建议用 async with）"""
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        if scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"不支持的 URL: {url}")
+        key: PoolKey = (scheme, parts.hostname, parts.port or (443 if scheme == "https" else 80))
+        path = parts.path or "/"
+        if parts.query:
+            path = f"{path}?{parts.query}"
+        request_head = self._format_request(method, path, key, body, headers)
+
+        for attempt in range(2):
+            conn, reused = await self._acquire(key, timeout)
+            try:
+                conn.writer.write(request_head)
+                if body:
+                    conn.writer.write(body)
+                await _with_timeout(conn.writer.drain(), timeout)
+                status_line = await _with_timeout(conn.reader.readline(), timeout)
+                if not status_line:
+                    raise http.client.RemoteDisconnected("Remote end closed connection without response")
+                version, status, reason = self._parse_status_line(status_line)
+                response_headers = await self._read_headers(conn.reader, timeout)
+            except ConnectionError:
+                self._release(key, conn, False)
+                if reused and attempt == 0:
+                    self.retries += 1
+                    continue
+                raise
+            except BaseException:
+                self._release(key, conn, False)
+                raise
+            response = AsyncPooledResponse(
+                self, key, conn, status, reason, response_headers, version, method, timeout
+            )
+            if status >= 400:
+                async with response:
+                    error_body = await response.read()
+                raise HTTPStatusError(status, reason, error_body)
+            return response
+        raise AssertionError("unreachable")
+
+    @staticmethod
+    def _format_request(
+        method: str, path: str, key: PoolKey, body: Optional[bytes], headers: Optional[Mapping[str, str]]
+    ) -> bytes:
+        scheme, host, port = key
+        default_port = 443 if scheme == "https" else 80
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {host if port == default_port else f'{host}:{port}'}"]
+        names = set()
+        for name, value in (headers or {}).items():
+            names.add(name.lower())
+            lines.append(f"{name}: {value}")
+        if "accept-encoding" not in names:
+            lines.append("Accept-Encoding: identity")
+        if body is not None and "content-length" not in names:
+            lines.append(f"Content-Length: {len(body)}")
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    @staticmethod
+    def _parse_status_line(line: bytes) -> Tuple[str, int, str]:
+        parts = line.decode("iso-8859-1").rstrip("\r\n").split(" ", 2)
+        if len(parts) < 2 or not parts[0].startswith("HTTP/"):
+            raise http.client.BadStatusLine(line.decode("iso-8859-1", errors="replace"))
+        try:
+            status = int(parts[1])
+        except ValueError:
+            raise http.client.BadStatusLine(line.decode("iso-8859-1", errors="replace")) from None
+        return parts[0], status, parts[2] if len(parts) > 2 else ""
+
+    @staticmethod
+    async def _read_headers(reader: asyncio.StreamReader, timeout: float) -> Dict[str, str]:
+        headers: Dict[str, str] = {}
+        while True:
+            line = await _with_timeout(reader.readline(), timeout)
+            if line in (b"\r\n", b"\n"):
+                return headers
+            if not line:
+                raise http.client.RemoteDisconnected("Remote end closed connection while sending headers")
+            name, sep, value = line.decode("iso-8859-1").partition(":")
+            if not sep:
+                continue
+            name = name.strip().lower()
+            value = value.strip()
+            headers[name] = f"{headers[name]}, {value}" if name in headers else value
+
+    async def _acquire(self, key: PoolKey, timeout: float) -> Tuple[_AsyncConnection, bool]:
+        loop = self._bind_loop()
+        wait_limit = self.wait_timeout if self.wait_timeout is not None else timeout
+        wait_started: Optional[float] = None
+        while True:
+            now = time.monotonic()
+            self._evict_idle(now)
+            idle = self._idle.get(key)
+            if idle:
+                conn = idle.pop()[1]
+                self._record_acquire(wait_started, now, reused=True)
+                return conn, True
+            if self._open.get(key, 0) < self.max_per_host:
+                self._open[key] = self._open.get(key, 0) + 1
+                self._record_acquire(wait_started, now, reused=False)
+                break
+            if wait_started is None:
+                wait_started = now
+                self.waits += 1
+            remaining = wait_limit - (now - wait_started)
+            if remaining <= 0:
+                self._record_wait(now - wait_started)
+                raise PoolTimeoutError(f"等待 {key[1]}:{key[2]} 的空闲连接超时")
+            waiter = loop.create_future()
+            waiters = self._waiters.setdefault(key, deque())
+            waiters.append(waiter)
+            try:
+                await asyncio.wait_for(waiter, remaining)
+            except asyncio.TimeoutError:
+                pass
+            except BaseException:
+                # 已被唤醒却不再需要连接（如请求被取消）：把机会让给下一个等待者
+                if waiter.done() and not waiter.cancelled():
+                    self._wake(key)
+                raise
+            finally:
+                if waiter in waiters:
+                    waiters.remove(waiter)
+
+        scheme, host, port = key
+        try:
+            if scheme == "https":
+                if self._ssl_context is None:
+                    self._ssl_context = ssl.create_default_context()
+                reader, writer = await _with_timeout(
+                    asyncio.open_connection(host, port, ssl=self._ssl_context, server_hostname=host), timeout
+                )
+            else:
+                reader, writer = await _with_timeout(asyncio.open_connection(host, port), timeout)
+        except BaseException:
+            self._open[key] -= 1
+            self._wake(key)
+            raise
+        return _AsyncConnection(reader, writer), False
+
+    def _record_acquire(self, wait_started: Optional[float], now: float, reused: bool) -> None:
+        self.requests += 1
+        if reused:
+            self.reused += 1
+        if wait_started is not None:
+            self._record_wait(now - wait_started)
+
+    def _record_wait(self, waited: float) -> None:
+        self.wait_seconds += waited
+        self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+    def _evict_idle(self, now: float) -> None:
+        for key, idle in self._idle.items():
+            expired = 0
+            while expired < len(idle) and now - idle[expired][0] > self.idle_timeout:
+                expired += 1
+            if expired:
+                for _, conn in idle[:expired]:
+                    conn.close()
+                del idle[:expired]
+                self._open[key] -= expired
+                self.evicted += expired
+                self._wake(key)
+
+    def _wake(self, key: PoolKey) -> None:
+        waiters = self._waiters.get(key)
+        while waiters:
+            waiter = waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+
+    def _release(self, key: PoolKey, conn: _AsyncConnection, reusable: bool) -> None:
+        if reusable:
+            self._idle.setdefault(key, []).append((time.monotonic(), conn))
+        else:
+            self._open[key] = self._open.get(key, 1) - 1
+            conn.close()
+        self._wake(key)
+
+    async def aclose(self) -> None:
+        """关闭全部空闲连接"""
+        for key, entries in self._idle.items():
+            self._open[key] -= len(entries)
+            for _, conn in entries:
+                conn.close()
+        self._idle.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        # 可能由线程池中的同步接口调用：先整体复制（dict 复制在 GIL 下是原子的）再遍历
+        open_counts = dict(self._open)
+        open_total = sum(open_counts.values())
+        idle_total = sum(len(entries) for entries in dict(self._idle).values())
+        return {
+            "open_connections": open_total,
+            "idle_connections": idle_total,
+            "in_use": open_total - idle_total,
+            "max_per_host": self.max_per_host,
+            "hosts": {f"{scheme}://{host}:{port}": count for (scheme, host, port), count in open_counts.items()},
+            "requests": self.requests,
+            "reused": self.reused,
+            "reuse_ratio": round(self.reused / self.requests, 4) if self.requests else 0.0,
+            "retries": self.retries,
+            "evicted_idle": self.evicted,
+            "waits": self.waits,
+            "wait_ms_total": round(self.wait_seconds * 1000, 3),
+            "wait_ms_max": round(self.max_wait_seconds * 1000, 3),
+        }
@@ -1,15 +1,20 @@
 from __future__ import annotations
 
 import os
-from typing import Any, Dict, Iterable, Iterator, Optional
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, Optional
 
 from src.llm.openai_client import (
+    achat_with_usage as openai_achat_with_usage,
+    astream_chat_with_reasoning as openai_astream_chat_with_reasoning,
     chat as openai_chat,
     chat_with_usage as openai_chat_with_usage,
     stream_chat as openai_stream_chat,
     stream_chat_with_reasoning as openai_stream_chat_with_reasoning,
 )
 from src.llm.ollama_client import (
+    achat as ollama_achat,
+    astream_chat_with_reasoning as ollama_astream_chat_with_reasoning,
     chat as ollama_chat,
     stream_chat as ollama_stream_chat,
     stream_chat_with_reasoning as ollama_stream_chat_with_reasoning,
@@ -134,3 +139,63 @@ def chat_with_usage(
     if timeout is not None:
         kwargs["timeout"] = timeout
     return ollama_chat(messages, **kwargs), None
+
+
+async def astream_chat_with_reasoning(
+    messages: Iterable[Dict[str, str]],
+    *,
+    provider: Optional[str] = None,
+    model: Optional[str] = None,
+    temperature: Optional[float] = None,
+    enable_thinking: Optional[bool] = None,
+    response_format: Optional[Dict[str, Any]] = None,
+    timeout: Optional[float] = None,
+) -> AsyncIterator[ChatChunk]:
+    """stream_chat_with_reasoning 的 asyncio 版本，等待模型输出时不占用线程"""
+    resolved = _resolve_provider(provider or DEFAULT_PROVIDER)
+    if resolved == "openai":
+        kwargs = {
+            "model": model,
+            "temperature": temperature,
+            "enable_thinking": enable_thinking,
+            "response_format": response_format,
+        }
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        chunks = openai_astream_chat_with_reasoning(messages, **kwargs)
+    else:
+        kwargs = {"model": model, "temperature": temperature}
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        chunks = ollama_astream_chat_with_reasoning(messages, **kwargs)
+    async with aclosing(chunks):
+        async for chunk in chunks:
+            yield chunk
+
+
+async def achat_with_usage(
+    messages: Iterable[Dict[str, str]],
+    *,
+    provider: Optional[str] = None,
+    model: Optional[str] = None,
+    temperature: Optional[float] = None,
+    enable_thinking: Optional[bool] = None,
+    response_format: Optional[Dict[str, Any]] = None,
+    timeout: Optional[float] = None,
+) -> tuple[str, Optional[Dict[str, Any]]]:
+    """chat_with_usage 的 asyncio 版本"""
+    resolved = _resolve_provider(provider or DEFAULT_PROVIDER)
+    if resolved == "openai":
+        kwargs = {
+            "model": model,
+            "temperature": temperature,
+            "enable_thinking": enable_thinking,
+            "response_format": response_format,
+        }
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        return await openai_achat_with_usage(messages, **kwargs)
+    kwargs = {"model": model, "temperature": temperature}
+    if timeout is not None:
+        kwargs["timeout"] = timeout
+    return await ollama_achat(messages, **kwargs), None
@@ -0,0 +1,305 @@
+"""
+大模型接口的 HTTP 长连接池
+
+urllib 每次请求都新建连接，调用云端模型时每份报告、每轮对话都要重新走一遍
+TCP + TLS 握手。这里基于 ``http.client`` 的持久连接，按 (scheme, host, port)
+维护连接池：
+
+- 每个主机打开的连接数（含使用中）有上限，达到上限时等待其他请求归还；
+- 空闲超过 idle_timeout 的连接在下次取用时关闭；
+- 响应体读完且服务端未要求关闭时连接归还复用，中途放弃的响应直接关闭连接；
+- 复用的连接若已被服务端断开（发送请求或读取状态行时出错），换新连接重试一次。
+
+与原先 ``ProxyHandler({})`` 的行为一致，连接池不走系统代理。
+"""
+
+from __future__ import annotations
+
+import http.client
+import ssl
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple
+from urllib.parse import urlsplit
+
+# (scheme, host, port)
+PoolKey = Tuple[str, str, int]
+
+
+class HTTPStatusError(Exception):
+    """服务端返回 4xx/5xx；body 为已读取的响应体"""
+
+    def __init__(self, status: int, reason: str, body: bytes):
+        super().__init__(f"HTTP {status} {reason}")
+        self.status = status
+        self.reason = reason
+        self.body = body
+
+
+class PoolTimeoutError(TimeoutError):
+    """等待空闲连接超时"""
+
+
+class PooledResponse:
+    """连接池中的响应；关闭时按是否读完决定连接归还还是丢弃"""
+
+    def __init__(
+        self,
+        pool: "HTTPConnectionPool",
+        key: PoolKey,
+        conn: http.client.HTTPConnection,
+        response: http.client.HTTPResponse,
+    ):
+        self._pool = pool
+        self._key = key
+        self._conn = conn
+        self._response = response
+        self._broken = False
+        self._released = False
+        self.status = response.status
+        self.reason = response.reason
+        self.headers = response.headers
+
+    def __iter__(self) -> Iterator[bytes]:
+        # 不用 yield from：迭代器被提前关闭时 yield from 会顺带关闭响应，误判为已读完
+        try:
+            for line in self._response:
+                yield line
+        except Exception:
+            self._broken = True
+            raise
+
+    def iter_chunks(self, size: int = 65536) -> Iterator[bytes]:
+        """逐块产出响应体：每次返回已到达的数据（至多 size 字节），不等凑满也不按行切分"""
+        try:
+            while True:
+                chunk = self._response.read1(size)
+                if not chunk:
+                    return
+                yield chunk
+        except Exception:
+            self._broken = True
+            raise
+
+    def read(self, amt: Optional[int] = None) -> bytes:
+        try:
+            return self._response.read(amt)
+        except Exception:
+            self._broken = True
+            raise
+
+    def drain(self, limit: int = 65536) -> None:
+        """读完剩余响应体以便连接复用；剩余超过 limit 字节或读取出错时放弃复用"""
+        try:
+            while limit > 0 and not self._response.isclosed():
+                chunk = self._response.read(min(limit, 8192))
+                if not chunk:
+                    break
+                limit -= len(chunk)
+        except (OSError, http.client.HTTPException):
+            self._broken = True
+
+    def close(self) -> None:
+        if self._released:
+            return
+        self._released = True
+        reusable = not self._broken and self._response.isclosed() and not self._response.will_close
+        if not reusable:
+            self._response.close()
+        self._pool._release(self._key, self._conn, reusable)
+
+    def __enter__(self) -> "PooledResponse":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+class HTTPConnectionPool:
+    """按主机划分、线程安全的 HTTP/1.1 持久连接池"""
+
+    def __init__(
+        self,
+        max_per_host: int = 16,
+        idle_timeout: float = 60.0,
+        wait_timeout: Optional[float] = None,
+        ssl_context: Optional[ssl.SSLContext] = None,
+    ):
+        """
+        Args:
+            max_per_host: 每个主机最多打开的连接数（含使用中）
+            idle_timeout: 空闲连接保留的秒数
+            wait_timeout: 等待空闲连接的最长秒数；None 表示使用请求的 timeout
+            ssl_context: HTTPS 连接使用的 SSLContext，默认为系统证书
+        """
+        self.max_per_host = max(1, max_per_host)
+        self.idle_timeout = idle_timeout
+        self.wait_timeout = wait_timeout
+        self._ssl_context = ssl_context
+        # 主机 -> [(归还时间, 连接)]，后进先出，优先复用最近用过的连接
+        self._idle: Dict[PoolKey, List[Tuple[float, http.client.HTTPConnection]]] = {}
+        self._open: Dict[PoolKey, int] = {}
+        self._cond = threading.Condition()
+        self.requests = 0
+        self.reused = 0
+        self.retries = 0
+        self.evicted = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        body: Optional[bytes] = None,
+        headers: Optional[Mapping[str, str]] = None,
+        timeout: float = 60.0,
+    ) -> PooledResponse:
+        """
+        发送请求并返回响应（调用方负责关闭，建议用 with）。
+
+        4xx/5xx 时读完响应体并抛出 HTTPStatusError；连接、超时等错误抛出
+        OSError / http.client.HTTPException。
+        """
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        if scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"不支持的 URL: {url}")
+        key: PoolKey = (scheme, parts.hostname, parts.port or (443 if scheme == "https" else 80))
+        path = parts.path or "/"
+        if parts.query:
+            path = f"{path}?{parts.query}"
+
+        for attempt in range(2):
+            conn, reused = self._acquire(key, timeout)
+            try:
+                conn.timeout = timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+                conn.request(method, path, body=body, headers=dict(headers or {}))
+                response = conn.getresponse()
+            except ConnectionError:
+                self._release(key, conn, False)
+                if reused and attempt == 0:
+                    # 空闲期间被服务端断开的连接：换新连接重发
+                    with self._cond:
+                        self.retries += 1
+                    continue
+                raise
+            except BaseException:
+                self._release(key, conn, False)
+                raise
+            pooled = PooledResponse(self, key, conn, response)
+            if response.status >= 400:
+                with pooled:
+                    error_body = pooled.read()
+                raise HTTPStatusError(response.status, response.reason, error_body)
+            return pooled
+        raise AssertionError("unreachable")
+
+    def _acquire(self, key: PoolKey, timeout: float) -> Tuple[http.client.HTTPConnection, bool]:
+        wait_limit = self.wait_timeout if self.wait_timeout is not None else timeout
+        wait_started: Optional[float] = None
+        stale: List[http.client.HTTPConnection] = []
+        try:
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    stale.extend(self._evict_idle_locked(now))
+                    idle = self._idle.get(key)
+                    if idle:
+                        conn = idle.pop()[1]
+                        self._record_acquire_locked(wait_started, now, reused=True)
+                        return conn, True
+                    if self._open.get(key, 0) < self.max_per_host:
+                        self._open[key] = self._open.get(key, 0) + 1
+                        self._record_acquire_locked(wait_started, now, reused=False)
+                        break
+                    if wait_started is None:
+                        wait_started = now
+                        self.waits += 1
+                    remaining = wait_limit - (now - wait_started)
+                    if remaining <= 0:
+                        self._record_wait_locked(now - wait_started)
+                        raise PoolTimeoutError(f"等待 {key[1]}:{key[2]} 的空闲连接超时")
+                    self._cond.wait(remaining)
+        finally:
+            for conn in stale:
+                conn.close()
+        scheme, host, port = key
+        if scheme == "https":
+            if self._ssl_context is None:
+                # 加载系统证书较慢，所有连接共用一个 SSLContext
+                self._ssl_context = ssl.create_default_context()
+            return http.client.HTTPSConnection(host, port, timeout=timeout, context=self._ssl_context), False
+        return http.client.HTTPConnection(host, port, timeout=timeout), False
+
+    def _record_acquire_locked(self, wait_started: Optional[float], now: float, reused: bool) -> None:
+        self.requests += 1
+        if reused:
+            self.reused += 1
+        if wait_started is not None:
+            self._record_wait_locked(now - wait_started)
+
+    def _record_wait_locked(self, waited: float) -> None:
+        self.wait_seconds += waited
+        self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+    def _evict_idle_locked(self, now: float) -> List[http.client.HTTPConnection]:
+        evicted: List[http.client.HTTPConnection] = []
+        for key, idle in self._idle.items():
+            # 列表按归还时间递增，过期的都在前面
+            expired = 0
+            while expired < len(idle) and now - idle[expired][0] > self.idle_timeout:
+                expired += 1
+            if expired:
+                evicted.extend(conn for _, conn in idle[:expired])
+                del idle[:expired]
+                self._open[key] -= expired
+        if evicted:
+            self.evicted += len(evicted)
+            self._cond.notify_all()
+        return evicted
+
+    def _release(self, key: PoolKey, conn: http.client.HTTPConnection, reusable: bool) -> None:
+        with self._cond:
+            if reusable:
+                self._idle.setdefault(key, []).append((time.monotonic(), conn))
+            else:
+                self._open[key] -= 1
+            self._cond.notify()
+        if not reusable:
+            conn.close()
+
+    def close(self) -> None:
+        """关闭全部空闲连接；使用中的连接在归还时照常处理"""
+        with self._cond:
+            idle = [conn for entries in self._idle.values() for _, conn in entries]
+            for key, entries in self._idle.items():
+                self._open[key] -= len(entries)
+            self._idle.clear()
+            self._cond.notify_all()
+        for conn in idle:
+            conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            open_total = sum(self._open.values())
+            idle_total = sum(len(entries) for entries in self._idle.values())
+            return {
+                "open_connections": open_total,
+                "idle_connections": idle_total,
+                "in_use": open_total - idle_total,
+                "max_per_host": self.max_per_host,
+                "hosts": {f"{scheme}://{host}:{port}": count for (scheme, host, port), count in self._open.items()},
+                "requests": self.requests,
+                "reused": self.reused,
+                "reuse_ratio": round(self.reused / self.requests, 4) if self.requests else 0.0,
+                "retries": self.retries,
+                "evicted_idle": self.evicted,
+                "waits": self.waits,
+                "wait_ms_total": round(self.wait_seconds * 1000, 3),
+                "wait_ms_max": round(self.max_wait_seconds * 1000, 3),
+            }
@@ -1,11 +1,13 @@
 from __future__ import annotations
 
+import http.client
 import json
 import os
-import urllib.error
-import urllib.request
-from typing import Dict, Iterable, Iterator, Optional
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, Optional, Tuple
 
+from src.llm.async_http import AsyncHTTPConnectionPool
+from src.llm.http_pool import HTTPConnectionPool, HTTPStatusError, PooledResponse
 from src.llm.types import ChatChunk, OllamaError
 
 
@@ -13,6 +15,50 @@ DEFAULT_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://127.0.0.1:11434")
 DEFAULT_MODEL = os.getenv("OLLAMA_MODEL", "deepseek-r1:8b")
 DEFAULT_TEMPERATURE = float(os.getenv("OLLAMA_TEMPERATURE", "0.7"))
 DEFAULT_TIMEOUT = float(os.getenv("OLLAMA_TIMEOUT", "60"))
+# 默认与 FastAPI 同步接口的工作线程数（40）一致，请求不会先在连接池排队再到 Ollama 排队
+POOL_MAX_PER_HOST = int(os.getenv("OLLAMA_POOL_MAX_PER_HOST", "40"))
+POOL_IDLE_TIMEOUT = float(os.getenv("OLLAMA_POOL_IDLE_TIMEOUT", "60"))
+# asyncio 版本每个流式响应独占一条连接，上限按单个 worker 同时挂住的流数设置
+ASYNC_POOL_MAX_PER_HOST = int(os.getenv("OLLAMA_ASYNC_POOL_MAX_PER_HOST", "512"))
+
+_http_pool = HTTPConnectionPool(max_per_host=POOL_MAX_PER_HOST, idle_timeout=POOL_IDLE_TIMEOUT)
+_async_pool = AsyncHTTPConnectionPool(max_per_host=ASYNC_POOL_MAX_PER_HOST, idle_timeout=POOL_IDLE_TIMEOUT)
+
+
+def pool_stats() -> Dict[str, Any]:
+    """本地 Ollama 连接池的统计（打开连接数、复用率、等待时间等）"""
+    return _http_pool.stats()
+
+
+def async_pool_stats() -> Dict[str, Any]:
+    """asyncio 连接池的统计"""
+    return _async_pool.stats()
+
+
+def close_pool() -> None:
+    """关闭连接池中的空闲连接"""
+    _http_pool.close()
+
+
+async def aclose_async_pool() -> None:
+    """关闭 asyncio 连接池中的空闲连接"""
+    await _async_pool.aclose()
+
+
+def post_json(base_url: str, path: str, payload: Dict[str, Any], timeout: float) -> PooledResponse:
+    """
+    经连接池向 Ollama 发送 JSON 请求，返回响应（调用方负责关闭）。
+
+    4xx/5xx 抛出 HTTPStatusError，连接与超时错误抛出 OSError / http.client.HTTPException。
+    """
+    data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    return _http_pool.request(
+        "POST",
+        f"{base_url}{path}",
+        body=data,
+        headers={"Content-Type": "application/json"},
+        timeout=timeout,
+    )
 
 
 def _parse_error_body(body: bytes) -> Optional[str]:
@@ -48,6 +94,75 @@ def _build_chat_payload(
     }
 
 
+def _wrap_error(exc: Exception, base_url: str, model: Optional[str]) -> OllamaError:
+    if isinstance(exc, HTTPStatusError):
+        detail = _parse_error_body(exc.body)
+        message = f"Ollama 调用失败: HTTP {exc.status} {exc.reason}"
+        if detail:
+            message = f"{message} - {detail}"
+        return OllamaError(f"{message} (base_url={base_url}, model={model or DEFAULT_MODEL})")
+    return OllamaError(f"Ollama 调用失败: {exc} (base_url={base_url}, model={model or DEFAULT_MODEL})")
+
+
+# 传输层错误：HTTP 状态码、连接/超时、协议错误、URL 无效
+_TRANSPORT_ERRORS = (HTTPStatusError, OSError, http.client.HTTPException, ValueError)
+
+
+def _coerce_text(value: Optional[str]) -> str:
+    return value if isinstance(value, str) else ""
+
+
+def _parse_stream_line(raw_line: bytes) -> Tuple[Optional[ChatChunk], bool]:
+    """解析一行 NDJSON，返回 (ChatChunk 或 None, 是否为最后一行)"""
+    line = raw_line.decode("utf-8").strip()
+    if not line:
+        return None, False
+    try:
+        chunk = json.loads(line)
+    except json.JSONDecodeError:
+        return None, False
+    if not isinstance(chunk, dict):
+        return None, False
+
+    raw_message = chunk.get("message")
+    message = raw_message if isinstance(raw_message, dict) else {}
+    content = _coerce_text(message.get("content")) or _coerce_text(chunk.get("response"))
+    reasoning = (
+        _coerce_text(message.get("reasoning_content"))
+        or _coerce_text(message.get("reasoning"))
+        or _coerce_text(message.get("thinking"))
+        or _coerce_text(chunk.get("reasoning_content"))
+        or _coerce_text(chunk.get("reasoning"))
+    )
+    done = bool(chunk.get("done"))
+    usage = None
+    if done:
+        # 最后一行带有本次调用的 token 计数
+        prompt_tokens = chunk.get("prompt_eval_count")
+        completion_tokens = chunk.get("eval_count")
+        if isinstance(prompt_tokens, int) and isinstance(completion_tokens, int):
+            usage = {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            }
+    if content or reasoning or usage:
+        return ChatChunk(content=content, reasoning=reasoning, usage=usage), done
+    return None, done
+
+
+def _parse_chat_response(raw: bytes) -> str:
+    try:
+        data = json.loads(raw) if raw.strip() else {}
+    except (json.JSONDecodeError, UnicodeDecodeError) as exc:
+        raise OllamaError("Ollama 返回非 JSON 数据") from exc
+    data = data if isinstance(data, dict) else {}
+    message = data.get("message")
+    if isinstance(message, dict) and isinstance(message.get("content"), str):
+        return message["content"]
+    return data.get("response") if isinstance(data.get("response"), str) else ""
+
+
 def _iter_chat_chunks(
     messages: Iterable[Dict[str, str]],
     *,
@@ -57,57 +172,90 @@ def _iter_chat_chunks(
     timeout: float,
 ) -> Iterator[ChatChunk]:
     payload = _build_chat_payload(messages, stream=True, model=model, temperature=temperature)
-    data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
-    request = urllib.request.Request(
-        f"{base_url}/api/chat",
-        data=data,
-        headers={"Content-Type": "application/json"},
-    )
-    opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))
-
-    def _coerce_text(value: Optional[str]) -> str:
-        return value if isinstance(value, str) else ""
-
     try:
-        with opener.open(request, timeout=timeout) as response:
+        with post_json(base_url, "/api/chat", payload, timeout) as response:
             for raw_line in response:
                 if not raw_line:
                     continue
-                line = raw_line.decode("utf-8").strip()
-                if not line:
-                    continue
-                try:
-                    chunk = json.loads(line)
-                except json.JSONDecodeError:
-                    continue
-                if not isinstance(chunk, dict):
-                    continue
+                chunk, done = _parse_stream_line(raw_line)
+                if chunk is not None:
+                    yield chunk
+                if done:
+                    # done 之后只剩分块结尾标记，读完后连接才能归还复用
+                    response.drain()
+                    break
+    except _TRANSPORT_ERRORS as exc:
+        raise _wrap_error(exc, base_url, model) from exc
+
 
-                raw_message = chunk.get("message")
-                message = raw_message if isinstance(raw_message, dict) else {}
-                content = _coerce_text(message.get("content")) or _coerce_text(chunk.get("response"))
-                reasoning = (
-                    _coerce_text(message.get("reasoning_content"))
-                    or _coerce_text(message.get("reasoning"))
-                    or _coerce_text(message.get("thinking"))
-                    or _coerce_text(chunk.get("reasoning_content"))
-                    or _coerce_text(chunk.get("reasoning"))
-                )
-
-                if content or reasoning:
-                    yield ChatChunk(content=content, reasoning=reasoning)
-                if chunk.get("done"):
+async def _aiter_chat_chunks(
+    messages: Iterable[Dict[str, str]],
+    *,
+    base_url: str,
+    model: Optional[str],
+    temperature: Optional[float],
+    timeout: float,
+) -> AsyncIterator[ChatChunk]:
+    payload = _build_chat_payload(messages, stream=True, model=model, temperature=temperature)
+    data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    try:
+        async with await _async_pool.request(
+            "POST",
+            f"{base_url}/api/chat",
+            body=data,
+            headers={"Content-Type": "application/json"},
+            timeout=timeout,
+        ) as response:
+            async for raw_line in response.iter_lines():
+                chunk, done = _parse_stream_line(raw_line)
+                if chunk is not None:
+                    yield chunk
+                if done:
+                    await response.drain()
                     break
-    except urllib.error.HTTPError as exc:
-        detail = _parse_error_body(exc.read())
-        message = f"Ollama 调用失败: HTTP {exc.code} {exc.reason}"
-        if detail:
-            message = f"{message} - {detail}"
-        message = f"{message} (base_url={base_url}, model={model or DEFAULT_MODEL})"
-        raise OllamaError(message) from exc
-    except (urllib.error.URLError, TimeoutError) as exc:
-        message = f"Ollama 调用失败: {exc} (base_url={base_url}, model={model or DEFAULT_MODEL})"
-        raise OllamaError(message) from exc
+    except _TRANSPORT_ERRORS as exc:
+        raise _wrap_error(exc, base_url, model) from exc
+
+
+def _request_chat(
+    messages: Iterable[Dict[str, str]],
+    *,
+    base_url: str,
+    model: Optional[str],
+    temperature: Optional[float],
+    timeout: float,
+) -> str:
+    payload = _build_chat_payload(messages, stream=False, model=model, temperature=temperature)
+    try:
+        with post_json(base_url, "/api/chat", payload, timeout) as response:
+            raw = response.read()
+    except _TRANSPORT_ERRORS as exc:
+        raise _wrap_error(exc, base_url, model) from exc
+    return _parse_chat_response(raw)
+
+
+async def _arequest_chat(
+    messages: Iterable[Dict[str, str]],
+    *,
+    base_url: str,
+    model: Optional[str],
+    temperature: Optional[float],
+    timeout: float,
+) -> str:
+    payload = _build_chat_payload(messages, stream=False, model=model, temperature=temperature)
+    data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    try:
+        async with await _async_pool.request(
+            "POST",
+            f"{base_url}/api/chat",
+            body=data,
+            headers={"Content-Type": "application/json"},
+            timeout=timeout,
+        ) as response:
+            raw = await response.read()
+    except _TRANSPORT_ERRORS as exc:
+        raise _wrap_error(exc, base_url, model) from exc
+    return _parse_chat_response(raw)
 
 
 def stream_chat(
@@ -137,14 +285,13 @@ def chat(
     temperature: Optional[float] = None,
     timeout: float = DEFAULT_TIMEOUT,
 ) -> str:
-    return "".join(
-        stream_chat(
-            messages,
-            base_url=base_url,
-            model=model,
-            temperature=temperature,
-            timeout=timeout,
-        )
+    """非流式调用（stream: false），只返回最终的可见回复"""
+    return _request_chat(
+        messages,
+        base_url=base_url,
+        model=model,
+        temperature=temperature,
+        timeout=timeout,
     )
 
 
@@ -166,3 +313,43 @@ def stream_chat_with_reasoning(
         temperature=temperature,
         timeout=timeout,
     )
+
+
+async def astream_chat_with_reasoning(
+    messages: Iterable[Dict[str, str]],
+    *,
+    base_url: str = DEFAULT_BASE_URL,
+    model: Optional[str] = None,
+    temperature: Optional[float] = None,
+    timeout: float = DEFAULT_TIMEOUT,
+) -> AsyncIterator[ChatChunk]:
+    """stream_chat_with_reasoning 的 asyncio 版本"""
+    # 异步生成器被提前关闭时不会自动关闭内层生成器，用 aclosing 及时归还连接
+    chunks = _aiter_chat_chunks(
+        messages,
+        base_url=base_url,
+        model=model,
+        temperature=temperature,
+        timeout=timeout,
+    )
+    async with aclosing(chunks):
+        async for chunk in chunks:
+            yield chunk
+
+
+async def achat(
+    messages: Iterable[Dict[str, str]],
+    *,
+    base_url: str = DEFAULT_BASE_URL,
+    model: Optional[str] = None,
+    temperature: Optional[float] = None,
+    timeout: float = DEFAULT_TIMEOUT,
+) -> str:
+    """chat 的 asyncio 版本"""
+    return await _arequest_chat(
+        messages,
+        base_url=base_url,
+        model=model,
+        temperature=temperature,
+        timeout=timeout,
+    )
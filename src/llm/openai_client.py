@@ -1,11 +1,13 @@
 from __future__ import annotations
 
+import http.client
 import json
 import os
-import urllib.error
-import urllib.request
-from typing import Any, Dict, Iterable, Iterator, Optional
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple
 
+from src.llm.async_http import AsyncHTTPConnectionPool
+from src.llm.http_pool import HTTPConnectionPool, HTTPStatusError
 from src.llm.types import ChatChunk, OpenAICompatibleError
 
 
@@ -18,6 +20,41 @@ DEFAULT_TEMPERATURE = float(
     os.getenv("OPENAI_COMPAT_TEMPERATURE", os.getenv("DASHSCOPE_TEMPERATURE", "0.7"))
 )
 DEFAULT_TIMEOUT = float(os.getenv("OPENAI_COMPAT_TIMEOUT", os.getenv("DASHSCOPE_TIMEOUT", "60")))
+POOL_MAX_PER_HOST = int(os.getenv("OPENAI_COMPAT_POOL_MAX_PER_HOST", "16"))
+POOL_IDLE_TIMEOUT = float(os.getenv("OPENAI_COMPAT_POOL_IDLE_TIMEOUT", "60"))
+# asyncio 版本每个流式响应独占一条连接，上限按单个 worker 同时挂住的流数设置
+ASYNC_POOL_MAX_PER_HOST = int(os.getenv("OPENAI_COMPAT_ASYNC_POOL_MAX_PER_HOST", "512"))
+# 流式调用请求 stream_options.include_usage，让服务商在流末尾返回实际用量；不支持该参数的服务可关闭
+STREAM_INCLUDE_USAGE = os.getenv("OPENAI_COMPAT_STREAM_USAGE", "true").strip().lower() not in {
+    "0",
+    "false",
+    "no",
+    "off",
+}
+
+# 流式与非流式调用共用的长连接池
+_http_pool = HTTPConnectionPool(max_per_host=POOL_MAX_PER_HOST, idle_timeout=POOL_IDLE_TIMEOUT)
+_async_pool = AsyncHTTPConnectionPool(max_per_host=ASYNC_POOL_MAX_PER_HOST, idle_timeout=POOL_IDLE_TIMEOUT)
+
+
+def pool_stats() -> Dict[str, Any]:
+    """OpenAI 兼容接口连接池的统计（打开连接数、复用率、等待时间等）"""
+    return _http_pool.stats()
+
+
+def async_pool_stats() -> Dict[str, Any]:
+    """asyncio 连接池的统计"""
+    return _async_pool.stats()
+
+
+def close_pool() -> None:
+    """关闭连接池中的空闲连接"""
+    _http_pool.close()
+
+
+async def aclose_async_pool() -> None:
+    """关闭 asyncio 连接池中的空闲连接"""
+    await _async_pool.aclose()
 
 
 def _parse_error_body(body: bytes) -> Optional[str]:
@@ -59,6 +96,8 @@ def _build_chat_payload(
         "stream": stream,
         "temperature": DEFAULT_TEMPERATURE if temperature is None else temperature,
     }
+    if stream and STREAM_INCLUDE_USAGE:
+        payload["stream_options"] = {"include_usage": True}
     if enable_thinking is not None:
         payload["enable_thinking"] = bool(enable_thinking)
     if response_format:
@@ -66,8 +105,120 @@ def _build_chat_payload(
     return payload
 
 
-def _iter_chat_chunks(
+def _wrap_error(exc: Exception, base_url: str, model: Optional[str]) -> OpenAICompatibleError:
+    if isinstance(exc, HTTPStatusError):
+        detail = _parse_error_body(exc.body)
+        message = f"OpenAI 兼容云端调用失败: HTTP {exc.status} {exc.reason}"
+        if detail:
+            message = f"{message} - {detail}"
+        return OpenAICompatibleError(f"{message} (base_url={base_url}, model={model or DEFAULT_MODEL})")
+    return OpenAICompatibleError(
+        f"OpenAI 兼容云端调用失败: {exc} (base_url={base_url}, model={model or DEFAULT_MODEL})"
+    )
+
+
+# 传输层错误：HTTP 状态码、连接/超时、协议错误、URL 无效
+_TRANSPORT_ERRORS = (HTTPStatusError, OSError, http.client.HTTPException, ValueError)
+
+
+def _coerce_text(value: object) -> str:
+    return value if isinstance(value, str) else ""
+
+
+class _SSEDecoder:
+    """
+    按字节解析 SSE。
+
+    推理模型一次回复有数千个很小的事件，逐行解码、拼接的开销会累积成可见的 CPU 占用。
+    这里直接缓冲网络数据块，按空行切出完整事件，只取出 data 字段的字节，不做任何解码；
+    没有 data 的事件（如 ``: keep-alive`` 注释）直接跳过。收到 ``[DONE]`` 后 done 置位，
+    之后的数据不再处理。
+    """
+
+    def __init__(self) -> None:
+        self._buffer = b""
+        self.done = False
+
+    def feed(self, data: bytes) -> List[bytes]:
+        """送入一块原始字节，返回其中完整事件的 data 内容（多行 data 以换行拼接）"""
+        if self.done:
+            return []
+        buffer = self._buffer + data
+        tail = b""
+        if b"\r" in buffer:
+            # 兼容 CRLF / CR 行尾；结尾的 CR 可能与下一块开头的 LF 组成 CRLF，留到下次处理
+            if buffer.endswith(b"\r"):
+                buffer, tail = buffer[:-1], b"\r"
+            buffer = buffer.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+        events = buffer.split(b"\n\n")
+        self._buffer = events.pop() + tail
+        payloads: List[bytes] = []
+        for event in events:
+            if event.startswith(b"data:") and b"\n" not in event:
+                # 绝大多数事件只有一行 data
+                payload = event[5:].strip()
+            else:
+                payload = b"\n".join(
+                    line[5:].strip() for line in event.split(b"\n") if line.startswith(b"data:")
+                ).strip()
+            if not payload:
+                continue
+            if payload == b"[DONE]":
+                self.done = True
+                self._buffer = b""
+                break
+            payloads.append(payload)
+        return payloads
+
+
+def _coerce_usage(raw: Any) -> Optional[Dict[str, int]]:
+    """整理服务商返回的 usage；缺少 token 数时返回 None"""
+    if not isinstance(raw, dict):
+        return None
+    prompt_tokens = raw.get("prompt_tokens")
+    completion_tokens = raw.get("completion_tokens")
+    if not isinstance(prompt_tokens, int) or not isinstance(completion_tokens, int):
+        return None
+    total_tokens = raw.get("total_tokens")
+    if not isinstance(total_tokens, int):
+        total_tokens = prompt_tokens + completion_tokens
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": total_tokens,
+    }
+
+
+def _parse_stream_event(payload: bytes) -> Optional[ChatChunk]:
+    try:
+        chunk = json.loads(payload.decode("utf-8", errors="ignore"))
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(chunk, dict):
+        return None
+    # include_usage 时用量在最后一个事件中（choices 为空）；部分服务商随最后一个增量一起返回
+    usage = _coerce_usage(chunk.get("usage"))
+    choices = chunk.get("choices")
+    if not isinstance(choices, list) or not choices:
+        return ChatChunk(usage=usage) if usage else None
+    choice0 = choices[0] if isinstance(choices[0], dict) else {}
+    delta = choice0.get("delta")
+    delta = delta if isinstance(delta, dict) else {}
+
+    content = _coerce_text(delta.get("content"))
+    reasoning = (
+        _coerce_text(delta.get("reasoning_content"))
+        or _coerce_text(delta.get("reasoning"))
+        or _coerce_text(delta.get("thinking"))
+    )
+    if content or reasoning or usage:
+        return ChatChunk(content=content, reasoning=reasoning, usage=usage)
+    return None
+
+
+def _chat_request(
     messages: Iterable[Dict[str, str]],
+    stream: bool,
     *,
     api_key: str,
     base_url: str,
@@ -75,87 +226,129 @@ def _iter_chat_chunks(
     temperature: Optional[float],
     enable_thinking: Optional[bool],
     response_format: Optional[Dict[str, Any]],
-    timeout: float,
-) -> Iterator[ChatChunk]:
+) -> Tuple[str, bytes, Dict[str, str]]:
+    """返回 (endpoint, 请求体, 请求头)"""
     payload = _build_chat_payload(
         messages,
-        stream=True,
+        stream=stream,
         model=model,
         temperature=temperature,
         enable_thinking=enable_thinking,
         response_format=response_format,
     )
-    data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    headers = {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {api_key}",
+        "Accept": "text/event-stream" if stream else "application/json",
+    }
     endpoint = f"{_normalize_base_url(base_url)}/chat/completions"
-    request = urllib.request.Request(
-        endpoint,
-        data=data,
-        headers={
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {api_key}",
-            "Accept": "text/event-stream",
-        },
+    return endpoint, json.dumps(payload, ensure_ascii=False).encode("utf-8"), headers
+
+
+def _parse_completion(raw: bytes) -> Dict[str, Any]:
+    text = raw.decode("utf-8", errors="ignore").strip()
+    try:
+        data = json.loads(text) if text else {}
+    except json.JSONDecodeError as exc:
+        raise OpenAICompatibleError("OpenAI 兼容云端返回非 JSON 数据") from exc
+    return data if isinstance(data, dict) else {}
+
+
+def _completion_content(data: Dict[str, Any]) -> Tuple[str, Optional[Dict[str, Any]]]:
+    usage = data.get("usage") if isinstance(data.get("usage"), dict) else None
+    choices = data.get("choices")
+    if not isinstance(choices, list) or not choices:
+        return "", usage
+    first = choices[0] if isinstance(choices[0], dict) else {}
+    message = first.get("message")
+    content = ""
+    if isinstance(message, dict):
+        content = message.get("content") if isinstance(message.get("content"), str) else ""
+    return content, usage
+
+
+def _resolve_api_key(api_key: Optional[str]) -> str:
+    resolved_key = api_key or os.getenv("OPENAI_COMPAT_API_KEY", "").strip()
+    if not resolved_key:
+        resolved_key = os.getenv("DASHSCOPE_API_KEY", "").strip()
+    if not resolved_key:
+        raise OpenAICompatibleError("缺少 OPENAI_COMPAT_API_KEY，无法调用 OpenAI 兼容云端模型")
+    return resolved_key
+
+
+def _iter_chat_chunks(
+    messages: Iterable[Dict[str, str]],
+    *,
+    api_key: str,
+    base_url: str,
+    model: Optional[str],
+    temperature: Optional[float],
+    enable_thinking: Optional[bool],
+    response_format: Optional[Dict[str, Any]],
+    timeout: float,
+) -> Iterator[ChatChunk]:
+    endpoint, data, headers = _chat_request(
+        messages,
+        True,
+        api_key=api_key,
+        base_url=base_url,
+        model=model,
+        temperature=temperature,
+        enable_thinking=enable_thinking,
+        response_format=response_format,
     )
-    opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))
+    decoder = _SSEDecoder()
+    try:
+        with _http_pool.request("POST", endpoint, body=data, headers=headers, timeout=timeout) as response:
+            for piece in response.iter_chunks():
+                for payload in decoder.feed(piece):
+                    chunk = _parse_stream_event(payload)
+                    if chunk is not None:
+                        yield chunk
+                if decoder.done:
+                    # 读完结尾的分块标记，连接才能归还复用
+                    response.drain()
+                    break
+    except _TRANSPORT_ERRORS as exc:
+        raise _wrap_error(exc, base_url, model) from exc
 
-    def _coerce_text(value: object) -> str:
-        return value if isinstance(value, str) else ""
 
+async def _aiter_chat_chunks(
+    messages: Iterable[Dict[str, str]],
+    *,
+    api_key: str,
+    base_url: str,
+    model: Optional[str],
+    temperature: Optional[float],
+    enable_thinking: Optional[bool],
+    response_format: Optional[Dict[str, Any]],
+    timeout: float,
+) -> AsyncIterator[ChatChunk]:
+    endpoint, data, headers = _chat_request(
+        messages,
+        True,
+        api_key=api_key,
+        base_url=base_url,
+        model=model,
+        temperature=temperature,
+        enable_thinking=enable_thinking,
+        response_format=response_format,
+    )
+    decoder = _SSEDecoder()
     try:
-        with opener.open(request, timeout=timeout) as response:
-            event_data_lines: list[str] = []
-            for raw_line in response:
-                if not raw_line:
-                    continue
-                line = raw_line.decode("utf-8", errors="ignore").rstrip("\r\n")
-
-                # SSE: 空行表示一个事件结束
-                if line == "":
-                    if not event_data_lines:
-                        continue
-                    data_text = "\n".join(event_data_lines).strip()
-                    event_data_lines = []
-                    if not data_text:
-                        continue
-                    if data_text == "[DONE]":
-                        break
-                    try:
-                        chunk = json.loads(data_text)
-                    except json.JSONDecodeError:
-                        continue
-                    if not isinstance(chunk, dict):
-                        continue
-                    choices = chunk.get("choices")
-                    if not isinstance(choices, list) or not choices:
-                        continue
-                    choice0 = choices[0] if isinstance(choices[0], dict) else {}
-                    delta = choice0.get("delta")
-                    delta = delta if isinstance(delta, dict) else {}
-
-                    content = _coerce_text(delta.get("content"))
-                    reasoning = (
-                        _coerce_text(delta.get("reasoning_content"))
-                        or _coerce_text(delta.get("reasoning"))
-                        or _coerce_text(delta.get("thinking"))
-                    )
-                    if content or reasoning:
-                        yield ChatChunk(content=content, reasoning=reasoning)
-                    continue
-
-                if not line.startswith("data:"):
-                    continue
-                data_part = line[len("data:") :].strip()
-                event_data_lines.append(data_part)
-    except urllib.error.HTTPError as exc:
-        detail = _parse_error_body(exc.read())
-        message = f"OpenAI 兼容云端调用失败: HTTP {exc.code} {exc.reason}"
-        if detail:
-            message = f"{message} - {detail}"
-        message = f"{message} (base_url={base_url}, model={model or DEFAULT_MODEL})"
-        raise OpenAICompatibleError(message) from exc
-    except (urllib.error.URLError, TimeoutError) as exc:
-        message = f"OpenAI 兼容云端调用失败: {exc} (base_url={base_url}, model={model or DEFAULT_MODEL})"
-        raise OpenAICompatibleError(message) from exc
+        async with await _async_pool.request(
+            "POST", endpoint, body=data, headers=headers, timeout=timeout
+        ) as response:
+            async for piece in response.iter_chunks():
+                for payload in decoder.feed(piece):
+                    chunk = _parse_stream_event(payload)
+                    if chunk is not None:
+                        yield chunk
+                if decoder.done:
+                    await response.drain()
+                    break
+    except _TRANSPORT_ERRORS as exc:
+        raise _wrap_error(exc, base_url, model) from exc
 
 
 def _request_chat_completion(
@@ -169,46 +362,53 @@ def _request_chat_completion(
     response_format: Optional[Dict[str, Any]],
     timeout: float,
 ) -> Dict[str, Any]:
-    payload = _build_chat_payload(
+    endpoint, data, headers = _chat_request(
         messages,
-        stream=False,
+        False,
+        api_key=api_key,
+        base_url=base_url,
         model=model,
         temperature=temperature,
         enable_thinking=enable_thinking,
         response_format=response_format,
     )
-    data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
-    endpoint = f"{_normalize_base_url(base_url)}/chat/completions"
-    request = urllib.request.Request(
-        endpoint,
-        data=data,
-        headers={
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {api_key}",
-            "Accept": "application/json",
-        },
-    )
-    opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))
-
     try:
-        with opener.open(request, timeout=timeout) as response:
-            raw = response.read().decode("utf-8", errors="ignore").strip()
-    except urllib.error.HTTPError as exc:
-        detail = _parse_error_body(exc.read())
-        message = f"OpenAI 兼容云端调用失败: HTTP {exc.code} {exc.reason}"
-        if detail:
-            message = f"{message} - {detail}"
-        message = f"{message} (base_url={base_url}, model={model or DEFAULT_MODEL})"
-        raise OpenAICompatibleError(message) from exc
-    except (urllib.error.URLError, TimeoutError) as exc:
-        message = f"OpenAI 兼容云端调用失败: {exc} (base_url={base_url}, model={model or DEFAULT_MODEL})"
-        raise OpenAICompatibleError(message) from exc
+        with _http_pool.request("POST", endpoint, body=data, headers=headers, timeout=timeout) as response:
+            raw = response.read()
+    except _TRANSPORT_ERRORS as exc:
+        raise _wrap_error(exc, base_url, model) from exc
+    return _parse_completion(raw)
 
+
+async def _arequest_chat_completion(
+    messages: Iterable[Dict[str, str]],
+    *,
+    api_key: str,
+    base_url: str,
+    model: Optional[str],
+    temperature: Optional[float],
+    enable_thinking: Optional[bool],
+    response_format: Optional[Dict[str, Any]],
+    timeout: float,
+) -> Dict[str, Any]:
+    endpoint, data, headers = _chat_request(
+        messages,
+        False,
+        api_key=api_key,
+        base_url=base_url,
+        model=model,
+        temperature=temperature,
+        enable_thinking=enable_thinking,
+        response_format=response_format,
+    )
     try:
-        data = json.loads(raw) if raw else {}
-    except json.JSONDecodeError as exc:
-        raise OpenAICompatibleError("OpenAI 兼容云端返回非 JSON 数据") from exc
-    return data if isinstance(data, dict) else {}
+        async with await _async_pool.request(
+            "POST", endpoint, body=data, headers=headers, timeout=timeout
+        ) as response:
+            raw = await response.read()
+    except _TRANSPORT_ERRORS as exc:
+        raise _wrap_error(exc, base_url, model) from exc
+    return _parse_completion(raw)
 
 
 def stream_chat_with_reasoning(
@@ -222,14 +422,9 @@ def stream_chat_with_reasoning(
     response_format: Optional[Dict[str, Any]] = None,
     timeout: float = DEFAULT_TIMEOUT,
 ) -> Iterator[ChatChunk]:
-    resolved_key = api_key or os.getenv("OPENAI_COMPAT_API_KEY", "").strip()
-    if not resolved_key:
-        resolved_key = os.getenv("DASHSCOPE_API_KEY", "").strip()
-    if not resolved_key:
-        raise OpenAICompatibleError("缺少 OPENAI_COMPAT_API_KEY，无法调用 OpenAI 兼容云端模型")
     yield from _iter_chat_chunks(
         messages,
-        api_key=resolved_key,
+        api_key=_resolve_api_key(api_key),
         base_url=base_url,
         model=model,
         temperature=temperature,
@@ -300,15 +495,9 @@ def chat_with_usage(
     response_format: Optional[Dict[str, Any]] = None,
     timeout: float = DEFAULT_TIMEOUT,
 ) -> tuple[str, Optional[Dict[str, Any]]]:
-    resolved_key = api_key or os.getenv("OPENAI_COMPAT_API_KEY", "").strip()
-    if not resolved_key:
-        resolved_key = os.getenv("DASHSCOPE_API_KEY", "").strip()
-    if not resolved_key:
-        raise OpenAICompatibleError("缺少 OPENAI_COMPAT_API_KEY，无法调用 OpenAI 兼容云端模型")
-
     data = _request_chat_completion(
         messages,
-        api_key=resolved_key,
+        api_key=_resolve_api_key(api_key),
         base_url=base_url,
         model=model,
         temperature=temperature,
@@ -316,13 +505,57 @@ def chat_with_usage(
         response_format=response_format,
         timeout=timeout,
     )
-    choices = data.get("choices")
-    if not isinstance(choices, list) or not choices:
-        return "", data.get("usage") if isinstance(data.get("usage"), dict) else None
-    first = choices[0] if isinstance(choices[0], dict) else {}
-    message = first.get("message")
-    content = ""
-    if isinstance(message, dict):
-        content = message.get("content") if isinstance(message.get("content"), str) else ""
-    usage = data.get("usage") if isinstance(data.get("usage"), dict) else None
-    return content, usage
+    return _completion_content(data)
+
+
+async def astream_chat_with_reasoning(
+    messages: Iterable[Dict[str, str]],
+    *,
+    api_key: Optional[str] = None,
+    base_url: str = DEFAULT_BASE_URL,
+    model: Optional[str] = None,
+    temperature: Optional[float] = None,
+    enable_thinking: Optional[bool] = None,
+    response_format: Optional[Dict[str, Any]] = None,
+    timeout: float = DEFAULT_TIMEOUT,
+) -> AsyncIterator[ChatChunk]:
+    """stream_chat_with_reasoning 的 asyncio 版本"""
+    # 异步生成器被提前关闭时不会自动关闭内层生成器，用 aclosing 及时归还连接
+    chunks = _aiter_chat_chunks(
+        messages,
+        api_key=_resolve_api_key(api_key),
+        base_url=base_url,
+        model=model,
+        temperature=temperature,
+        enable_thinking=enable_thinking,
+        response_format=response_format,
+        timeout=timeout,
+    )
+    async with aclosing(chunks):
+        async for chunk in chunks:
+            yield chunk
+
+
+async def achat_with_usage(
+    messages: Iterable[Dict[str, str]],
+    *,
+    api_key: Optional[str] = None,
+    base_url: str = DEFAULT_BASE_URL,
+    model: Optional[str] = None,
+    temperature: Optional[float] = None,
+    enable_thinking: Optional[bool] = None,
+    response_format: Optional[Dict[str, Any]] = None,
+    timeout: float = DEFAULT_TIMEOUT,
+) -> tuple[str, Optional[Dict[str, Any]]]:
+    """chat_with_usage 的 asyncio 版本"""
+    data = await _arequest_chat_completion(
+        messages,
+        api_key=_resolve_api_key(api_key),
+        base_url=base_url,
+        model=model,
+        temperature=temperature,
+        enable_thinking=enable_thinking,
+        response_format=response_format,
+        timeout=timeout,
+    )
+    return _completion_content(data)
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Literal
+from typing import Dict, Literal, Optional
 
 
 LLMProvider = Literal["local", "openai"]
@@ -11,6 +11,9 @@ LLMProvider = Literal["local", "openai"]
 class ChatChunk:
     content: str = ""
     reasoning: str = ""
+    # 服务商报告的 token 用量（prompt_tokens / completion_tokens / total_tokens），
+    # 通常只出现在流末尾的 chunk 上（content 与 reasoning 为空）；出现多次时以最后一次为准
+    usage: Optional[Dict[str, int]] = None
 
 
 class LLMError(RuntimeError):
@@ -3,7 +3,7 @@ from __future__ import annotations
 from datetime import datetime
 from typing import Dict, List, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class SolarDate(BaseModel):
@@ -23,6 +23,9 @@ class StartAge(BaseModel):
 
 
 class HeavenStemInfo(BaseModel):
+    # 排盘引擎会在多个命盘之间共享同一份柱信息，因此设为不可变
+    model_config = ConfigDict(frozen=True)
+
     name: str
     element: str
     yinyang: str
@@ -30,6 +33,8 @@ class HeavenStemInfo(BaseModel):
 
 
 class EarthBranchInfo(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     name: str
     element: str
     yinyang: str
@@ -38,6 +43,8 @@ class EarthBranchInfo(BaseModel):
 
 
 class PillarInfo(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     heaven_stem: HeavenStemInfo
     earth_branch: EarthBranchInfo
     na_yin: str = Field(default="", description="纳音")
@@ -83,6 +90,9 @@ class KongWangInfo(BaseModel):
 
 class GanZhiRelation(BaseModel):
     """单个干支关系"""
+    # 关系结果会被排盘引擎缓存并在多次请求间共享，因此设为不可变
+    model_config = ConfigDict(frozen=True)
+
     type: str = Field(description="关系类型：合化、相克、六合、三合、三会、六冲、相刑、相害、相生")
     pillars: List[str] = Field(description="涉及的柱标识: year, month, day, hour, destiny, year_fortune")
     ganzi_items: List[str] = Field(description="涉及的干支名称，如 ['寅', '巳'] 或 ['甲', '己']")
@@ -94,6 +104,8 @@ class GanZhiRelation(BaseModel):
 
 class GanZhiRelations(BaseModel):
     """干支关系汇总 - 一次性包含所有关系（本命+大运+流年）"""
+    model_config = ConfigDict(frozen=True)
+
     stem_relations: List[GanZhiRelation] = Field(default_factory=list, description="天干关系（包含所有）")
     branch_relations: List[GanZhiRelation] = Field(default_factory=list, description="地支关系（包含所有）")
     stem_branch_relations: List[GanZhiRelation] = Field(default_factory=list, description="天干地支相生关系")
@@ -129,3 +141,21 @@ class Chart(BaseModel):
     kong_wang: Optional[KongWangInfo] = Field(default=None, description="空亡")
     current_year_pillar: Optional[PillarInfo] = Field(default=None, description="当前流年柱（以立春为界）")
     ganzi_relations: Optional[GanZhiRelations] = Field(default=None, description="干支关系")
+
+
+class AnnualFortuneInfo(BaseModel):
+    """单个流年（干支年以立春为界，这里按公历年份标注）"""
+    year: int = Field(description="公历年份")
+    age: int = Field(description="当年周岁（按公历年份差计）")
+    pillar: PillarInfo = Field(description="流年柱（含十神、藏干与星运）")
+    destiny_index: Optional[int] = Field(default=None, description="所在大运在 destiny_pillars 中的下标，未起运为空")
+    destiny_gan_zhi: str = Field(default="", description="所在大运干支")
+    relations: GanZhiRelations = Field(
+        default_factory=GanZhiRelations, description="涉及大运或流年的干支关系（本命之间的关系见 natal_relations）"
+    )
+
+
+class AnnualTimeline(BaseModel):
+    """流年时间线：本命关系只列一次，各流年列出与大运、流年相关的关系"""
+    natal_relations: GanZhiRelations
+    years: List[AnnualFortuneInfo]
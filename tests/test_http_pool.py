@@ -0,0 +1,264 @@
+"""同步 / asyncio 长连接池：复用、空闲淘汰、断线重连与每主机连接数上限"""
+
+import asyncio
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.llm.async_http import AsyncHTTPConnectionPool
+from src.llm.http_pool import HTTPConnectionPool, PoolTimeoutError
+
+
+class _StandInServer(ThreadingHTTPServer):
+    """本地替身服务：记录收到的连接数与同时处理中的请求数"""
+
+    daemon_threads = True
+    request_queue_size = 64
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.lock = threading.Lock()
+        self.sockets = []
+        self.connections = 0
+        self.active = 0
+        self.max_active = 0
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def reset(self) -> None:
+        self.drop_connections()
+        with self.lock:
+            self.connections = 0
+            self.max_active = 0
+
+    def drop_connections(self) -> None:
+        """断开所有已建立的连接（客户端不会收到 Connection: close）"""
+        with self.lock:
+            sockets, self.sockets = self.sockets, []
+        for sock in sockets:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def setup(self) -> None:
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+            self.server.sockets.append(self.connection)
+
+    def do_GET(self) -> None:
+        with self.server.lock:
+            self.server.active += 1
+            self.server.max_active = max(self.server.max_active, self.server.active)
+        try:
+            if self.path.startswith("/slow"):
+                time.sleep(0.2)
+            if self.path.startswith("/chunked"):
+                self.send_response(200)
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for piece in (b"hello ", b"world"):
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(piece), piece))
+                self.wfile.write(b"0\r\n\r\n")
+                return
+            body = b"ok"
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with self.server.lock:
+                self.server.active -= 1
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+
+@pytest.fixture(scope="module")
+def stand_in():
+    server = _StandInServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.drop_connections()
+    server.server_close()
+
+
+@pytest.fixture
+def server(stand_in):
+    stand_in.reset()
+    return stand_in
+
+
+def _get(pool: HTTPConnectionPool, url: str) -> bytes:
+    with pool.request("GET", url, timeout=5) as response:
+        return response.read()
+
+
+async def _aget(pool: AsyncHTTPConnectionPool, url: str) -> bytes:
+    async with await pool.request("GET", url, timeout=5) as response:
+        return await response.read()
+
+
+# ---- 同步连接池 ----
+
+
+def test_sync_reuses_connection(server):
+    pool = HTTPConnectionPool()
+    for path in ("/ok", "/chunked", "/ok", "/chunked", "/ok"):
+        assert _get(pool, server.base_url + path) in (b"ok", b"hello world")
+    stats = pool.stats()
+    assert server.connections == 1
+    assert stats["requests"] == 5
+    assert stats["reused"] == 4
+    assert stats["idle_connections"] == 1
+    pool.close()
+
+
+def test_sync_evicts_idle_connection(server):
+    pool = HTTPConnectionPool(idle_timeout=0.05)
+    assert _get(pool, server.base_url + "/ok") == b"ok"
+    time.sleep(0.1)
+    assert _get(pool, server.base_url + "/ok") == b"ok"
+    stats = pool.stats()
+    assert stats["evicted_idle"] == 1
+    assert stats["reused"] == 0
+    assert stats["open_connections"] == 1
+    assert server.connections == 2
+    pool.close()
+
+
+def test_sync_reconnects_dropped_connection(server):
+    pool = HTTPConnectionPool()
+    assert _get(pool, server.base_url + "/ok") == b"ok"
+    server.drop_connections()
+    time.sleep(0.05)
+    assert _get(pool, server.base_url + "/ok") == b"ok"
+    stats = pool.stats()
+    assert stats["retries"] == 1
+    assert stats["open_connections"] == 1
+    assert server.connections == 2
+    pool.close()
+
+
+def test_sync_limits_connections_per_host(server):
+    pool = HTTPConnectionPool(max_per_host=2)
+    with ThreadPoolExecutor(max_workers=6) as executor:
+        results = list(executor.map(lambda _: _get(pool, server.base_url + "/slow"), range(6)))
+    assert results == [b"ok"] * 6
+    stats = pool.stats()
+    assert server.connections == 2
+    assert server.max_active == 2
+    assert stats["open_connections"] == 2
+    assert stats["waits"] >= 4
+    pool.close()
+
+
+def test_sync_wait_timeout(server):
+    pool = HTTPConnectionPool(max_per_host=1, wait_timeout=0.05)
+    held = pool.request("GET", server.base_url + "/ok", timeout=5)
+    with pytest.raises(PoolTimeoutError):
+        pool.request("GET", server.base_url + "/ok", timeout=5)
+    assert held.read() == b"ok"
+    held.close()
+    assert _get(pool, server.base_url + "/ok") == b"ok"
+    assert pool.stats()["reused"] == 1
+    pool.close()
+
+
+# ---- asyncio 连接池 ----
+
+
+def test_async_reuses_connection(server):
+    async def scenario():
+        pool = AsyncHTTPConnectionPool()
+        for path in ("/ok", "/chunked", "/ok", "/chunked", "/ok"):
+            assert await _aget(pool, server.base_url + path) in (b"ok", b"hello world")
+        stats = pool.stats()
+        await pool.aclose()
+        return stats
+
+    stats = asyncio.run(scenario())
+    assert server.connections == 1
+    assert stats["requests"] == 5
+    assert stats["reused"] == 4
+    assert stats["idle_connections"] == 1
+
+
+def test_async_evicts_idle_connection(server):
+    async def scenario():
+        pool = AsyncHTTPConnectionPool(idle_timeout=0.05)
+        assert await _aget(pool, server.base_url + "/ok") == b"ok"
+        await asyncio.sleep(0.1)
+        assert await _aget(pool, server.base_url + "/ok") == b"ok"
+        stats = pool.stats()
+        await pool.aclose()
+        return stats
+
+    stats = asyncio.run(scenario())
+    assert stats["evicted_idle"] == 1
+    assert stats["reused"] == 0
+    assert stats["open_connections"] == 1
+    assert server.connections == 2
+
+
+def test_async_reconnects_dropped_connection(server):
+    async def scenario():
+        pool = AsyncHTTPConnectionPool()
+        assert await _aget(pool, server.base_url + "/ok") == b"ok"
+        server.drop_connections()
+        await asyncio.sleep(0.05)
+        assert await _aget(pool, server.base_url + "/ok") == b"ok"
+        stats = pool.stats()
+        await pool.aclose()
+        return stats
+
+    stats = asyncio.run(scenario())
+    assert stats["retries"] == 1
+    assert stats["open_connections"] == 1
+    assert server.connections == 2
+
+
+def test_async_limits_connections_per_host(server):
+    async def scenario():
+        pool = AsyncHTTPConnectionPool(max_per_host=2)
+        results = await asyncio.gather(*(_aget(pool, server.base_url + "/slow") for _ in range(6)))
+        stats = pool.stats()
+        await pool.aclose()
+        return results, stats
+
+    results, stats = asyncio.run(scenario())
+    assert results == [b"ok"] * 6
+    assert server.connections == 2
+    assert server.max_active == 2
+    assert stats["open_connections"] == 2
+    assert stats["waits"] >= 4
+
+
+def test_async_wait_timeout(server):
+    async def scenario():
+        pool = AsyncHTTPConnectionPool(max_per_host=1, wait_timeout=0.05)
+        held = await pool.request("GET", server.base_url + "/ok", timeout=5)
+        with pytest.raises(PoolTimeoutError):
+            await pool.request("GET", server.base_url + "/ok", timeout=5)
+        assert await held.read() == b"ok"
+        held.close()
+        assert await _aget(pool, server.base_url + "/ok") == b"ok"
+        stats = pool.stats()
+        await pool.aclose()
+        return stats
+
+    assert asyncio.run(scenario())["reused"] == 1
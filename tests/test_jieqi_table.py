@@ -0,0 +1,52 @@
+"""节气索引与逐日遍历的一致性"""
+
+from datetime import date
+
+import sxtwl
+
+from src.engine.jieqi_table import get_jieqi_table
+
+
+def _walk_jieqi(start: date, end: date):
+    """按原逐日遍历的方式走完 [start, end]，返回每天的 ordinal 与当天节气（无则 None）"""
+    day = sxtwl.fromSolar(start.year, start.month, start.day)
+    for ordinal in range(start.toordinal(), end.toordinal() + 1):
+        found = None
+        if day.hasJieQi():
+            t = sxtwl.JD2DD(day.getJieQiJD())
+            found = (day.getJieQi(), (t.Y, t.M, t.D, round(t.h), round(t.m), round(t.s)))
+        yield ordinal, found
+        day = day.after(1)
+
+
+def test_find_nearest_matches_day_walk_1801_2100():
+    table = get_jieqi_table()
+    # 两端各多走一个月，保证 1801 年初向前、2100 年末向后都有节气可比
+    days = list(_walk_jieqi(date(1800, 12, 1), date(2101, 1, 31)))
+    terms = [found for _, found in days if found is not None]
+    assert len(terms) == 24 * 300 + 4
+
+    first = date(1801, 1, 1).toordinal()
+    last = date(2100, 12, 31).toordinal()
+
+    # 向前（之前）：当天或之前最近的节气
+    previous = None
+    for ordinal, found in days:
+        previous = found or previous
+        if first <= ordinal <= last:
+            d = date.fromordinal(ordinal)
+            assert table.find_nearest(d.year, d.month, d.day, False) == previous, d
+
+    # 向后（之后）：当天或之后最近的节气
+    following = None
+    for ordinal, found in reversed(days):
+        following = found or following
+        if first <= ordinal <= last:
+            d = date.fromordinal(ordinal)
+            assert table.find_nearest(d.year, d.month, d.day, True) == following, d
+
+
+def test_find_nearest_outside_table_returns_none():
+    table = get_jieqi_table()
+    assert table.find_nearest(1700, 6, 1, True) is None
+    assert table.find_nearest(2200, 6, 1, False) is None